@@ -2,12 +2,28 @@ import os
 import sys
 import subprocess
 import platform
-import re
 import threading
-import time
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor, wait
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 
+# Shared device tooling lives in the umm package at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Screenshot and burst modules are imported by the actions that use them
+from umm.adb import AdbClient, DeviceTracker
+from umm.cache import DeviceMetadataCache, DEFAULT_CACHE_PATH
+from umm.logbuffer import LogBuffer
+from umm.logcat import LogcatStream, PRIORITY_NAMES
+from umm.logview import VirtualLogView
+from umm.engine import shared_engine
+from umm.lazytabs import LazyTabs
+
+# Upper bound for a single per-device adb query during enumeration
+DEVICE_QUERY_TIMEOUT = 5
+
+# Number of devices queried concurrently during a refresh
+DEVICE_QUERY_WORKERS = 16
+
 
 class AndroidDeviceManager:
     def __init__(self, root):
@@ -17,39 +33,69 @@ class AndroidDeviceManager:
         self.root.minsize(800, 600)
 
         self.devices = []
+        self.device_entries = {}
         self.selected_device = None
         self.scrcpy_process = None
         self.recording_process = None
         self.is_recording = False
+        self.burst = None
+        self.bulk_install = None
+        self.install_ledger = None
+        self.install_queue = None
+
+        # One logcat stream and line buffer per device, so several can run at once
+        self.logcat_streams = {}
+        self.logcat_buffers = {}
+
+        # Device enumeration runs on a worker pool so refreshes never block the UI
+        self.query_pool = ThreadPoolExecutor(max_workers=DEVICE_QUERY_WORKERS)
+        self.refresh_in_progress = False
+
+        # Device names rarely change, so they are cached across refreshes and restarts
+        self.metadata_cache = DeviceMetadataCache(DEFAULT_CACHE_PATH)
         
         # Get the script directory to find adb and scrcpy
         self.script_dir = os.path.dirname(os.path.abspath(__file__))
+
+        # Talk to the adb server in-process; the adb binary is only a fallback
+        self.adb = AdbClient(adb_path=self.get_adb_path())
+
+        # adb binary commands run as asyncio subprocesses on the shared engine loop
+        self.engine = shared_engine()
         
-        # Check for dependencies
+        # Check for dependencies while the window is built
         self.check_dependencies()
         
         # Create the UI
         self.create_ui()
         
+        # Devices seen in earlier runs are listed until adb answers
+        self.sync_device_rows([])
+
         # Refresh device list
         self.refresh_devices()
 
-    def check_dependencies(self):
-        # Define commands with paths
-        adb_cmd = self.get_adb_path()
-        scrcpy_cmd = self.get_scrcpy_path()
-        
-        try:
-            subprocess.run([adb_cmd, "version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        except (subprocess.SubprocessError, FileNotFoundError):
-            messagebox.showerror("Error", f"ADB is not found. Checked at: {adb_cmd}")
-            sys.exit(1)
+        # Follow hotplug events from the adb server instead of polling
+        self.device_tracker = DeviceTracker(
+            lambda entries: self.root.after(0, self.apply_tracked_devices, entries),
+            start_server=self.start_adb_server
+        )
+        self.device_tracker.start()
 
-        try:
-            subprocess.run([scrcpy_cmd, "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        except (subprocess.SubprocessError, FileNotFoundError):
-            messagebox.showerror("Error", f"scrcpy is not found. Checked at: {scrcpy_cmd}")
-            sys.exit(1)
+    def check_dependencies(self):
+        # Both tools are probed at once on the engine, so startup never waits on them
+        tools = {
+            "ADB": [self.get_adb_path(), "version"],
+            "scrcpy": [self.get_scrcpy_path(), "--version"]
+        }
+        future = self.engine.probe(tools)
+        future.add_done_callback(lambda f: self.root.after(0, self.dependencies_checked, tools, f.result()))
+
+    def dependencies_checked(self, tools, results):
+        for name, command in tools.items():
+            if results[name] != 0:
+                messagebox.showerror("Error", f"{name} is not found. Checked at: {command[0]}")
+                sys.exit(1)
 
     def get_adb_path(self):
         """Get the ADB path based on whether it's in the same directory as the script or in PATH"""
@@ -64,6 +110,12 @@ class AndroidDeviceManager:
         # Otherwise return just "adb" to use PATH
         return "adb"
         
+    def start_adb_server(self):
+        try:
+            subprocess.run([self.get_adb_path(), "start-server"], capture_output=True, timeout=10)
+        except (subprocess.SubprocessError, FileNotFoundError):
+            pass
+
     def get_scrcpy_path(self):
         """Get the scrcpy path based on whether it's in the same directory as the script or in PATH"""
         # First try in the same directory
@@ -83,12 +135,14 @@ class AndroidDeviceManager:
 
         main_frame = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(main_frame, text="Device Manager")
-
-        adb_cmd_frame = ttk.Frame(self.notebook, padding="10")
-        self.notebook.add(adb_cmd_frame, text="ADB Command Line")
-
         self.setup_device_manager_tab(main_frame)
-        self.setup_adb_cmd_tab(adb_cmd_frame)
+
+        # The other tabs are built the first time they are selected
+        self.cmd_device_dropdown = None
+        self.logcat_device_dropdown = None
+        self.tabs = LazyTabs(self.notebook)
+        self.tabs.add(self.setup_adb_cmd_tab, padding="10", text="ADB Command Line")
+        self.tabs.add(self.setup_logcat_tab, padding="10", text="Logcat")
 
         self.status_var = tk.StringVar(value="Ready")
         status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
@@ -100,6 +154,7 @@ class AndroidDeviceManager:
         devices_frame = ttk.LabelFrame(parent, text="Connected Devices", padding="5")
         devices_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
+        # Rows are keyed by device ID so updates can be applied incrementally
         self.device_tree = ttk.Treeview(devices_frame, columns=("Name", "Model", "Status"))
         self.device_tree.heading("#0", text="ID")
         self.device_tree.heading("Name", text="Name")
@@ -128,6 +183,10 @@ class AndroidDeviceManager:
         ttk.Button(actions_frame, text="Install APK", command=self.install_apk).pack(fill=tk.X, padx=5, pady=5)
         ttk.Button(actions_frame, text="Uninstall App", command=self.show_uninstall_dialog).pack(fill=tk.X, padx=5, pady=5)
         ttk.Button(actions_frame, text="Take Screenshot", command=self.take_screenshot).pack(fill=tk.X, padx=5, pady=5)
+
+        self.raw_screenshot_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(actions_frame, text="Raw framebuffer capture", variable=self.raw_screenshot_var).pack(anchor=tk.W, padx=5)
+        ttk.Button(actions_frame, text="Burst Screenshots", command=self.show_burst_dialog).pack(fill=tk.X, padx=5, pady=5)
         ttk.Button(actions_frame, text="Reboot Device", command=self.reboot_device).pack(fill=tk.X, padx=5, pady=5)
 
         options_frame = ttk.LabelFrame(actions_frame, text="scrcpy Options", padding="5")
@@ -196,6 +255,112 @@ class AndroidDeviceManager:
         self.output_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.output_text.config(state=tk.DISABLED)
 
+        # Start on the device picked in the device list before this tab was opened
+        if self.selected_device:
+            self.cmd_device_var.set(f"{self.selected_device['id']} ({self.selected_device['name']})")
+        self.update_device_dropdown()
+
+    def setup_logcat_tab(self, parent):
+        top_frame = ttk.Frame(parent)
+        top_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        ttk.Label(top_frame, text="Device:").pack(side=tk.LEFT, padx=(0, 5))
+        self.logcat_device_var = tk.StringVar()
+        self.logcat_device_dropdown = ttk.Combobox(top_frame, textvariable=self.logcat_device_var, state="readonly", width=30)
+        self.logcat_device_dropdown.pack(side=tk.LEFT, padx=(0, 10))
+        self.logcat_device_dropdown.bind("<<ComboboxSelected>>", lambda e: self.show_logcat_device())
+
+        ttk.Label(top_frame, text="Tags:").pack(side=tk.LEFT, padx=(10, 5))
+        self.logcat_tags_var = tk.StringVar()
+        ttk.Entry(top_frame, textvariable=self.logcat_tags_var, width=20).pack(side=tk.LEFT)
+
+        ttk.Label(top_frame, text="Priority:").pack(side=tk.LEFT, padx=(10, 5))
+        self.logcat_priority_var = tk.StringVar(value="V")
+        ttk.Combobox(top_frame, textvariable=self.logcat_priority_var, values=PRIORITY_NAMES,
+                     state="readonly", width=3).pack(side=tk.LEFT)
+
+        ttk.Label(top_frame, text="PID:").pack(side=tk.LEFT, padx=(10, 5))
+        self.logcat_pid_var = tk.StringVar()
+        ttk.Entry(top_frame, textvariable=self.logcat_pid_var, width=8).pack(side=tk.LEFT)
+
+        button_frame = ttk.Frame(parent)
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        ttk.Button(button_frame, text="Start", command=self.start_logcat).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Stop", command=self.stop_logcat).pack(side=tk.LEFT, padx=5)
+        self.logcat_pause_button = ttk.Button(button_frame, text="Pause", command=self.toggle_logcat_pause)
+        self.logcat_pause_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Clear", command=self.clear_logcat).pack(side=tk.LEFT, padx=5)
+
+        self.logcat_view = VirtualLogView(parent, LogBuffer())
+        self.logcat_view.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.update_device_dropdown()
+
+    def selected_logcat_device(self):
+        selection = self.logcat_device_var.get()
+        return selection.split(" ")[0] if selection else None
+
+    def logcat_buffer(self, device_id):
+        if device_id not in self.logcat_buffers:
+            self.logcat_buffers[device_id] = LogBuffer()
+        return self.logcat_buffers[device_id]
+
+    def show_logcat_device(self):
+        device_id = self.selected_logcat_device()
+        if device_id:
+            self.logcat_view.set_buffer(self.logcat_buffer(device_id))
+
+    def start_logcat(self):
+        device_id = self.selected_logcat_device()
+        if not device_id:
+            messagebox.showerror("Error", "No device selected")
+            return
+
+        pid = self.logcat_pid_var.get().strip()
+        if pid and not pid.isdigit():
+            messagebox.showerror("Error", "PID must be a number")
+            return
+
+        # Restart with the new filters if this device is already streaming
+        if device_id in self.logcat_streams:
+            self.logcat_streams.pop(device_id).stop()
+
+        tags = [tag.strip() for tag in self.logcat_tags_var.get().split(",") if tag.strip()]
+        stream = LogcatStream(
+            self.adb, device_id, self.logcat_buffer(device_id),
+            tags=tags, priority=self.logcat_priority_var.get(), pid=pid or None,
+            on_exit=lambda stream: self.root.after(0, self.logcat_stopped, stream)
+        )
+        self.logcat_streams[device_id] = stream
+        stream.start()
+
+        self.show_logcat_device()
+        self.status_var.set(f"Logcat started on {device_id}: {stream.command}")
+
+    def stop_logcat(self):
+        device_id = self.selected_logcat_device()
+        if device_id in self.logcat_streams:
+            self.logcat_streams.pop(device_id).stop()
+            self.status_var.set(f"Logcat stopped on {device_id}")
+
+    def logcat_stopped(self, stream):
+        if self.logcat_streams.get(stream.serial) is stream:
+            del self.logcat_streams[stream.serial]
+        if stream.error:
+            self.status_var.set(f"Logcat on {stream.serial} ended: {stream.error}")
+
+    def toggle_logcat_pause(self):
+        # Pausing only freezes the view; lines keep accumulating in the buffer
+        paused = not self.logcat_view.paused
+        self.logcat_view.set_paused(paused)
+        self.logcat_pause_button.config(text="Resume" if paused else "Pause")
+
+    def clear_logcat(self):
+        device_id = self.selected_logcat_device()
+        if device_id:
+            self.logcat_buffer(device_id).clear()
+
     def insert_command(self, cmd):
         self.adb_cmd_var.set(cmd)
 
@@ -205,18 +370,28 @@ class AndroidDeviceManager:
         self.output_text.config(state=tk.DISABLED)
 
     def update_device_dropdown(self):
-        current = self.cmd_device_var.get()
-
         values = ["All Devices"]
         for device in self.devices:
             values.append(f"{device['id']} ({device['name']})")
 
-        self.cmd_device_dropdown["values"] = values
+        # Each dropdown exists only once its tab has been opened
+        if self.cmd_device_dropdown:
+            current = self.cmd_device_var.get()
+            self.cmd_device_dropdown["values"] = values
 
-        if current in values:
-            self.cmd_device_var.set(current)
-        else:
-            self.cmd_device_var.set(values[0] if values else "")
+            if current in values:
+                self.cmd_device_var.set(current)
+            else:
+                self.cmd_device_var.set(values[0] if values else "")
+
+        if self.logcat_device_dropdown:
+            # Keep the logcat selection on the same device even if its label changed
+            logcat_current = self.selected_logcat_device()
+            self.logcat_device_dropdown["values"] = values[1:]
+            matching = [value for value in values[1:] if value.split(" ")[0] == logcat_current]
+            self.logcat_device_var.set(matching[0] if matching else (values[1] if len(values) > 1 else ""))
+            if not matching:
+                self.show_logcat_device()
 
     def execute_adb_command(self):
         cmd = self.adb_cmd_var.get().strip()
@@ -225,6 +400,19 @@ class AndroidDeviceManager:
             return
 
         device_selection = self.cmd_device_var.get()
+        args = cmd.split()
+
+        if device_selection != "All Devices" and device_selection:
+            device_ids = [device_selection.split(" ")[0]]
+        else:
+            device_ids = [device["id"] for device in self.devices]
+
+        # Shell and logcat commands go straight to the adb server, on every target device at once
+        if device_ids and (args[0] == "logcat" or (args[0] == "shell" and len(args) > 1)):
+            command = " ".join(args[1:]) if args[0] == "shell" else cmd
+            self.status_var.set(f"Executing on {len(device_ids)} device(s): {command}")
+            threading.Thread(target=self.run_device_command, args=(device_ids, command), daemon=True).start()
+            return
 
         adb_cmd = [self.get_adb_path()]
 
@@ -235,39 +423,52 @@ class AndroidDeviceManager:
         adb_cmd.extend(cmd.split())
 
         self.status_var.set(f"Executing: {' '.join(adb_cmd)}")
-        threading.Thread(target=self.run_command, args=(adb_cmd,), daemon=True).start()
+        self.run_command(adb_cmd)
 
     def run_command(self, cmd):
+        self.reset_output(f"$ {' '.join(cmd)}\n\n")
+
+        device_id = cmd[cmd.index("-s") + 1] if "-s" in cmd else None
+        future = self.engine.stream(
+            cmd, lambda line: self.root.after(0, self.append_output, line),
+            device=device_id, merge_stderr=True
+        )
+        future.add_done_callback(lambda f: self.root.after(0, self.command_finished, f))
+
+    def command_finished(self, future):
         try:
-            self.output_text.config(state=tk.NORMAL)
-            self.output_text.delete(1.0, tk.END)
-
-            self.output_text.insert(tk.END, f"$ {' '.join(cmd)}\n\n", "command")
-            self.output_text.config(state=tk.DISABLED)
-
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
+            return_code, _ = future.result()
+        except Exception as e:
+            self.append_output(f"\n\nError executing command: {e}\n")
+            self.status_var.set("Command failed")
+            return
 
-            for line in iter(process.stdout.readline, ''):
-                if not line:
-                    break
-                self.root.after(0, self.append_output, line)
+        self.append_output(f"\n\n--- Command completed with return code: {return_code} ---\n")
+        self.status_var.set("Command completed")
 
-            return_code = process.wait()
+    def run_device_command(self, device_ids, command):
+        self.root.after(0, self.reset_output, f"$ {command}  [{', '.join(device_ids)}]\n\n")
 
-            completion_msg = f"\n\n--- Command completed with return code: {return_code} ---\n"
-            self.root.after(0, self.append_output, completion_msg)
-            self.root.after(0, self.status_var.set, "Command completed")
+        def stream(device_id):
+            prefix = f"[{device_id}] " if len(device_ids) > 1 else ""
+            for line in self.adb.stream_shell(device_id, command):
+                self.root.after(0, self.append_output, prefix + line)
 
-        except Exception as e:
-            error_msg = f"\n\nError executing command: {e}\n"
-            self.root.after(0, self.append_output, error_msg)
-            self.root.after(0, self.status_var.set, "Command failed")
+        results = self.adb.for_each(device_ids, stream, max_workers=len(device_ids))
+
+        failures = {device_id: e for device_id, e in results.items() if isinstance(e, Exception)}
+        for device_id, error in failures.items():
+            self.root.after(0, self.append_output, f"\n[{device_id}] Error executing command: {error}\n")
+
+        completion_msg = f"\n\n--- Command completed on {len(device_ids) - len(failures)}/{len(device_ids)} device(s) ---\n"
+        self.root.after(0, self.append_output, completion_msg)
+        self.root.after(0, self.status_var.set, "Command completed" if not failures else "Command failed on some devices")
+
+    def reset_output(self, header):
+        self.output_text.config(state=tk.NORMAL)
+        self.output_text.delete(1.0, tk.END)
+        self.output_text.insert(tk.END, header, "command")
+        self.output_text.config(state=tk.DISABLED)
 
     def append_output(self, text):
         self.output_text.config(state=tk.NORMAL)
@@ -276,73 +477,142 @@ class AndroidDeviceManager:
         self.output_text.config(state=tk.DISABLED)
 
     def auto_refresh(self):
-        self.refresh_devices(show_message=False)
+        # Poll only while the track-devices stream is unavailable
+        if not self.device_tracker.connected:
+            self.refresh_devices(show_message=False)
         self.root.after(5000, self.auto_refresh)
 
     def refresh_devices(self, show_message=True):
-        try:
-            self.status_var.set("Refreshing devices...")
-            self.root.update_idletasks()
+        # A refresh is already running; its result will be published shortly
+        if self.refresh_in_progress:
+            return
 
-            for item in self.device_tree.get_children():
-                self.device_tree.delete(item)
+        self.refresh_in_progress = True
+        self.status_var.set("Refreshing devices...")
+        threading.Thread(target=self.enumerate_devices, args=(show_message,), daemon=True).start()
 
-            self.devices = []
+    def enumerate_devices(self, show_message):
+        """Query every connected device concurrently and publish one batched result to the UI"""
+        try:
+            entries = self.adb.devices()
+        except (subprocess.SubprocessError, FileNotFoundError) as e:
+            self.root.after(0, self.device_refresh_failed, e, show_message)
+            return
 
-            result = subprocess.run(
-                [self.get_adb_path(), "devices", "-l"], 
-                capture_output=True, 
-                text=True, 
-                check=True
-            )
+        # Only fully authorized devices can answer shell queries
+        futures = {
+            self.query_pool.submit(self.query_device_name, entry["id"]): entry
+            for entry in entries if entry["status"] == "device"
+        }
+        done, _ = wait(futures, timeout=DEVICE_QUERY_TIMEOUT + 1)
+        for future in done:
+            device_name = future.result()
+            if device_name:
+                futures[future]["name"] = device_name
 
-            lines = result.stdout.strip().split('\n')[1:]              
-            for line in lines:
-                if not line.strip():
-                    continue
+        self.root.after(0, self.apply_device_list, entries, show_message)
 
-                parts = line.split()
-                if len(parts) < 2:
-                    continue
+    def query_device_name(self, device_id):
+        device_name = self.metadata_cache.get(device_id, "name")
+        if device_name:
+            return device_name
 
-                device_id = parts[0]
-                status = parts[1]
+        try:
+            name_result = self.adb.shell(device_id, "settings get global device_name", timeout=DEVICE_QUERY_TIMEOUT)
+        except (subprocess.SubprocessError, FileNotFoundError):
+            # A name from an earlier session beats none at all
+            return self.metadata_cache.known_devices().get(device_id, {}).get("name", "")
+
+        device_name = name_result.stdout.strip()
+        if device_name:
+            self.metadata_cache.set(device_id, "name", device_name)
+        return device_name
+
+    def apply_device_list(self, entries, show_message):
+        self.refresh_in_progress = False
+        self.sync_device_rows(entries)
+
+        if not self.devices and show_message:
+            messagebox.showinfo("No Devices", "No Android devices found. Please connect a device.")
+
+        self.status_var.set(f"Found {len(self.devices)} device(s)")
+
+    def apply_tracked_devices(self, entries):
+        # The tracker only reports state; keep names we already know and look up the rest
+        for entry in entries:
+            known = self.device_entries.get(entry["id"])
+            if known and known["status"] == "device":
+                entry["name"] = known["name"]
+            elif entry["status"] == "device":
+                future = self.query_pool.submit(self.query_device_name, entry["id"])
+                future.add_done_callback(
+                    lambda f, device_id=entry["id"]: self.root.after(0, self.apply_device_name, device_id, f.result())
+                )
 
-                if status != "device":
-                    self.device_tree.insert("", tk.END, text=device_id, values=("N/A", "N/A", status))
-                    continue
+        self.sync_device_rows(entries)
+        self.status_var.set(f"Found {len(self.devices)} device(s)")
 
-                device_name = "Unknown"
-                device_model = "Unknown"
+    def apply_device_name(self, device_id, device_name):
+        entry = self.device_entries.get(device_id)
+        if not entry or not device_name or entry["status"] != "device":
+            return
 
-                model_match = re.search(r'model:(\S+)', line)
-                if model_match:
-                    device_model = model_match.group(1)
+        entry["name"] = device_name
+        self.device_tree.item(device_id, values=(entry["name"], entry["model"], entry["status"]))
+        self.update_device_dropdown()
+
+    def known_device_entries(self):
+        """Entries for Android devices in the metadata cache, shown while they are not connected"""
+        # The cache is shared with the iOS window, whose devices have no "name" field
+        return {
+            device_id: {"id": device_id, "name": fields["name"], "model": fields.get("model", "N/A"),
+                        "status": "not connected"}
+            for device_id, fields in self.metadata_cache.known_devices().items() if "name" in fields
+        }
+
+    def sync_device_rows(self, entries):
+        """Apply the difference between the shown and the given devices to the device tree"""
+        current = {entry["id"]: entry for entry in entries}
+        for device_id, entry in self.known_device_entries().items():
+            current.setdefault(device_id, entry)
+
+        for device_id, entry in self.device_entries.items():
+            if device_id not in current and self.device_tree.exists(device_id):
+                self.device_tree.delete(device_id)
+
+            # Cached metadata is only trusted while the device stays connected
+            if entry["status"] == "device" and current.get(device_id, {}).get("status") != "device":
+                self.metadata_cache.invalidate(device_id)
+                self.adb.forget(device_id)
+
+        for device_id, entry in current.items():
+            if entry["status"] in ("device", "not connected"):
+                values = (entry["name"], entry["model"], entry["status"])
+            else:
+                values = ("N/A", "N/A", entry["status"])
 
-                try:
-                    name_result = subprocess.run(
-                        [self.get_adb_path(), "-s", device_id, "shell", "settings", "get", "global", "device_name"],
-                        capture_output=True, text=True, check=True
-                    )
-                    if name_result.stdout.strip():
-                        device_name = name_result.stdout.strip()
-                except subprocess.SubprocessError:
-                    pass
+            # The model is kept too, so the device can be listed with it while it is away
+            if entry["status"] == "device" and self.device_entries.get(device_id, {}).get("status") != "device":
+                self.metadata_cache.set(device_id, "model", entry["model"])
 
-                self.devices.append({"id": device_id, "name": device_name, "model": device_model, "status": status})
-                self.device_tree.insert("", tk.END, text=device_id, values=(device_name, device_model, status))
+            if not self.device_tree.exists(device_id):
+                self.device_tree.insert("", tk.END, iid=device_id, text=device_id, values=values)
+            elif tuple(self.device_tree.item(device_id, "values")) != values:
+                self.device_tree.item(device_id, values=values)
 
-            self.update_device_dropdown()
+        self.device_entries = current
+        self.devices = [entry for entry in entries if entry["status"] == "device"]
 
-            if not self.devices and show_message:
-                messagebox.showinfo("No Devices", "No Android devices found. Please connect a device.")
+        if self.selected_device and self.selected_device["id"] not in current:
+            self.selected_device = None
 
-            self.status_var.set(f"Found {len(self.devices)} device(s)")
+        self.update_device_dropdown()
 
-        except subprocess.SubprocessError as e:
-            self.status_var.set("Error refreshing devices")
-            if show_message:
-                messagebox.showerror("Error", f"Failed to get device list: {e}")
+    def device_refresh_failed(self, error, show_message):
+        self.refresh_in_progress = False
+        self.status_var.set("Error refreshing devices")
+        if show_message:
+            messagebox.showerror("Error", f"Failed to get device list: {error}")
 
     def on_device_selected(self, event):
         selection = self.device_tree.selection()
@@ -355,7 +625,8 @@ class AndroidDeviceManager:
             if device["id"] == device_id:
                 self.selected_device = device
                 self.status_var.set(f"Selected device: {device['name']} ({device_id})")
-                self.cmd_device_var.set(f"{device_id} ({device['name']})")
+                if self.cmd_device_dropdown:
+                    self.cmd_device_var.set(f"{device_id} ({device['name']})")
                 return
 
     def toggle_screen_mirror(self):
@@ -441,37 +712,95 @@ class AndroidDeviceManager:
                 messagebox.showerror("Error", f"Failed to start screen recording: {e}")
 
     def install_apk(self):
-        if not self.selected_device:
-            messagebox.showerror("Error", "No device selected")
+        if self.bulk_install:
+            if messagebox.askyesno("Install Running",
+                                   "An install is running. Stop every device after its current package?"):
+                self.bulk_install.cancel()
             return
 
-        apk_file = filedialog.askopenfilename(
-            filetypes=[("APK files", "*.apk"), ("All files", "*.*")],
-            title="Select APK file to install"
-        )
-
-        if not apk_file:
+        if not self.devices:
+            messagebox.showerror("Error", "No devices connected")
             return
 
+        from umm.installqueue import InstallQueue, DEFAULT_QUEUE_PATH
+        from umm.ledger import InstallLedger, DEFAULT_LEDGER_PATH
+
+        # Devices that already have the exact build are skipped
+        if self.install_ledger is None:
+            self.install_ledger = InstallLedger(DEFAULT_LEDGER_PATH)
+        # Installs are queued on disk until done, so an interrupted batch can be resumed
+        if self.install_queue is None:
+            self.install_queue = InstallQueue(DEFAULT_QUEUE_PATH)
+
+        pending = self.install_queue.pending("android")
+        if pending:
+            answer = messagebox.askyesnocancel(
+                "Resume Installs",
+                f"{sum(len(jobs) for jobs in pending.values())} install(s) on {len(pending)} device(s) "
+                "were left unfinished.\n\nResume them now? Choose No to discard them."
+            )
+            if answer is None:
+                return
+            if answer:
+                self.resume_install()
+                return
+            self.install_queue.clear("android")
+
+        from umm.dialogs import InstallDialog
+        selected = [self.selected_device["id"]] if self.selected_device else []
+        InstallDialog(self.root, [(device["id"], f"{device['id']} ({device['name']})") for device in self.devices],
+                      self.start_install, selected=selected)
+
+    def start_install(self, serials, apk_paths, split, replace, parallel, force, fast):
+        from umm.installer import BulkInstall
+
+        # Split APKs form one app; otherwise every APK is installed on its own
+        packages = [apk_paths] if split else [[apk_path] for apk_path in apk_paths]
         try:
-            self.status_var.set(f"Installing {os.path.basename(apk_file)}...")
-            self.root.update_idletasks()
+            install = BulkInstall(
+                self.adb, serials, packages, replace=replace, max_workers=parallel,
+                on_progress=lambda stats: self.root.after(0, self.install_progress.update_device, stats),
+                ledger=self.install_ledger, force=force, fast=fast, queue=self.install_queue
+            )
+        except OSError as e:
+            messagebox.showerror("Error", f"Cannot read APK: {e}")
+            return
+        self.run_bulk_install(install)
+
+    def resume_install(self):
+        from umm.installer import ApkInstaller, BulkInstall
 
-            result = subprocess.run(
-                [self.get_adb_path(), "-s", self.selected_device["id"], "install", "-r", apk_file],
-                capture_output=True, text=True, check=True
+        # Devices that are not connected keep their jobs for a later resume
+        try:
+            install = BulkInstall.resume(
+                self.install_queue, ApkInstaller(self.adb), devices=[device["id"] for device in self.devices],
+                on_progress=lambda stats: self.root.after(0, self.install_progress.update_device, stats),
+                ledger=self.install_ledger
             )
+        except OSError as e:
+            messagebox.showerror("Error", f"Cannot read a queued APK: {e}")
+            return
+        if not install.serials:
+            messagebox.showinfo("Resume Installs", "None of the devices with unfinished installs is connected")
+            return
+        self.run_bulk_install(install)
 
-            if "Success" in result.stdout:
-                messagebox.showinfo("Success", f"APK installed successfully")
-                self.status_var.set("APK installed successfully")
-            else:
-                messagebox.showwarning("Warning", f"Installation completed but success message not found.\nOutput: {result.stdout}")
-                self.status_var.set("APK installation completed")
+    def run_bulk_install(self, install):
+        from umm.dialogs import InstallProgressDialog
+        self.bulk_install = install
+        self.install_progress = InstallProgressDialog(self.root, install.serials, install.cancel)
+        self.status_var.set(f"Installing on {len(install.serials)} device(s)...")
+        threading.Thread(target=self.run_install, args=(install,), daemon=True).start()
 
-        except subprocess.SubprocessError as e:
-            messagebox.showerror("Error", f"Failed to install APK: {e}")
-            self.status_var.set("APK installation failed")
+    def run_install(self, install):
+        install.run()
+        self.root.after(0, self.install_finished, install)
+
+    def install_finished(self, install):
+        self.bulk_install = None
+        summary = install.summary()
+        self.install_progress.finish(summary)
+        self.status_var.set(summary)
 
     def show_uninstall_dialog(self):
         if not self.selected_device:
@@ -482,10 +811,7 @@ class AndroidDeviceManager:
             self.status_var.set("Getting app list...")
             self.root.update_idletasks()
 
-            result = subprocess.run(
-                [self.get_adb_path(), "-s", self.selected_device["id"], "shell", "pm", "list", "packages", "-3"],
-                capture_output=True, text=True, check=True
-            )
+            result = self.adb.shell(self.selected_device["id"], "pm list packages -3")
 
             packages = []
             for line in result.stdout.strip().split('\n'):
@@ -534,10 +860,7 @@ class AndroidDeviceManager:
 
                 if messagebox.askyesno("Confirm", f"Are you sure you want to uninstall {package}?"):
                     try:
-                        result = subprocess.run(
-                            [self.get_adb_path(), "-s", self.selected_device["id"], "uninstall", package],
-                            capture_output=True, text=True, check=True
-                        )
+                        result = self.adb.uninstall(self.selected_device["id"], package)
 
                         if "Success" in result.stdout:
                             messagebox.showinfo("Success", f"App uninstalled successfully")
@@ -554,18 +877,11 @@ class AndroidDeviceManager:
         except subprocess.SubprocessError as e:
             messagebox.showerror("Error", f"Failed to get app list: {e}")
 
-def take_screenshot(self):
-    # Check if a device is selected and raise an error if not
-    if not self.selected_device:
-        messagebox.showerror("Error", "No device selected")
-        return
-    
-    # Make absolutely sure we have a valid device ID before proceeding
-    if not self.selected_device or "id" not in self.selected_device:
-        messagebox.showerror("Error", "Invalid device selection. Please refresh and select a device.")
-        return
-
-    try:
+    def take_screenshot(self):
+        if not self.selected_device:
+            messagebox.showerror("Error", "No device selected")
+            return
+
         output_file = filedialog.asksaveasfilename(
             defaultextension=".png",
             filetypes=[("PNG files", "*.png"), ("All files", "*.*")],
@@ -576,32 +892,88 @@ def take_screenshot(self):
             return
 
         self.status_var.set("Taking screenshot...")
-        self.root.update_idletasks()
+        threading.Thread(
+            target=self.capture_screenshot,
+            args=(self.selected_device["id"], output_file, self.raw_screenshot_var.get()),
+            daemon=True
+        ).start()
 
-        temp_file = f"/sdcard/screenshot_{int(time.time())}.png"
+    def capture_screenshot(self, device_id, output_file, raw):
+        """Stream the screen straight into memory and write it to output_file once"""
+        from umm import screencap
 
-        subprocess.run(
-            [self.get_adb_path(), "-s", self.selected_device["id"], "shell", "screencap", "-p", temp_file],
-            check=True
-        )
+        try:
+            try:
+                image_data = screencap.capture(self.adb, device_id, raw=raw)
+            except ImportError:
+                # Raw capture needs Pillow to encode the PNG on this side
+                image_data = screencap.capture(self.adb, device_id)
 
-        subprocess.run(
-            [self.get_adb_path(), "-s", self.selected_device["id"], "pull", temp_file, output_file],
-            check=True
-        )
+            with open(output_file, "wb") as f:
+                f.write(image_data)
 
-        subprocess.run(
-            [self.get_adb_path(), "-s", self.selected_device["id"], "shell", "rm", temp_file],
-            check=True
+            self.root.after(0, self.screenshot_finished, output_file, None)
+
+        except (subprocess.SubprocessError, OSError) as e:
+            self.root.after(0, self.screenshot_finished, output_file, e)
+
+    def screenshot_finished(self, output_file, error):
+        if error:
+            messagebox.showerror("Error", f"Failed to take screenshot: {error}")
+            self.status_var.set("Screenshot failed")
+        else:
+            messagebox.showinfo("Success", f"Screenshot saved to {os.path.basename(output_file)}")
+            self.status_var.set("Screenshot saved")
+
+    def show_burst_dialog(self):
+        if self.burst:
+            if messagebox.askyesno("Burst Running", "A burst capture is running. Stop it?"):
+                self.burst.cancel()
+            return
+
+        if not self.devices:
+            messagebox.showerror("Error", "No devices connected")
+            return
+
+        from umm.dialogs import BurstDialog
+        BurstDialog(self.root, [(device["id"], f"{device['id']} ({device['name']})") for device in self.devices], self.start_burst)
+
+    def start_burst(self, serials, output_dir, count, interval, template):
+        from umm import screencap
+        from umm.burst import BurstCapture
+
+        raw = self.raw_screenshot_var.get()
+
+        def capture(serial, path):
+            image_data = screencap.capture(self.adb, serial, raw=raw)
+            with open(path, "wb") as f:
+                f.write(image_data)
+
+        self.burst = BurstCapture(
+            capture, serials, output_dir, count=count, interval=interval, template=template,
+            max_workers=DEVICE_QUERY_WORKERS,
+            on_progress=lambda stats: self.root.after(0, self.update_burst_status)
         )
+        self.status_var.set(f"Burst capture started on {len(serials)} device(s)")
+        threading.Thread(target=self.run_burst, args=(self.burst,), daemon=True).start()
 
-        messagebox.showinfo("Success", f"Screenshot saved to {os.path.basename(output_file)}")
-        self.status_var.set("Screenshot saved")
+    def run_burst(self, burst):
+        burst.run()
+        self.root.after(0, self.burst_finished, burst)
+
+    def update_burst_status(self):
+        if self.burst:
+            self.status_var.set(self.burst.summary())
+
+    def burst_finished(self, burst):
+        self.burst = None
+        self.status_var.set(burst.summary())
+
+        failed = [stats for stats in burst.stats.values() if stats.failures]
+        if failed:
+            details = "\n".join(f"{stats.serial}: {stats.failures} failed ({stats.last_error})" for stats in failed)
+            messagebox.showwarning("Burst Finished", f"Some captures failed:\n{details}")
 
-    except subprocess.SubprocessError as e:
-        messagebox.showerror("Error", f"Failed to take screenshot: {e}")
-        self.status_var.set("Screenshot failed")
-        
     def reboot_device(self):
         if not self.selected_device:
             messagebox.showerror("Error", "No device selected")
@@ -611,10 +983,7 @@ def take_screenshot(self):
             return
 
         try:
-            subprocess.run(
-                [self.get_adb_path(), "-s", self.selected_device["id"], "reboot"],
-                check=True
-            )
+            self.adb.reboot(self.selected_device["id"])
 
             self.status_var.set(f"Rebooting {self.selected_device['name']}...")
             messagebox.showinfo("Reboot", "Device is rebooting")
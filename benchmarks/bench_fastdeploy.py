@@ -0,0 +1,88 @@
+"""Compare full and delta APK installs against the fake adb server
+
+Builds a synthetic APK, installs it, then times reinstalling a build in
+which one dex file changed: once as a full streamed install and once
+through FastDeploy's delta. Run it from the repository root:
+
+    python benchmarks/bench_fastdeploy.py [--libs 10] [--lib-mb 2] [--dex-mb 3] [--rate-mb 40]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from umm.adb import AdbClient
+from umm.fake_adb import FakeAdbServer, FakeDevice, synthetic_apk
+from umm.fastdeploy import FastDeploy
+from umm.ledger import HashCache
+
+PACKAGE = "com.example.bench"
+MB = 1024 * 1024
+
+
+def build_apks(directory, libs, lib_size, dex_size):
+    """Two builds of the same app that differ only in classes.dex"""
+    entries = {f"lib/arm64-v8a/lib{i}.so": os.urandom(lib_size) for i in range(libs)}
+    entries["classes.dex"] = os.urandom(dex_size)
+    old = synthetic_apk(os.path.join(directory, "old.apk"), PACKAGE, 1, entries)
+    entries["classes.dex"] = os.urandom(dex_size)
+    new = synthetic_apk(os.path.join(directory, "new.apk"), PACKAGE, 2, entries)
+    return old, new
+
+
+def timed(install):
+    sent = 0
+
+    def progress(size):
+        nonlocal sent
+        sent += size
+
+    started = time.perf_counter()
+    result = install(progress)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Install failed: {result.stdout}")
+    return elapsed, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--libs", type=int, default=10, help="native libraries in the APK")
+    parser.add_argument("--lib-mb", type=float, default=2, help="size of each library in MB")
+    parser.add_argument("--dex-mb", type=float, default=3, help="size of the dex that changes in MB")
+    parser.add_argument("--rate-mb", type=float, default=40, help="host to device link rate in MB/s")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each install, the median is shown")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        old, new = build_apks(directory, args.libs, int(args.lib_mb * MB), int(args.dex_mb * MB))
+        server = FakeAdbServer(link_rate=args.rate_mb * MB).start()
+        try:
+            server.add_device(FakeDevice("BENCH"))
+            client = AdbClient(port=server.port)
+            deploy = FastDeploy(client, HashCache(), cache_dir=os.path.join(directory, "cache"))
+
+            results = {"full": [], "delta": [], "same build": []}
+            for _ in range(args.repeat):
+                deploy.install("BENCH", old)
+                results["full"].append(timed(lambda progress: client.install("BENCH", new, progress=progress)))
+                deploy.install("BENCH", old)
+                results["delta"].append(timed(lambda progress: deploy.install("BENCH", new, progress=progress)))
+                results["same build"].append(timed(lambda progress: deploy.install("BENCH", new, progress=progress)))
+        finally:
+            server.stop()
+
+        print(f"APK {os.path.getsize(new) / MB:.1f} MB, {args.dex_mb:g} MB changed, link {args.rate_mb:g} MB/s, "
+              f"median of {args.repeat}")
+        for name, runs in results.items():
+            elapsed = statistics.median(run[0] for run in runs)
+            sent = statistics.median(run[1] for run in runs)
+            print(f"  {name:<11} {elapsed:7.3f} s  {sent / MB:8.2f} MB sent")
+
+
+if __name__ == "__main__":
+    main()
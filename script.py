@@ -1,19 +1,36 @@
 import os
+import posixpath
 import sys
 import time
 import subprocess
 import json
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
-from PIL import Image, ImageTk
 import threading
 import platform
 import re
-import webbrowser
-import requests
-from io import BytesIO
-import zipfile
-import shutil
+# Modules used by a single action or by background work are imported where
+# they are needed, so the window paints before asyncio, ssl and sqlite3 load
+from umm.cache import DeviceMetadataCache, DEFAULT_CACHE_PATH
+from umm.logbuffer import LogBuffer, DEFAULT_MAX_LINES
+from umm.logview import VirtualLogView
+from umm.tasks import TaskRunner
+from umm.lazytabs import LazyTabs
+from umm.filetree import RemoteFileTree
+from umm.listingcache import ListingCache
+
+# Device facts that never change while the device stays connected, read from
+# lockdownd's default domain
+STATIC_INFO_FIELDS = ["DeviceName", "ProductType", "ProductVersion", "SerialNumber"]
+
+# Battery facts, which the cache expires quickly
+BATTERY_FIELDS = ["BatteryCurrentCapacity", "BatteryIsCharging"]
+
+# Worker threads shared by device queries and every device action
+TASK_WORKERS = 8
+
+# Seconds between idevice_id polls when usbmuxd's event stream is unavailable
+DEVICE_POLL_INTERVAL = 2
 
 class IOSDeviceManager:
     def __init__(self, root):
@@ -22,14 +39,27 @@ class IOSDeviceManager:
         self.root.geometry("1000x600")
         self.root.minsize(800, 500)
         
-        # Check system requirements
-        self.check_requirements()
-        
         # Device information
         self.device_info = {}
         self.connected_device = None
         self.device_ios_version = None
         
+        # Every attached device by UDID, with the info last fetched for it
+        self.devices = {}
+        self.device_selector_udids = []
+        self.burst = None
+        
+        # Syslog lines, capped so long sessions run at constant memory
+        self.log_buffer = LogBuffer()
+        self.log_store = None
+        self.log_writer = None
+        
+        # Cached device metadata, persisted so known devices show up instantly
+        self.metadata_cache = DeviceMetadataCache(DEFAULT_CACHE_PATH)
+        
+        # Folder listings, so reopening a folder or going back up does not ask the device again
+        self.listing_cache = ListingCache()
+        
         # Jailbreak tools info
         self.jailbreak_tools = {
             "checkra1n": {
@@ -79,14 +109,51 @@ class IOSDeviceManager:
         # Create UI
         self.create_ui()
         
-        # Start device detection
+        # Blocking device work runs here; results come back on the Tk thread
+        self.tasks = TaskRunner(self.root, max_workers=TASK_WORKERS, on_activity=self.show_activity)
+        
+        # Device tools run as asyncio subprocesses on the shared engine loop, started with the services
+        self.engine = None
+        self.jailbreak_detector = None
+        self.logging_future = None
+        
+        # One AFC session per device for the file browser, kept open between operations
+        self.file_sessions = None
+        
+        # Builds installed from here, per device, and the queue of unfinished installs; opened on the first install
+        self.install_ledger = None
+        self.install_queue = None
+        self.sync_manifest = None
+        self.bulk_install = None
+        
+        # Everything else starts once the window has been drawn
+        self.root.after_idle(self.start_services)
+    
+    def start_services(self):
+        """Start the tool engine, the dependency check and device detection"""
+        from umm.afc import AfcSessions
+        from umm.engine import shared_engine
+        from umm.jailbreak import JailbreakDetector
+        
+        self.engine = shared_engine()
+        
+        # Falls back to idevicefs processes when usbmuxd cannot be reached
+        self.file_sessions = AfcSessions(engine=self.engine)
+        
+        # Jailbreak probe results, kept per UDID and iOS version
+        self.jailbreak_detector = JailbreakDetector()
+        
+        self.check_requirements()
         self.start_device_detection()
     
     def check_requirements(self):
-        """Check if libimobiledevice is installed"""
-        try:
-            subprocess.run(["idevice_id", "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        except FileNotFoundError:
+        """Check in the background that libimobiledevice is installed"""
+        self.tasks.watch(self.engine.probe({"idevice_id": ["idevice_id", "--version"]}),
+                         on_done=self.requirements_checked)
+    
+    def requirements_checked(self, results):
+        """Explain how to install libimobiledevice if idevice_id could not run"""
+        if results["idevice_id"] is None:
             messagebox.showerror("Missing Dependency", 
                                 "libimobiledevice is required but not found.\n\n"
                                 "Please install it using:\n"
@@ -105,6 +172,17 @@ class IOSDeviceManager:
         left_panel = ttk.LabelFrame(main_frame, text="Device")
         left_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=False, padx=5, pady=5)
         
+        # Device selector; every tab acts on the selected device
+        selector_frame = ttk.Frame(left_panel)
+        selector_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(selector_frame, text="Device:").pack(side=tk.LEFT)
+        self.device_select_var = tk.StringVar()
+        self.device_selector = ttk.Combobox(selector_frame, textvariable=self.device_select_var, 
+                                            state="readonly", width=30)
+        self.device_selector.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.device_selector.bind("<<ComboboxSelected>>", self.on_device_selected)
+        
         # Device image placeholder
         self.device_image_label = ttk.Label(left_panel, text="No device connected")
         self.device_image_label.pack(pady=10)
@@ -146,6 +224,9 @@ class IOSDeviceManager:
         self.screenshot_btn = ttk.Button(actions_frame, text="Take Screenshot", command=self.take_screenshot)
         self.screenshot_btn.pack(fill=tk.X, padx=5, pady=5)
         
+        self.burst_btn = ttk.Button(actions_frame, text="Burst Screenshots", command=self.show_burst_dialog)
+        self.burst_btn.pack(fill=tk.X, padx=5, pady=5)
+        
         self.backup_btn = ttk.Button(actions_frame, text="Backup Device", command=self.backup_device)
         self.backup_btn.pack(fill=tk.X, padx=5, pady=5)
         
@@ -155,6 +236,12 @@ class IOSDeviceManager:
         
         tab_control = ttk.Notebook(right_panel)
         
+        # Only the first tab is built now; the others are built when first selected
+        self.tabs = LazyTabs(tab_control)
+        self.apps_tree = None
+        self.log_view = None
+        self.compatibility_text = None
+        
         # File System tab
         file_tab = ttk.Frame(tab_control)
         tab_control.add(file_tab, text="File System")
@@ -165,8 +252,10 @@ class IOSDeviceManager:
         file_controls = ttk.Frame(file_frame)
         file_controls.pack(fill=tk.X, pady=5)
         
-        ttk.Button(file_controls, text="Upload File", command=self.upload_file).pack(side=tk.LEFT, padx=5)
+        ttk.Button(file_controls, text="Upload Files", command=self.upload_file).pack(side=tk.LEFT, padx=5)
+        ttk.Button(file_controls, text="Upload Folder", command=self.upload_folder).pack(side=tk.LEFT, padx=5)
         ttk.Button(file_controls, text="Download Selected", command=self.download_file).pack(side=tk.LEFT, padx=5)
+        ttk.Button(file_controls, text="Sync Folder", command=self.sync_folder).pack(side=tk.LEFT, padx=5)
         ttk.Button(file_controls, text="Delete Selected", command=self.delete_file).pack(side=tk.LEFT, padx=5)
         
         # Path navigation
@@ -179,24 +268,39 @@ class IOSDeviceManager:
         self.path_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         ttk.Button(path_frame, text="Go", command=self.navigate_path).pack(side=tk.LEFT, padx=5)
         
-        # File treeview
-        file_tree_frame = ttk.Frame(file_frame)
-        file_tree_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        # AFC2 serves the whole filesystem on jailbroken devices
+        self.afc2_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(path_frame, text="Root filesystem (AFC2)", variable=self.afc2_var,
+                        command=self.navigate_path).pack(side=tk.LEFT, padx=5)
         
-        self.file_tree = ttk.Treeview(file_tree_frame, columns=("size", "modified"), show="headings")
-        self.file_tree.heading("size", text="Size")
-        self.file_tree.heading("modified", text="Modified")
+        # File tree, each folder listed when it is opened
+        self.file_browser = RemoteFileTree(file_frame, self.fetch_listing,
+                                           on_error=lambda e: self.status_var.set(f"Error listing files: {e}"))
+        self.file_browser.pack(fill=tk.BOTH, expand=True, pady=5)
         
-        scrollbar = ttk.Scrollbar(file_tree_frame, orient="vertical", command=self.file_tree.yview)
-        self.file_tree.configure(yscrollcommand=scrollbar.set)
+        self.tabs.add(self.create_apps_tab, text="Applications")
+        self.tabs.add(self.create_logs_tab, text="Logs")
+        self.tabs.add(self.create_jailbreak_tab, text="Jailbreak")
         
-        self.file_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Add the notebook to the UI
+        tab_control.pack(fill=tk.BOTH, expand=True)
         
-        # Apps tab
-        apps_tab = ttk.Frame(tab_control)
-        tab_control.add(apps_tab, text="Applications")
+        # Status bar
+        status_frame = ttk.Frame(self.root, relief=tk.SUNKEN)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
         
+        self.status_var = tk.StringVar(value="Ready")
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, anchor=tk.W)
+        status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # Background task activity
+        self.activity_bar = ttk.Progressbar(status_frame, mode="indeterminate", length=100)
+        self.activity_bar.pack(side=tk.RIGHT, padx=5)
+        self.activity_var = tk.StringVar()
+        ttk.Label(status_frame, textvariable=self.activity_var, anchor=tk.E).pack(side=tk.RIGHT, padx=5)
+    
+    def create_apps_tab(self, apps_tab):
+        """Create the applications tab UI"""
         apps_frame = ttk.Frame(apps_tab)
         apps_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
@@ -220,10 +324,10 @@ class IOSDeviceManager:
         
         self.apps_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         apps_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Logs tab
-        logs_tab = ttk.Frame(tab_control)
-        tab_control.add(logs_tab, text="Logs")
+    
+    def create_logs_tab(self, logs_tab):
+        """Create the logs tab UI"""
+        from umm.logstore import LEVELS
         
         logs_frame = ttk.Frame(logs_tab)
         logs_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -235,27 +339,97 @@ class IOSDeviceManager:
         ttk.Button(logs_control, text="Stop Logging", command=self.stop_logging).pack(side=tk.LEFT, padx=5)
         ttk.Button(logs_control, text="Clear Logs", command=self.clear_logs).pack(side=tk.LEFT, padx=5)
         
-        # Log text area
-        self.log_text = tk.Text(logs_frame, wrap=tk.WORD)
-        log_scrollbar = ttk.Scrollbar(logs_frame, orient="vertical", command=self.log_text.yview)
-        self.log_text.configure(yscrollcommand=log_scrollbar.set)
-        
-        self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        log_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        # Jailbreak tab
-        jailbreak_tab = ttk.Frame(tab_control)
-        tab_control.add(jailbreak_tab, text="Jailbreak")
-        
-        self.create_jailbreak_tab(jailbreak_tab)
+        ttk.Label(logs_control, text="Max lines:").pack(side=tk.LEFT, padx=(15, 5))
+        self.log_max_lines_var = tk.StringVar(value=str(DEFAULT_MAX_LINES))
+        max_lines_entry = ttk.Entry(logs_control, textvariable=self.log_max_lines_var, width=10)
+        max_lines_entry.pack(side=tk.LEFT)
+        max_lines_entry.bind("<Return>", lambda e: self.set_log_line_cap())
+        
+        # History search over the on-disk log store
+        search_frame = ttk.Frame(logs_frame)
+        search_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT, padx=5)
+        self.log_search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.log_search_var, width=30)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        search_entry.bind("<Return>", lambda e: self.search_logs())
+        
+        ttk.Label(search_frame, text="Process:").pack(side=tk.LEFT, padx=5)
+        self.log_process_var = tk.StringVar()
+        ttk.Entry(search_frame, textvariable=self.log_process_var, width=15).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(search_frame, text="Level:").pack(side=tk.LEFT, padx=5)
+        self.log_level_var = tk.StringVar(value="All")
+        ttk.Combobox(search_frame, textvariable=self.log_level_var, values=["All"] + LEVELS, 
+                     state="readonly", width=10).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(search_frame, text="Search History", command=self.search_logs).pack(side=tk.LEFT, padx=5)
+        ttk.Button(search_frame, text="Live View", command=self.show_live_logs).pack(side=tk.LEFT, padx=5)
+        
+        # Log view, which only renders the lines on screen
+        self.log_view = VirtualLogView(logs_frame, self.log_buffer)
+        self.log_view.pack(fill=tk.BOTH, expand=True)
+    
+    def show_activity(self, labels):
+        """Show which background tasks are running"""
+        if labels:
+            more = f" (+{len(labels) - 1} more)" if len(labels) > 1 else ""
+            self.activity_var.set(f"{labels[-1]}...{more}")
+            self.activity_bar.start(15)
+        else:
+            self.activity_var.set("")
+            self.activity_bar.stop()
+    
+    def run_tool(self, udid, command, timeout, label=None, on_done=None, on_error=None):
+        """Run a device tool on the command engine; on_done gets the CompletedProcess on the Tk thread"""
+        return self.tasks.watch(self.engine.run(command, device=udid, timeout=timeout), label, on_done, on_error)
+    
+    def stream_tool(self, udid, command, on_line, label=None, on_done=None, on_error=None):
+        """Run a long device tool on the command engine, passing each output line to on_line on the Tk thread
+
+        on_done gets (returncode, stderr).
+        """
+        future = self.engine.stream(command, lambda line: self.tasks.post(on_line, line), device=udid)
+        return self.tasks.watch(future, label, on_done, on_error)
+    
+    def show_progress_dialog(self, title, message):
+        """Open a dialog that follows a running command's output"""
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title(title)
+        progress_window.geometry("400x150")
+        progress_window.transient(self.root)
+        progress_window.grab_set()
+        
+        ttk.Label(progress_window, text=message).pack(pady=10)
+        progress = ttk.Progressbar(progress_window, mode="indeterminate")
+        progress.pack(fill=tk.X, padx=20, pady=10)
+        progress.start()
+        
+        log_text = scrolledtext.ScrolledText(progress_window, height=5)
+        log_text.pack(fill=tk.BOTH, expand=True, padx=20, pady=5)
+        
+        return progress_window, progress, log_text
+    
+    def append_progress_output(self, dialog, text):
+        """Add a line of command output to a progress dialog"""
+        progress_window, progress, log_text = dialog
+        if progress_window.winfo_exists():
+            log_text.insert(tk.END, text)
+            log_text.see(tk.END)
+    
+    def finish_progress_dialog(self, dialog, error):
+        """Turn a progress dialog into a completion dialog"""
+        progress_window, progress, log_text = dialog
+        if not progress_window.winfo_exists():
+            return
         
-        # Add the notebook to the UI
-        tab_control.pack(fill=tk.BOTH, expand=True)
+        progress.stop()
+        if error:
+            log_text.insert(tk.END, f"\nError: {error}")
         
-        # Status bar
-        self.status_var = tk.StringVar(value="Ready")
-        status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W)
-        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        progress.pack_forget()
+        ttk.Button(progress_window, text="Close", command=progress_window.destroy).pack(pady=10)
     
     def create_jailbreak_tab(self, parent):
         """Create the jailbreak tab UI"""
@@ -327,6 +501,7 @@ class IOSDeviceManager:
         
         # Initial population of jailbreak tools
         self.populate_jailbreak_tools()
+        self.update_jailbreak_compatibility()
     
     def populate_jailbreak_tools(self):
         """Populate the jailbreak tools list"""
@@ -369,7 +544,8 @@ class IOSDeviceManager:
     
     def update_jailbreak_compatibility(self):
         """Update jailbreak compatibility information based on connected device"""
-        if not self.connected_device or not self.device_ios_version:
+        # Shown when the tab is built if it has not been opened yet
+        if not self.connected_device or not self.device_ios_version or not self.compatibility_text:
             return
         
         compatible_tools = []
@@ -391,28 +567,30 @@ class IOSDeviceManager:
         
         self.compatibility_text.config(state=tk.DISABLED)
     
-    def check_jailbreak_status(self):
-        """Check if the connected device is jailbroken"""
-        if not self.connected_device:
-            return False
+    def check_jailbreak_status(self, udid, ios_version):
+        """Probe a device for a jailbreak in the background"""
+        # Looks up a few package manager bundle IDs and AFC2 instead of listing every app
+        self.tasks.submit(self.jailbreak_detector.check, udid, ios_version,
+                          on_done=lambda jailbroken: self.jailbreak_status_ready(udid, jailbroken),
+                          on_error=lambda e: self.jailbreak_status_ready(udid, None))
+    
+    def jailbreak_status_ready(self, udid, jailbroken):
+        """Store a finished jailbreak probe and show it if the device is selected"""
+        if udid not in self.devices:
+            return
         
-        try:
-            # Try to check for common jailbreak indicators
-            result = subprocess.run(["ideviceinfo", "-k", "ProductVersion"], 
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=5)
-            
-            # Try to access Cydia app info (will fail if not jailbroken)
-            cydia_check = subprocess.run(["ideviceinstaller", "-l", "-o", "xml"], 
-                                      stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=5)
-            
-            jailbroken = "cydia" in cydia_check.stdout.lower() or "sileo" in cydia_check.stdout.lower()
-            
-            self.jb_status_label.config(text=f"Jailbreak Status: {'Jailbroken' if jailbroken else 'Not Jailbroken'}")
-            return jailbroken
-            
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired):
+        self.devices[udid]["Jailbroken"] = jailbroken
+        if udid == self.connected_device:
+            self.show_jailbreak_status(self.devices[udid])
+    
+    def show_jailbreak_status(self, device_info):
+        """Update the jailbreak status label"""
+        if "Jailbroken" not in device_info:
+            self.jb_status_label.config(text="Jailbreak Status: Checking...")
+        elif device_info["Jailbroken"] is None:
             self.jb_status_label.config(text="Jailbreak Status: Unknown")
-            return False
+        else:
+            self.jb_status_label.config(text=f"Jailbreak Status: {'Jailbroken' if device_info['Jailbroken'] else 'Not Jailbroken'}")
     
     def download_jb_tool(self):
         """Download selected jailbreak tool"""
@@ -426,6 +604,7 @@ class IOSDeviceManager:
         
         if tool_info:
             # Open tool website in browser
+            import webbrowser
             webbrowser.open(tool_info["url"])
             self.status_var.set(f"Opening {tool_name} website for download...")
     
@@ -450,39 +629,42 @@ class IOSDeviceManager:
         # Get destination directory
         install_dir = os.path.join(os.path.expanduser("~"), "iOSDeviceManager", "JailbreakTools", tool_name)
         
-        try:
-            # Create directories if they don't exist
-            os.makedirs(install_dir, exist_ok=True)
+        # Set progress bar
+        self.jb_progress["value"] = 0
+        
+        self.tasks.submit(
+            self.unpack_jb_tool, file_path, install_dir, label=f"Installing {tool_name}",
+            on_progress=lambda percent: self.jb_progress.config(value=percent),
+            on_done=lambda result: self.status_var.set(f"{tool_name} installed successfully to {install_dir}"),
+            on_error=lambda e: self.status_var.set(f"Error installing {tool_name}: {e}")
+        )
+    
+    def unpack_jb_tool(self, file_path, install_dir, progress):
+        """Extract or copy a jailbreak tool on a worker, reporting percent done"""
+        import shutil
+        import zipfile
+        
+        # Create directories if they don't exist
+        os.makedirs(install_dir, exist_ok=True)
+        
+        # Handle different file types
+        if file_path.lower().endswith(".zip"):
+            # Extract zip file
+            with zipfile.ZipFile(file_path, 'r') as zip_ref:
+                total_files = len(zip_ref.namelist())
+                for i, member in enumerate(zip_ref.namelist()):
+                    zip_ref.extract(member, install_dir)
+                    progress((i + 1) / total_files * 100)
+        else:
+            # Copy the file directly
+            dest_file = os.path.join(install_dir, os.path.basename(file_path))
+            shutil.copy2(file_path, dest_file)
             
-            # Set progress bar
-            self.jb_progress["value"] = 0
-            self.root.update_idletasks()
+            # For DMG files on macOS, mount them
+            if file_path.lower().endswith(".dmg") and platform.system() == "Darwin":
+                subprocess.run(["hdiutil", "attach", dest_file])
             
-            # Handle different file types
-            if file_path.lower().endswith(".zip"):
-                # Extract zip file
-                with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                    total_files = len(zip_ref.namelist())
-                    for i, member in enumerate(zip_ref.namelist()):
-                        zip_ref.extract(member, install_dir)
-                        self.jb_progress["value"] = (i + 1) / total_files * 100
-                        self.root.update_idletasks()
-                
-                self.status_var.set(f"{tool_name} installed successfully to {install_dir}")
-            else:
-                # Copy the file directly
-                dest_file = os.path.join(install_dir, os.path.basename(file_path))
-                shutil.copy2(file_path, dest_file)
-                
-                # For DMG files on macOS, mount them
-                if file_path.lower().endswith(".dmg") and platform.system() == "Darwin":
-                    subprocess.run(["hdiutil", "attach", dest_file])
-                
-                self.jb_progress["value"] = 100
-                self.status_var.set(f"{tool_name} installed successfully to {install_dir}")
-        
-        except Exception as e:
-            self.status_var.set(f"Error installing {tool_name}: {e}")
+            progress(100)
     
     def run_jailbreak(self):
         """Run the selected jailbreak tool"""
@@ -547,6 +729,7 @@ class IOSDeviceManager:
                                     "Please refer to the documentation for detailed instructions.")
                 
                 # Open the URL in browser
+                import webbrowser
                 webbrowser.open(self.jailbreak_tools[tool_name]["url"])
                 self.status_var.set(f"Opened {tool_name} website for installation instructions")
             
@@ -574,39 +757,133 @@ class IOSDeviceManager:
             self.status_var.set(f"Error running {tool_name}: {e}")
     
     def start_device_detection(self):
-        """Start the device detection thread"""
+        """Start the device detection threads"""
+        from umm.usbmux import DeviceListener
+        
         self.detection_running = True
+        
+        # usbmuxd pushes attach/detach events, so nothing polls while it is reachable
+        self.device_listener = DeviceListener(
+            lambda event, udid: self.tasks.post(self.handle_device_event, event, udid))
+        self.device_listener.start()
+        
         self.detection_thread = threading.Thread(target=self.device_detection_loop)
         self.detection_thread.daemon = True
         self.detection_thread.start()
     
     def device_detection_loop(self):
-        """Loop to detect connected devices"""
+        """Poll idevice_id while usbmuxd's event stream is unavailable"""
+        # Give the listener a moment to connect before falling back to polling
+        self.device_listener.attempted.wait(1)
+        
         while self.detection_running:
-            try:
-                # Run idevice_id to get list of connected devices
-                result = subprocess.run(["idevice_id", "-l"], 
-                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=5)
+            if not self.device_listener.connected:
+                try:
+                    # Run idevice_id to get list of connected devices
+                    result = subprocess.run(["idevice_id", "-l"], 
+                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=5)
+                    
+                    devices = [device.strip() for device in result.stdout.split("\n") if device.strip()]
                 
-                devices = [device.strip() for device in result.stdout.split("\n") if device.strip()]
+                except (subprocess.SubprocessError, subprocess.TimeoutExpired, FileNotFoundError):
+                    # Error occurred, assume every device disconnected
+                    devices = []
                 
-                if devices and (not self.connected_device or self.connected_device not in devices):
-                    # New device connected
-                    self.connected_device = devices[0]  # Take the first device
-                    self.refresh_device_info()
-                elif not devices and self.connected_device:
-                    # Device disconnected
-                    self.connected_device = None
-                    self.update_ui_for_disconnected_device()
-            
-            except (subprocess.SubprocessError, subprocess.TimeoutExpired):
-                if self.connected_device:
-                    # Error occurred, assume device disconnected
-                    self.connected_device = None
-                    self.update_ui_for_disconnected_device()
+                # The registry is only touched on the UI thread
+                self.tasks.post(self.update_device_registry, devices)
             
             # Sleep before checking again
-            time.sleep(2)
+            time.sleep(DEVICE_POLL_INTERVAL)
+    
+    def handle_device_event(self, event, udid):
+        """Apply an Attached/Detached event from usbmuxd"""
+        if event == "Attached":
+            self.attach_device(udid)
+        elif event == "Detached":
+            self.detach_device(udid)
+    
+    def update_device_registry(self, udids):
+        """Bring the registry in line with a polled device list"""
+        for udid in list(self.devices):
+            if udid not in udids:
+                self.detach_device(udid)
+        
+        for udid in udids:
+            self.attach_device(udid)
+    
+    def attach_device(self, udid):
+        """Add a newly connected device to the registry"""
+        if udid in self.devices:
+            return
+        
+        # What an earlier run learned shows at once; its info loads alongside any other device's
+        self.devices[udid] = self.metadata_cache.known_devices().get(udid, {})
+        self.refresh_device_info(udid)
+        self.update_device_selector()
+        
+        if self.connected_device not in self.devices:
+            self.select_device(udid)
+    
+    def detach_device(self, udid):
+        """Drop a disconnected device from the registry"""
+        if udid not in self.devices:
+            return
+        
+        del self.devices[udid]
+        self.metadata_cache.invalidate(udid)
+        self.listing_cache.invalidate(udid)
+        if self.file_sessions:
+            self.file_sessions.close(udid)
+        self.update_device_selector()
+        
+        if udid == self.connected_device:
+            if self.devices:
+                self.select_device(next(iter(self.devices)))
+            else:
+                self.connected_device = None
+                self.update_ui_for_disconnected_device()
+    
+    def update_device_selector(self):
+        """Fill the device selector from the registry"""
+        self.device_selector_udids = list(self.devices)
+        labels = []
+        for udid in self.device_selector_udids:
+            name = self.devices[udid].get("DeviceName")
+            labels.append(f"{name} ({udid})" if name else udid)
+        
+        self.device_selector["values"] = labels
+        if self.connected_device in self.devices:
+            self.device_selector.current(self.device_selector_udids.index(self.connected_device))
+        else:
+            self.device_select_var.set("")
+    
+    def on_device_selected(self, event=None):
+        """Switch to the device picked in the selector"""
+        index = self.device_selector.current()
+        if index >= 0:
+            self.select_device(self.device_selector_udids[index])
+    
+    def select_device(self, udid):
+        """Make a device the target of every tab"""
+        if udid != self.connected_device:
+            self.connected_device = udid
+            
+            # Listings belong to the previous device
+            self.file_browser.clear()
+            if self.apps_tree:
+                for item in self.apps_tree.get_children():
+                    self.apps_tree.delete(item)
+        
+        self.update_device_selector()
+        
+        info = self.devices.get(udid)
+        if info:
+            self.show_device_info(info)
+        else:
+            # Shown by device_info_ready once the refresh finishes
+            self.device_info = {}
+            self.device_ios_version = None
+            self.status_var.set(f"Loading device {udid}...")
     
     def update_ui_for_disconnected_device(self):
         """Update UI elements when device is disconnected"""
@@ -618,88 +895,114 @@ class IOSDeviceManager:
         self.jb_status_label.config(text="Jailbreak Status: Unknown")
         
         # Clear file listings
-        for item in self.file_tree.get_children():
-            self.file_tree.delete(item)
+        self.file_browser.clear()
         
         # Clear app listings
-        for item in self.apps_tree.get_children():
-            self.apps_tree.delete(item)
+        if self.apps_tree:
+            for item in self.apps_tree.get_children():
+                self.apps_tree.delete(item)
         
         # Reset compatibility text
-        self.compatibility_text.config(state=tk.NORMAL)
-        self.compatibility_text.delete(1.0, tk.END)
-        self.compatibility_text.insert(tk.END, "Connect a device to see compatible jailbreak tools.")
-        self.compatibility_text.config(state=tk.DISABLED)
+        if self.compatibility_text:
+            self.compatibility_text.config(state=tk.NORMAL)
+            self.compatibility_text.delete(1.0, tk.END)
+            self.compatibility_text.insert(tk.END, "Connect a device to see compatible jailbreak tools.")
+            self.compatibility_text.config(state=tk.DISABLED)
         
         # Update status
         self.status_var.set("Device disconnected")
     
-    def refresh_device_info(self):
-        """Refresh connected device information"""
-        if not self.connected_device:
+    def refresh_device_info(self, udid=None):
+        """Refresh device information in the background"""
+        udid = udid or self.connected_device
+        if not udid:
             return
         
-        try:
-            # Get device info using ideviceinfo
-            device_info = {}
-            result = subprocess.run(["ideviceinfo", "-s"], 
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=5)
-            
-            for line in result.stdout.split("\n"):
-                if ":" in line:
-                    key, value = line.split(":", 1)
-                    device_info[key.strip()] = value.strip()
-            
-            # Update device info
-            self.device_info = device_info
-            
-            # Update UI with device info
-            device_name = device_info.get("DeviceName", "Unknown")
-            self.device_name_label.config(text=f"Name: {device_name}")
-            
-            device_model = device_info.get("ProductType", "Unknown")
-            self.device_model_label.config(text=f"Model: {device_model}")
-            
-            ios_version = device_info.get("ProductVersion", "Unknown")
-            self.device_ios_version = ios_version
-            self.device_ios_label.config(text=f"iOS Version: {ios_version}")
-            
-            serial = device_info.get("SerialNumber", "Unknown")
-            self.device_serial_label.config(text=f"Serial: {serial}")
-            
-            # Get battery level
-            try:
-                battery_result = subprocess.run(["ideviceinfo", "-q", "com.apple.mobile.battery"], 
-                                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=5)
-                
-                battery_level = "Unknown"
-                battery_state = "Unknown"
-                
-                for line in battery_result.stdout.split("\n"):
-                    if "BatteryCurrentCapacity:" in line:
-                        battery_level = line.split(":", 1)[1].strip()
-                    elif "BatteryIsCharging:" in line:
-                        charging = line.split(":", 1)[1].strip()
-                        battery_state = "Charging" if charging == "true" else "Not Charging"
-                
-                self.device_battery_label.config(text=f"Battery: {battery_level}% ({battery_state})")
-            except:
-                self.device_battery_label.config(text="Battery: Unknown")
-            
-            # Check jailbreak status
-            self.check_jailbreak_status()
-            
-            # Update jailbreak compatibility
-            self.update_jailbreak_compatibility()
-            
-            # Update status
-            self.status_var.set(f"Connected to {device_name}")
-            
-            # Try to get device image (not always available)
-            self.load_device_image(device_model)
+        self.tasks.submit(self.fetch_device_info, udid, label="Reading device info",
+                          on_done=lambda device_info: self.device_info_ready(udid, device_info),
+                          on_error=lambda e: self.device_info_failed(udid, e))
+    
+    def fetch_device_info(self, udid):
+        """Query one device; runs on the device pool and never touches widgets"""
+        fields = STATIC_INFO_FIELDS + BATTERY_FIELDS
+        
+        # Fresh cached facts spare the device a lockdown session entirely
+        device_info = self.metadata_cache.get_many(udid, fields)
+        
+        if len(device_info) < len(fields):
+            # One lockdown session reads the general and battery domains together
+            from umm.lockdown import read_device_info
+            device_info = read_device_info(udid)
+            self.metadata_cache.update(udid, {
+                field: device_info[field] for field in fields if field in device_info
+            })
+        
+        return device_info
+    
+    def device_info_ready(self, udid, device_info):
+        """Store a finished refresh and show it if the device is selected"""
+        if udid not in self.devices:
+            # Device went away while its info was loading
+            return
+        
+        # Keep a jailbreak result that is already known for this device. Info
+        # shown from the cache never has one, so the check uses the version just read
+        if "Jailbroken" in self.devices[udid]:
+            device_info["Jailbroken"] = self.devices[udid]["Jailbroken"]
+        else:
+            self.check_jailbreak_status(udid, device_info.get("ProductVersion"))
+        
+        self.devices[udid] = device_info
+        self.update_device_selector()
+        
+        if udid == self.connected_device:
+            self.show_device_info(device_info)
+    
+    def device_info_failed(self, udid, error):
+        """Report a failed refresh for the selected device"""
+        if udid == self.connected_device:
+            self.status_var.set(f"Error getting device info: {error}")
+    
+    def show_device_info(self, device_info):
+        """Update the device panel for the selected device"""
+        self.device_info = device_info
+        
+        # Update UI with device info
+        device_name = device_info.get("DeviceName", "Unknown")
+        self.device_name_label.config(text=f"Name: {device_name}")
+        
+        device_model = device_info.get("ProductType", "Unknown")
+        self.device_model_label.config(text=f"Model: {device_model}")
+        
+        ios_version = device_info.get("ProductVersion", "Unknown")
+        self.device_ios_version = ios_version
+        self.device_ios_label.config(text=f"iOS Version: {ios_version}")
+        
+        serial = device_info.get("SerialNumber", "Unknown")
+        self.device_serial_label.config(text=f"Serial: {serial}")
+        
+        if "BatteryCurrentCapacity" in device_info:
+            battery_level = device_info["BatteryCurrentCapacity"]
+            battery_state = "Unknown"
+            if "BatteryIsCharging" in device_info:
+                battery_state = "Charging" if device_info["BatteryIsCharging"] else "Not Charging"
             
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
-            self.status_var.set(f"Error getting device info: {e}")
+            self.device_battery_label.config(text=f"Battery: {battery_level}% ({battery_state})")
+        else:
+            self.device_battery_label.config(text="Battery: Unknown")
+        
+        self.show_jailbreak_status(device_info)
+        
+        # Update jailbreak compatibility
+        self.update_jailbreak_compatibility()
+        
+        # Update status
+        stats = self.metadata_cache.stats()
+        self.status_var.set(f"Connected to {device_name} "
+                            f"(metadata cache: {stats['hits']} hits, {stats['misses']} misses)")
+        
+        # Try to get device image (not always available)
+        self.load_device_image(device_model)
     
     def load_device_image(self, model_identifier):
         """Load and display device image based on model identifier"""
@@ -821,13 +1124,13 @@ class IOSDeviceManager:
             return
         
         if messagebox.askyesno("Restart Device", "Are you sure you want to restart the device?"):
-            try:
-                # This is a sample; actual restart would use a different command
-                subprocess.run(["idevicediagnostics", "restart"], 
-                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=5)
-                self.status_var.set("Device restart command sent")
-            except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
-                self.status_var.set(f"Error restarting device: {e}")
+            # This is a sample; actual restart would use a different command
+            self.run_tool(
+                self.connected_device, ["idevicediagnostics", "-u", self.connected_device, "restart"], 5,
+                label="Restarting device",
+                on_done=lambda result: self.status_var.set("Device restart command sent"),
+                on_error=lambda e: self.status_var.set(f"Error restarting device: {e}")
+            )
     
     def take_screenshot(self):
         """Take a screenshot of the device"""
@@ -835,31 +1138,108 @@ class IOSDeviceManager:
             messagebox.showinfo("No Device", "No device connected")
             return
         
-        try:
-            # Create a temporary file
-            temp_file = os.path.join(os.path.expanduser("~"), "screenshot.png")
-            
-            # Take screenshot using idevicescreenshot
-            subprocess.run(["idevicescreenshot", temp_file], 
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
-            
-            # Ask where to save the screenshot
-            save_path = filedialog.asksaveasfilename(
-                defaultextension=".png",
-                filetypes=[("PNG files", "*.png")],
-                initialfile="ios_screenshot.png"
-            )
-            
-            if save_path:
-                # Move the temp file to the selected location
-                shutil.move(temp_file, save_path)
-                self.status_var.set(f"Screenshot saved to {save_path}")
-            else:
-                # Delete the temp file if user cancelled
-                os.remove(temp_file)
+        # Every capture gets its own temporary file, so captures of several devices never collide
+        import tempfile
+        fd, temp_file = tempfile.mkstemp(suffix=".png")
+        os.close(fd)
         
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
+        def failed(e):
+            self.discard_screenshot(temp_file)
             self.status_var.set(f"Error taking screenshot: {e}")
+        
+        # Take screenshot using idevicescreenshot
+        self.run_tool(
+            self.connected_device, ["idevicescreenshot", "-u", self.connected_device, temp_file], 10,
+            label="Taking screenshot",
+            on_done=lambda result: self.save_screenshot(result, temp_file),
+            on_error=failed
+        )
+    
+    def save_screenshot(self, result, temp_file):
+        """Ask where to keep a captured screenshot"""
+        if result.returncode != 0:
+            self.discard_screenshot(temp_file)
+            self.status_var.set(f"Error taking screenshot: {result.stderr.strip()}")
+            return
+        
+        # Ask where to save the screenshot
+        save_path = filedialog.asksaveasfilename(
+            defaultextension=".png",
+            filetypes=[("PNG files", "*.png")],
+            initialfile="ios_screenshot.png"
+        )
+        
+        if save_path:
+            # Moving may copy across drives, so it runs on a worker
+            import shutil
+            self.tasks.submit(shutil.move, temp_file, save_path, label="Saving screenshot",
+                              on_done=lambda _: self.status_var.set(f"Screenshot saved to {save_path}"),
+                              on_error=lambda e: self.status_var.set(f"Error saving screenshot: {e}"))
+        else:
+            # Delete the temp file if user cancelled
+            self.discard_screenshot(temp_file)
+    
+    def discard_screenshot(self, temp_file):
+        """Delete a capture nobody is keeping, on a worker"""
+        def remove():
+            try:
+                os.remove(temp_file)
+            except OSError:
+                pass
+        
+        self.tasks.submit(remove, label="Removing screenshot")
+    
+    def show_burst_dialog(self):
+        """Ask for burst settings and capture screenshots from several devices"""
+        if self.burst:
+            if messagebox.askyesno("Burst Running", "A burst capture is running. Stop it?"):
+                self.burst.cancel()
+            return
+        
+        if not self.devices:
+            messagebox.showinfo("No Device", "No device connected")
+            return
+        
+        from umm.dialogs import BurstDialog
+        
+        devices = [(udid, f"{info['DeviceName']} ({udid})" if info.get("DeviceName") else udid)
+                   for udid, info in self.devices.items()]
+        BurstDialog(self.root, devices, self.start_burst)
+    
+    def start_burst(self, udids, output_dir, count, interval, template):
+        """Start a burst capture on a background thread"""
+        from umm.burst import BurstCapture
+        
+        def capture(udid, path):
+            # idevicescreenshot writes straight to the templated path, no temporary file
+            subprocess.run(["idevicescreenshot", "-u", udid, path], 
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=15, check=True)
+        
+        self.burst = BurstCapture(
+            capture, udids, output_dir, count=count, interval=interval, template=template,
+            on_progress=lambda stats: self.tasks.post(self.update_burst_status)
+        )
+        self.status_var.set(f"Burst capture started on {len(udids)} device(s)")
+        threading.Thread(target=self._burst_thread, args=(self.burst,), daemon=True).start()
+    
+    def _burst_thread(self, burst):
+        burst.run()
+        self.tasks.post(self.burst_finished, burst)
+    
+    def update_burst_status(self):
+        """Show burst throughput in the status bar"""
+        if self.burst:
+            self.status_var.set(self.burst.summary())
+    
+    def burst_finished(self, burst):
+        """Report the result of a finished burst"""
+        self.burst = None
+        self.status_var.set(burst.summary())
+        
+        failed = [stats for stats in burst.stats.values() if stats.failures]
+        if failed:
+            details = "\n".join(f"{stats.serial}: {stats.failures} failed ({stats.last_error})" for stats in failed)
+            messagebox.showwarning("Burst Finished", f"Some captures failed:\n{details}")
     
     def backup_device(self):
         """Create a backup of the device"""
@@ -875,66 +1255,29 @@ class IOSDeviceManager:
         if not backup_dir:
             return
         
-        try:
-            # Start backup process
-            self.status_var.set("Starting backup... This may take a while")
-            self.root.update_idletasks()
-            
-            # Run the backup command
-            backup_process = subprocess.Popen(
-                ["idevicebackup2", "backup", "--full", backup_dir],
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
-            
-            # Show progress dialog
-            progress_window = tk.Toplevel(self.root)
-            progress_window.title("Backup Progress")
-            progress_window.geometry("400x150")
-            progress_window.transient(self.root)
-            progress_window.grab_set()
-            
-            ttk.Label(progress_window, text="Backing up device...").pack(pady=10)
-            progress = ttk.Progressbar(progress_window, mode="indeterminate")
-            progress.pack(fill=tk.X, padx=20, pady=10)
-            progress.start()
-            
-            log_text = scrolledtext.ScrolledText(progress_window, height=5)
-            log_text.pack(fill=tk.BOTH, expand=True, padx=20, pady=5)
-            
-            # Function to read output and update progress
-            def read_output():
-                while backup_process.poll() is None:
-                    output = backup_process.stdout.readline()
-                    if output:
-                        log_text.insert(tk.END, output)
-                        log_text.see(tk.END)
-                        self.root.update_idletasks()
-                
-                # Process completed
-                progress.stop()
-                
-                # Get final output and error
-                output, error = backup_process.communicate()
-                if output:
-                    log_text.insert(tk.END, output)
-                
-                if error:
-                    log_text.insert(tk.END, f"\nError: {error}")
-                
-                # Change the progress dialog to a completion dialog
-                progress.pack_forget()
-                ttk.Button(progress_window, text="Close", command=progress_window.destroy).pack(pady=10)
-                
-                if backup_process.returncode == 0:
-                    self.status_var.set("Backup completed successfully")
-                else:
-                    self.status_var.set(f"Backup failed with code {backup_process.returncode}")
-            
-            # Start the output reading thread
-            threading.Thread(target=read_output, daemon=True).start()
-            
-        except Exception as e:
+        # Start backup process
+        self.status_var.set("Starting backup... This may take a while")
+        dialog = self.show_progress_dialog("Backup Progress", "Backing up device...")
+        
+        def finished(result):
+            returncode, error = result
+            self.finish_progress_dialog(dialog, error)
+            if returncode == 0:
+                self.status_var.set("Backup completed successfully")
+            else:
+                self.status_var.set(f"Backup failed with code {returncode}")
+        
+        def failed(e):
+            self.finish_progress_dialog(dialog, e)
             self.status_var.set(f"Error starting backup: {e}")
+        
+        # Run the backup command, following its output in the dialog
+        self.stream_tool(
+            self.connected_device, ["idevicebackup2", "-u", self.connected_device, "backup", "--full", backup_dir],
+            label="Backing up device",
+            on_line=lambda line: self.append_progress_output(dialog, line),
+            on_done=finished, on_error=failed
+        )
     
     def navigate_path(self):
         """Navigate to the specified path on the device"""
@@ -942,7 +1285,9 @@ class IOSDeviceManager:
             messagebox.showinfo("No Device", "No device connected")
             return
         
+        # Go always asks the device, whatever is cached under the path
         path = self.path_var.get()
+        self.listing_cache.invalidate(self.connected_device, self.file_service(), path)
         self.list_files(path)
     
     def list_files(self, path):
@@ -950,107 +1295,189 @@ class IOSDeviceManager:
         if not self.connected_device:
             return
         
-        try:
-            # Clear existing items
-            for item in self.file_tree.get_children():
-                self.file_tree.delete(item)
-            
-            # Use sftp-server or AFC to list files (simplified example)
-            # This is a placeholder - real implementation would use libimobiledevice's tools
-            result = subprocess.run(["idevicefs", "-u", self.connected_device, "ls", "-la", path], 
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                self.status_var.set(f"Error listing files: {result.stderr}")
+        self.file_browser.show(path)
+    
+    def fetch_listing(self, path, on_done, on_error):
+        """List one folder for the file tree, from the listing cache when it is fresh"""
+        udid = self.connected_device
+        service = self.file_service()
+        rows = self.listing_cache.get(udid, service, path)
+        if rows is not None:
+            on_done(rows)
+            return
+        
+        def finished(rows):
+            self.listing_cache.put(udid, service, path, rows)
+            if udid != self.connected_device or service != self.file_service():
+                # Another device or service was picked while the listing ran
                 return
-            
-            # Parse output and add to tree
-            for line in result.stdout.split("\n"):
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 9:
-                        permissions = parts[0]
-                        size = parts[4]
-                        date = f"{parts[5]} {parts[6]} {parts[7]}"
-                        name = " ".join(parts[8:])
-                        
-                        self.file_tree.insert("", "end", text=name, values=(size, date))
-            
+            on_done(rows)
             self.status_var.set(f"Listed files at {path}")
         
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
-            self.status_var.set(f"Error listing files: {e}")
+        self.tasks.submit(self.file_client(udid).listdir, path, label=f"Listing {path}",
+                          on_done=finished, on_error=on_error)
+    
+    def file_service(self):
+        """The AFC service the file tab uses, AFC2 when the root filesystem is chosen"""
+        from umm.afc import AFC2_SERVICE, AFC_SERVICE
+        
+        return AFC2_SERVICE if self.afc2_var.get() else AFC_SERVICE
+    
+    def file_client(self, udid):
+        """File operations on a device over its shared AFC session"""
+        # Only a handle; the session opens on the worker that first uses it
+        return self.file_sessions.files(udid, self.file_service())
+    
+    def files_changed(self, udid, service, folder, names=None):
+        """Forget listings a change on the device made stale and list the folder again
+        
+        With names, only those entries of folder changed; otherwise anything
+        below folder may have.
+        """
+        if names is None:
+            self.listing_cache.invalidate(udid, service, folder)
+        else:
+            self.listing_cache.invalidate(udid, service, folder, recursive=False)
+            for name in names:
+                self.listing_cache.invalidate(udid, service, posixpath.join(folder, name))
+        if udid == self.connected_device and service == self.file_service():
+            self.file_browser.refresh(folder)
     
     def upload_file(self):
-        """Upload a file to the device"""
+        """Upload files to the device"""
         if not self.connected_device:
             messagebox.showinfo("No Device", "No device connected")
             return
         
-        # Ask for file to upload
-        file_path = filedialog.askopenfilename(
-            title="Select File to Upload"
+        # Ask for files to upload
+        file_paths = filedialog.askopenfilenames(
+            title="Select Files to Upload"
         )
         
-        if not file_path:
+        if not file_paths:
             return
         
-        try:
-            # Get destination path
-            dest_path = self.path_var.get()
-            file_name = os.path.basename(file_path)
-            
-            # Use sftp-server or AFC to upload file (simplified example)
-            result = subprocess.run(["idevicefs", "-u", self.connected_device, "put", file_path, f"{dest_path}/{file_name}"], 
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                self.status_var.set(f"Uploaded {file_name} to {dest_path}")
-                # Refresh file listing
-                self.list_files(dest_path)
-            else:
-                self.status_var.set(f"Error uploading file: {result.stderr}")
+        self.start_transfer(True, list(file_paths), self.path_var.get())
+    
+    def upload_folder(self):
+        """Upload a folder and everything in it to the device"""
+        if not self.connected_device:
+            messagebox.showinfo("No Device", "No device connected")
+            return
+        
+        folder = filedialog.askdirectory(title="Select Folder to Upload")
+        if not folder:
+            return
         
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
-            self.status_var.set(f"Error uploading file: {e}")
+        self.start_transfer(True, [folder], self.path_var.get())
     
     def download_file(self):
-        """Download a selected file from the device"""
+        """Download the selected files and folders from the device"""
         if not self.connected_device:
             messagebox.showinfo("No Device", "No device connected")
             return
         
-        # Get selected file
-        selected = self.file_tree.selection()
-        if not selected:
+        # Get selected files, from any folder open in the tree
+        entries = self.file_browser.selected_entries()
+        if not entries:
             messagebox.showinfo("No Selection", "Please select a file to download")
             return
         
-        file_name = self.file_tree.item(selected[0], "text")
-        current_path = self.path_var.get()
-        source_path = f"{current_path}/{file_name}"
+        # Ask where to save the files; folders are copied with everything in them
+        save_dir = filedialog.askdirectory(title="Select Download Folder")
         
-        # Ask where to save the file
-        save_path = filedialog.asksaveasfilename(
-            defaultextension="",
-            initialfile=file_name
-        )
+        if not save_dir:
+            return
+        
+        self.start_transfer(False, entries, save_dir)
+    
+    def start_transfer(self, upload, items, destination):
+        """Copy files and folders to or from the device with a pool of workers and a progress dialog"""
+        from umm.dialogs import TransferProgressDialog
+        from umm.transfer import DirectoryTransfer
+        
+        udid = self.connected_device
+        service = self.file_service()
+        transfer = DirectoryTransfer(self.file_client(udid),
+                                     on_progress=lambda stats: self.tasks.post(dialog.update, stats))
+        verb = "Uploaded" if upload else "Downloaded"
+        
+        def finished(stats):
+            summary = stats.summary(verb)
+            dialog.finish(summary + "".join(f"\n{path}: {error}" for path, error in stats.errors[:5]))
+            self.status_var.set(summary)
+            if upload:
+                # Refresh file listing
+                self.files_changed(udid, service, destination,
+                                   [os.path.basename(os.path.normpath(item)) for item in items])
+        
+        def failed(e):
+            dialog.finish(f"Transfer failed: {e}")
+            self.status_var.set(f"Error transferring files: {e}")
         
-        if not save_path:
+        dialog = TransferProgressDialog(self.root, "Uploading" if upload else "Downloading", transfer.cancel)
+        run = transfer.upload if upload else transfer.download
+        self.tasks.submit(run, items, destination, label="Uploading files" if upload else "Downloading files",
+                          on_done=finished, on_error=failed)
+    
+    def sync_folder(self):
+        """Sync a local folder with the current device folder, copying only what differs"""
+        if not self.connected_device:
+            messagebox.showinfo("No Device", "No device connected")
             return
         
-        try:
-            # Use sftp-server or AFC to download file (simplified example)
-            result = subprocess.run(["idevicefs", "-u", self.connected_device, "get", source_path, save_path], 
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                self.status_var.set(f"Downloaded {file_name} to {save_path}")
-            else:
-                self.status_var.set(f"Error downloading file: {result.stderr}")
+        from umm.dialogs import SyncDialog
+        remote_path = self.path_var.get()
+        
+        def preview(local, direction, checksum, delete):
+            self.tasks.submit(self.folder_sync(local, remote_path, direction, checksum, delete).plan, True,
+                              label="Comparing folders", on_done=dialog.show_plan,
+                              on_error=lambda e: self.status_var.set(f"Error comparing folders: {e}"))
         
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
-            self.status_var.set(f"Error downloading file: {e}")
+        def start(local, direction, checksum, delete):
+            self.start_sync(self.folder_sync(local, remote_path, direction, checksum, delete))
+        
+        # Devices cannot hash files with SHA-256, so there is no checksum option
+        dialog = SyncDialog(self.root, remote_path, preview, start, can_hash=False)
+    
+    def folder_sync(self, local, remote_path, direction, checksum, delete, on_progress=None):
+        """A FolderSync between a local folder and a folder on the connected device"""
+        from umm.sync import DEFAULT_SYNC_PATH, FolderSync, SyncManifest
+        
+        if self.sync_manifest is None:
+            self.sync_manifest = SyncManifest(DEFAULT_SYNC_PATH)
+        sync = FolderSync(self.file_client(self.connected_device), local, remote_path, direction,
+                          checksum, delete, self.sync_manifest, on_progress=on_progress)
+        # Remembered so start_sync invalidates the listings of the device and service it ran against
+        sync.udid = self.connected_device
+        sync.service = self.file_service()
+        return sync
+    
+    def start_sync(self, sync):
+        """Run a FolderSync with a progress dialog, then refresh the listing"""
+        from umm.dialogs import TransferProgressDialog
+        
+        sync.transfer.on_progress = lambda stats: self.tasks.post(dialog.update, stats)
+        
+        def finished(result):
+            actions, stats = result
+            conflicts = [path for action, path, _, _ in actions if action == "conflict"]
+            deleted = sum(1 for action, _, _, _ in actions if action.startswith("delete"))
+            summary = stats.summary("Synced") if actions else "Already in sync"
+            if deleted:
+                summary += f", {deleted} deleted"
+            if conflicts:
+                summary += f", {len(conflicts)} changed on both sides and left alone"
+            dialog.finish(summary + "".join(f"\n{path}: {error}" for path, error in stats.errors[:5]))
+            self.status_var.set(summary)
+            self.files_changed(sync.udid, sync.service, sync.remote_root)
+        
+        def failed(e):
+            dialog.finish(f"Sync failed: {e}")
+            self.status_var.set(f"Error syncing folder: {e}")
+        
+        dialog = TransferProgressDialog(self.root, "Syncing", sync.cancel)
+        self.tasks.submit(sync.run, label="Syncing folder", on_done=finished, on_error=failed)
     
     def delete_file(self):
         """Delete a selected file from the device"""
@@ -1059,32 +1486,30 @@ class IOSDeviceManager:
             return
         
         # Get selected file
-        selected = self.file_tree.selection()
+        selected = self.file_browser.selected_entries()
         if not selected:
             messagebox.showinfo("No Selection", "Please select a file to delete")
             return
         
-        file_name = self.file_tree.item(selected[0], "text")
-        current_path = self.path_var.get()
-        file_path = f"{current_path}/{file_name}"
+        file_path = selected[0][0]
+        file_name = posixpath.basename(file_path)
         
         if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {file_name}?"):
             return
         
-        try:
-            # Use sftp-server or AFC to delete file (simplified example)
-            result = subprocess.run(["idevicefs", "-u", self.connected_device, "rm", file_path], 
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=10)
-            
-            if result.returncode == 0:
-                self.status_var.set(f"Deleted {file_name}")
-                # Refresh file listing
-                self.list_files(current_path)
-            else:
-                self.status_var.set(f"Error deleting file: {result.stderr}")
+        udid = self.connected_device
+        service = self.file_service()
         
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
-            self.status_var.set(f"Error deleting file: {e}")
+        def finished(result):
+            self.status_var.set(f"Deleted {file_name}")
+            # Drop the entry where it is rather than listing the folder again
+            self.listing_cache.discard(udid, service, file_path)
+            if udid == self.connected_device and service == self.file_service():
+                self.file_browser.remove(file_path)
+        
+        self.tasks.submit(self.file_client(udid).remove, file_path,
+                          label=f"Deleting {file_name}", on_done=finished,
+                          on_error=lambda e: self.status_var.set(f"Error deleting file: {e}"))
     
     def refresh_apps(self):
         """Refresh the list of installed applications"""
@@ -1092,113 +1517,171 @@ class IOSDeviceManager:
             messagebox.showinfo("No Device", "No device connected")
             return
         
-        try:
-            # Clear existing items
-            for item in self.apps_tree.get_children():
-                self.apps_tree.delete(item)
-            
-            # Get list of installed apps
-            result = subprocess.run(["ideviceinstaller", "-u", self.connected_device, "-l"], 
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=10)
-            
-            if result.returncode != 0:
-                self.status_var.set(f"Error listing applications: {result.stderr}")
-                return
-            
-            # Parse output and add to tree
-            lines = result.stdout.splitlines()
-            for line in lines[1:]:  # Skip header line
-                if line.strip():
-                    parts = line.split(" - ")
-                    if len(parts) >= 2:
-                        bundle_id = parts[0].strip()
-                        app_name = parts[1].strip()
-                        version = parts[2].strip() if len(parts) > 2 else "Unknown"
-                        
-                        self.apps_tree.insert("", "end", text=app_name, values=(bundle_id, version))
-            
-            self.status_var.set("Application list refreshed")
+        # The listing the command line uses: installation_proxy, or ideviceinstaller without usbmuxd
+        from umm.ios import list_apps
+        
+        udid = self.connected_device
+        self.tasks.submit(list_apps, udid, label="Listing applications",
+                          on_done=lambda rows: self.show_apps(udid, rows),
+                          on_error=lambda e: self.status_var.set(f"Error listing applications: {e}"))
+    
+    def show_apps(self, udid, rows):
+        """Fill the app tree with a finished listing"""
+        if udid != self.connected_device:
+            return
+        
+        # Clear existing items
+        for item in self.apps_tree.get_children():
+            self.apps_tree.delete(item)
         
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
-            self.status_var.set(f"Error listing applications: {e}")
+        for app_name, bundle_id, version in rows:
+            self.apps_tree.insert("", "end", text=app_name, values=(bundle_id, version))
+        
+        self.status_var.set("Application list refreshed")
     
     def install_ipa(self):
-        """Install an IPA file on the device"""
+        """Install one or more IPA files on the device"""
         if not self.connected_device:
             messagebox.showinfo("No Device", "No device connected")
             return
         
-        # Ask for IPA file
-        ipa_path = filedialog.askopenfilename(
-            title="Select IPA File",
+        if self.bulk_install:
+            if messagebox.askyesno("Install Running", "IPAs are being installed. Stop after the current one?"):
+                self.bulk_install.cancel()
+            return
+        
+        from umm.installqueue import InstallQueue, DEFAULT_QUEUE_PATH
+        from umm.ledger import InstallLedger, DEFAULT_LEDGER_PATH
+        if self.install_ledger is None:
+            self.install_ledger = InstallLedger(DEFAULT_LEDGER_PATH)
+        if self.install_queue is None:
+            self.install_queue = InstallQueue(DEFAULT_QUEUE_PATH)
+        
+        # IPAs left over from an interrupted batch on this device come first
+        udid = self.connected_device
+        pending = self.install_queue.pending("ios").get(udid)
+        if pending:
+            answer = messagebox.askyesnocancel(
+                "Resume Installs",
+                f"{len(pending)} IPA install(s) on this device were left unfinished.\n\n"
+                "Resume them now? Choose No to discard them."
+            )
+            if answer is None:
+                return
+            if answer:
+                self.start_ipa_batch(udid, None)
+                return
+            for job_id, _ in pending:
+                self.install_queue.remove(job_id)
+        
+        # Ask for IPA files
+        ipa_paths = filedialog.askopenfilenames(
+            title="Select IPA Files",
             filetypes=[("IPA Files", "*.ipa")]
         )
         
-        if not ipa_path:
+        if not ipa_paths:
             return
+        if len(ipa_paths) > 1:
+            self.start_ipa_batch(udid, list(ipa_paths))
+            return
+        ipa_path = ipa_paths[0]
+        
+        # Hashing and the device lookup run on a worker; an unchanged build is not sent again
+        self.status_var.set(f"Checking {os.path.basename(ipa_path)}...")
+        self.tasks.submit(
+            self.check_ipa_build, udid, ipa_path, label=f"Checking {os.path.basename(ipa_path)}",
+            on_done=lambda checked: self.ipa_build_checked(udid, ipa_path, *checked)
+        )
+    
+    def check_ipa_build(self, udid, ipa_path):
+        """Identify an IPA and check whether the device already has that exact build"""
+        from umm.ios import is_build_installed
+        from umm.packages import ipa_identity
         
         try:
-            # Start installation
-            self.status_var.set(f"Installing {os.path.basename(ipa_path)}...")
-            self.root.update_idletasks()
-            
-            # Use ideviceinstaller to install the IPA
-            process = subprocess.Popen(
-                ["ideviceinstaller", "-u", self.connected_device, "-i", ipa_path],
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
-            
-            # Show progress dialog
-            progress_window = tk.Toplevel(self.root)
-            progress_window.title("Installation Progress")
-            progress_window.geometry("400x150")
-            progress_window.transient(self.root)
-            progress_window.grab_set()
-            
-            ttk.Label(progress_window, text=f"Installing {os.path.basename(ipa_path)}...").pack(pady=10)
-            progress = ttk.Progressbar(progress_window, mode="indeterminate")
-            progress.pack(fill=tk.X, padx=20, pady=10)
-            progress.start()
-            
-            log_text = scrolledtext.ScrolledText(progress_window, height=5)
-            log_text.pack(fill=tk.BOTH, expand=True, padx=20, pady=5)
-            
-            # Function to read output and update progress
-            def read_output():
-                while process.poll() is None:
-                    output = process.stdout.readline()
-                    if output:
-                        log_text.insert(tk.END, output)
-                        log_text.see(tk.END)
-                        self.root.update_idletasks()
-                
-                # Process completed
-                progress.stop()
-                
-                # Get final output and error
-                output, error = process.communicate()
-                if output:
-                    log_text.insert(tk.END, output)
-                
-                if error:
-                    log_text.insert(tk.END, f"\nError: {error}")
-                
-                # Change the progress dialog to a completion dialog
-                progress.pack_forget()
-                ttk.Button(progress_window, text="Close", command=progress_window.destroy).pack(pady=10)
-                
-                if process.returncode == 0:
-                    self.status_var.set("Installation completed successfully")
-                    # Refresh app list
-                    self.refresh_apps()
-                else:
-                    self.status_var.set(f"Installation failed with code {process.returncode}")
-            
-            # Start the output reading thread
-            threading.Thread(target=read_output, daemon=True).start()
-            
-        except Exception as e:
+            build = self.install_ledger.identify([ipa_path], ipa_identity)
+        except ValueError:
+            # Unreadable packages are installed without the ledger
+            return None, False
+        return build, is_build_installed(self.install_ledger, udid, build)
+    
+    def ipa_build_checked(self, udid, ipa_path, build, installed):
+        """Install an IPA unless the same build is present and the user keeps it"""
+        if installed and not messagebox.askyesno(
+                "Already Installed",
+                f"{build[0]} build {build[1]} from this exact file is already installed.\n\nReinstall anyway?"):
+            self.status_var.set(f"{os.path.basename(ipa_path)} is already installed")
+            return
+        
+        self.start_ipa_install(udid, ipa_path, build)
+    
+    def start_ipa_install(self, udid, ipa_path, build):
+        """Install an IPA, following ideviceinstaller's output in a progress dialog"""
+        ipa_name = os.path.basename(ipa_path)
+        self.status_var.set(f"Installing {ipa_name}...")
+        dialog = self.show_progress_dialog("Installation Progress", f"Installing {ipa_name}...")
+        
+        def finished(result):
+            returncode, error = result
+            self.finish_progress_dialog(dialog, error)
+            if returncode == 0:
+                self.status_var.set("Installation completed successfully")
+                if build:
+                    self.install_ledger.record(udid, build)
+                # Refresh app list
+                self.refresh_apps()
+            else:
+                self.status_var.set(f"Installation failed with code {returncode}")
+        
+        def failed(e):
+            self.finish_progress_dialog(dialog, e)
             self.status_var.set(f"Error installing IPA: {e}")
+        
+        # Use ideviceinstaller to install the IPA, following its output in the dialog
+        self.stream_tool(
+            udid, ["ideviceinstaller", "-u", udid, "-i", ipa_path],
+            label=f"Installing {ipa_name}",
+            on_line=lambda line: self.append_progress_output(dialog, line),
+            on_done=finished, on_error=failed
+        )
+    
+    def start_ipa_batch(self, udid, ipa_paths):
+        """Install several IPAs through the install queue, or resume the queued ones when ipa_paths is None"""
+        from umm.dialogs import InstallProgressDialog
+        from umm.installer import BulkInstall
+        from umm.ios import IpaInstaller
+        
+        def progress(stats):
+            self.tasks.post(dialog.update_device, stats)
+        
+        try:
+            if ipa_paths is None:
+                install = BulkInstall.resume(self.install_queue, IpaInstaller(), devices=[udid],
+                                             on_progress=progress, ledger=self.install_ledger)
+            else:
+                install = BulkInstall(None, [udid], [[ipa_path] for ipa_path in ipa_paths], installer=IpaInstaller(),
+                                      on_progress=progress, ledger=self.install_ledger, queue=self.install_queue)
+        except OSError as e:
+            messagebox.showerror("Install Error", f"Cannot read IPA: {e}")
+            return
+        
+        def finished(stats):
+            self.bulk_install = None
+            summary = install.summary()
+            dialog.finish(summary)
+            self.status_var.set(summary)
+            self.refresh_apps()
+        
+        def failed(e):
+            self.bulk_install = None
+            dialog.finish(f"Install failed: {e}")
+            self.status_var.set(f"Error installing IPAs: {e}")
+        
+        self.bulk_install = install
+        dialog = InstallProgressDialog(self.root, install.serials, install.cancel)
+        self.status_var.set("Installing IPAs...")
+        self.tasks.submit(install.run, label="Installing IPAs", on_done=finished, on_error=failed)
     
     def uninstall_app(self):
         """Uninstall selected application"""
@@ -1218,11 +1701,7 @@ class IOSDeviceManager:
         if not messagebox.askyesno("Confirm Uninstall", f"Are you sure you want to uninstall {app_name}?"):
             return
         
-        try:
-            # Use ideviceinstaller to uninstall the app
-            result = subprocess.run(["ideviceinstaller", "-u", self.connected_device, "-U", bundle_id], 
-                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=30)
-            
+        def finished(result):
             if result.returncode == 0:
                 self.status_var.set(f"Uninstalled {app_name}")
                 # Refresh app list
@@ -1230,8 +1709,12 @@ class IOSDeviceManager:
             else:
                 self.status_var.set(f"Error uninstalling app: {result.stderr}")
         
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
-            self.status_var.set(f"Error uninstalling app: {e}")
+        # Use ideviceinstaller to uninstall the app
+        self.run_tool(
+            self.connected_device, ["ideviceinstaller", "-u", self.connected_device, "-U", bundle_id], 30,
+            label=f"Uninstalling {app_name}", on_done=finished,
+            on_error=lambda e: self.status_var.set(f"Error uninstalling app: {e}")
+        )
     
     def start_logging(self):
         """Start device logging"""
@@ -1240,46 +1723,100 @@ class IOSDeviceManager:
             return
         
         # Clear log text
-        self.log_text.delete(1.0, tk.END)
-        
-        # Start log collection in a thread
-        self.logging_active = True
-        log_thread = threading.Thread(target=self._logging_thread, daemon=True)
-        log_thread.start()
+        self.log_buffer.clear()
+        self.log_view.set_buffer(self.log_buffer)
+        
+        from umm.logstore import LogStore, LogWriter, DEFAULT_LOG_DIR
+        
+        # Only one syslog stream at a time
+        if self.logging_future:
+            self.logging_future.cancel()
+        if self.log_writer:
+            # Everything the previous stream captured goes into its store first
+            self.log_writer.close(wait=True)
+        
+        # Keep the full history on disk, per device
+        store_dir = os.path.join(DEFAULT_LOG_DIR, self.connected_device)
+        if self.log_store is None or self.log_store.directory != store_dir:
+            if self.log_store:
+                self.log_store.close()
+            self.log_store = LogStore(store_dir)
+        
+        # Stream idevicesyslog on the command engine. The callback runs on the
+        # engine's event loop, so it only queues lines for the store's writer thread
+        writer = self.log_writer = LogWriter(self.log_store)
+        def collect(line):
+            # The log view picks new lines up on its next frame
+            self.log_buffer.append(line)
+            writer.append(line)
+        
+        self.logging_future = self.engine.stream(["idevicesyslog", "-u", self.connected_device], collect,
+                                                 device=self.connected_device)
+        self.logging_future.add_done_callback(lambda f: writer.close())
+        self.tasks.watch(self.logging_future, on_error=lambda e: self.status_var.set(f"Logging error: {e}"))
         
         self.status_var.set("Logging started")
     
-    def _logging_thread(self):
+    def set_log_line_cap(self):
+        """Apply the line cap entered in the Logs tab"""
         try:
-            process = subprocess.Popen(["idevicesyslog"], 
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            
-            while self.logging_active:
-                line = process.stdout.readline()
-                if not line:
-                    break
-                
-                # Update log text in main thread
-                self.root.after(0, lambda l=line: self._append_log(l))
-            
-            # Kill process when stopped
-            process.kill()
-        except Exception as e:
-            self.root.after(0, lambda e=e: self.status_var.set(f"Logging error: {e}"))
+            max_lines = int(self.log_max_lines_var.get())
+        except ValueError:
+            self.log_max_lines_var.set(str(self.log_buffer.max_lines))
+            return
+        
+        self.log_buffer.set_max_lines(max_lines)
+        self.status_var.set(f"Keeping the last {max_lines} log lines")
+    
+    def search_logs(self):
+        """Search the stored log history with the filters from the Logs tab"""
+        if self.log_store is None:
+            messagebox.showinfo("No Logs", "No log history has been captured yet")
+            return
+        
+        pattern = self.log_search_var.get().strip() or None
+        process = self.log_process_var.get().strip() or None
+        level = self.log_level_var.get()
+        level = None if level == "All" else level
+        
+        try:
+            re.compile(pattern or "")
+        except re.error as e:
+            messagebox.showerror("Invalid Pattern", f"Invalid regular expression: {e}")
+            return
+        
+        self.tasks.submit(self.search_log_store, pattern, process, level, label="Searching log history",
+                          on_done=lambda found: self.show_search_results(*found),
+                          on_error=lambda e: self.status_var.set(f"Log search error: {e}"))
+    
+    def search_log_store(self, pattern, process, level):
+        """Run a history search on a worker; returns (results, elapsed seconds)"""
+        results = LogBuffer()
+        started = time.time()
+        results.extend(self.log_store.search(pattern, process, level, limit=DEFAULT_MAX_LINES))
+        return results, time.time() - started
+    
+    def show_search_results(self, results, elapsed):
+        """Show search results in place of the live log"""
+        self.log_view.set_buffer(results)
+        self.status_var.set(f"Found {len(results)} matching line(s) in {elapsed:.2f}s")
     
-    def _append_log(self, line):
-        """Append line to log text"""
-        self.log_text.insert(tk.END, line)
-        self.log_text.see(tk.END)
+    def show_live_logs(self):
+        """Switch the log view back to the live stream"""
+        self.log_view.set_buffer(self.log_buffer)
+        self.status_var.set("Showing live log")
     
     def stop_logging(self):
         """Stop device logging"""
-        self.logging_active = False
+        if self.logging_future:
+            # Cancelling the stream kills idevicesyslog
+            self.logging_future.cancel()
+            self.logging_future = None
         self.status_var.set("Logging stopped")
     
     def clear_logs(self):
         """Clear log text"""
-        self.log_text.delete(1.0, tk.END)
+        self.log_buffer.clear()
         self.status_var.set("Logs cleared")
 
 def main():
@@ -0,0 +1,67 @@
+"""Fixtures serving in-process fake device servers, so the tests need no devices or tools"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from umm.fake_adb import FakeAdbServer, FakeDevice
+from umm.fake_usbmux import FakeIOSDevice, FakeUsbmuxServer
+
+
+def wait_until(predicate, timeout=5):
+    """Poll predicate until it is true; fails the test when timeout seconds pass first"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            pytest.fail("condition not reached in time")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def adb_server():
+    server = FakeAdbServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def android_device(adb_server):
+    return adb_server.add_device(FakeDevice("FAKE0001"))
+
+
+@pytest.fixture
+def adb(adb_server):
+    from umm.adb import AdbClient
+
+    return AdbClient(port=adb_server.port)
+
+
+@pytest.fixture
+def usbmux_server():
+    server = FakeUsbmuxServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def usbmux(usbmux_server):
+    from umm.usbmux import UsbmuxClient
+
+    return UsbmuxClient(address=usbmux_server.address)
+
+
+@pytest.fixture
+def ios_device(usbmux_server):
+    return usbmux_server.add_device(FakeIOSDevice("UDID-A"))
+
+
+@pytest.fixture
+def afc(usbmux, ios_device):
+    from umm.afc import open_afc
+
+    client = open_afc(ios_device.udid, usbmux)
+    yield client
+    client.close()
@@ -0,0 +1,120 @@
+"""AdbClient's sync transfers and DeviceTracker's track-devices stream against umm.fake_adb"""
+import os
+
+import pytest
+
+from conftest import wait_until
+from umm.adb import SYNC_DATA_MAX, AdbError, DeviceTracker
+from umm.fake_adb import FakeAdbServer, FakeDevice
+
+
+def test_push_then_pull_round_trips_a_multi_chunk_file(adb, android_device, tmp_path):
+    data = os.urandom(3 * SYNC_DATA_MAX + 123)
+    source = tmp_path / "source.bin"
+    source.write_bytes(data)
+    os.utime(source, (1600000000, 1600000000))
+
+    pushed = []
+    adb.push("FAKE0001", str(source), "/sdcard/data.bin", progress=pushed.append)
+    contents, mode, mtime = android_device.files["/sdcard/data.bin"]
+    assert contents == data
+    assert mode & 0o777 == os.stat(source).st_mode & 0o777
+    assert mtime == 1600000000
+    assert sum(pushed) == len(data)
+
+    pulled = []
+    target = tmp_path / "target.bin"
+    adb.pull("FAKE0001", "/sdcard/data.bin", str(target), progress=pulled.append)
+    assert target.read_bytes() == data
+    assert sum(pulled) == len(data)
+    assert not os.path.exists(str(target) + ".part")
+
+
+def test_sync_connections_are_reused_between_transfers(adb, adb_server, android_device, tmp_path):
+    source = tmp_path / "small.txt"
+    source.write_bytes(b"hello")
+    adb.push("FAKE0001", str(source), "/sdcard/0.txt")
+    connections = adb_server.connections
+
+    for index in range(1, 6):
+        adb.push("FAKE0001", str(source), f"/sdcard/{index}.txt")
+        adb.pull("FAKE0001", f"/sdcard/{index}.txt", str(tmp_path / f"{index}.txt"))
+
+    assert adb_server.connections == connections
+    assert len(android_device.files) == 6
+
+
+def test_failed_pull_keeps_the_existing_local_file(adb, android_device, tmp_path):
+    target = tmp_path / "keep.txt"
+    target.write_bytes(b"good copy")
+
+    with pytest.raises(AdbError, match="No such file"):
+        adb.pull("FAKE0001", "/sdcard/missing.txt", str(target))
+
+    assert target.read_bytes() == b"good copy"
+    assert os.listdir(tmp_path) == ["keep.txt"]
+
+
+def test_sync_connection_is_dropped_after_an_error(adb, android_device, tmp_path):
+    with pytest.raises(AdbError):
+        adb.pull("FAKE0001", "/sdcard/missing.txt", str(tmp_path / "x"))
+
+    android_device.files["/sdcard/there.txt"] = (b"ok", 0o100644, 0)
+    adb.pull("FAKE0001", "/sdcard/there.txt", str(tmp_path / "there.txt"))
+    assert (tmp_path / "there.txt").read_bytes() == b"ok"
+
+
+def test_push_to_unknown_device_fails(adb, tmp_path):
+    source = tmp_path / "a.txt"
+    source.write_bytes(b"a")
+    with pytest.raises(AdbError):
+        adb.push("NOSUCHDEVICE", str(source), "/sdcard/a.txt")
+
+
+def serials(devices):
+    return [device["id"] for device in devices]
+
+
+def test_tracker_reports_devices_as_they_come_and_go(adb_server):
+    changes = []
+    tracker = DeviceTracker(changes.append, port=adb_server.port, reconnect_delay=0.05)
+    tracker.start()
+    try:
+        adb_server.add_device(FakeDevice("FAKE0001"))
+        wait_until(lambda: changes and serials(changes[-1]) == ["FAKE0001"])
+        assert changes[-1][0]["status"] == "device"
+
+        adb_server.add_device(FakeDevice("FAKE0002", state="unauthorized"))
+        wait_until(lambda: len(changes[-1]) == 2)
+        assert {device["id"]: device["status"] for device in changes[-1]} == {
+            "FAKE0001": "device", "FAKE0002": "unauthorized"}
+
+        adb_server.remove_device("FAKE0001")
+        wait_until(lambda: serials(changes[-1]) == ["FAKE0002"])
+    finally:
+        tracker.stop()
+
+
+def test_tracker_reconnects_after_the_server_restarts(adb_server):
+    adb_server.add_device(FakeDevice("FAKE0001"))
+    port = adb_server.port
+    changes = []
+    tracker = DeviceTracker(changes.append, port=port, reconnect_delay=0.05)
+    tracker.start()
+    try:
+        wait_until(lambda: changes and serials(changes[-1]) == ["FAKE0001"])
+
+        # Losing the server means losing every device
+        adb_server.stop()
+        wait_until(lambda: changes[-1] == [])
+        assert not tracker.connected
+
+        restarted = FakeAdbServer(port).start()
+        try:
+            restarted.add_device(FakeDevice("FAKE0003"))
+            wait_until(lambda: changes[-1] and serials(changes[-1]) == ["FAKE0003"])
+            assert tracker.connected
+        finally:
+            restarted.stop()
+    finally:
+        tracker.stop()
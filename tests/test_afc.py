@@ -0,0 +1,165 @@
+"""AfcClient and AfcSessions against the AFC service of umm.fake_usbmux"""
+import os
+import threading
+import time
+
+import pytest
+
+from umm.afc import CHUNK_SIZE, AfcClient, AfcError, AfcSessions, AFC_E_OBJECT_NOT_FOUND, AFC_OP_READ_DIR
+from umm.fake_usbmux import FakeIOSDevice
+from umm.lockdown import LOCKDOWN_PORT
+
+
+def test_listing_and_stat(afc, ios_device):
+    ios_device.add_file("/DCIM/100APPLE/IMG_0001.JPG", b"x" * 1500, mtime=1700000000)
+    ios_device.add_file("/DCIM/100APPLE/IMG_0002.JPG", b"y" * 10, mtime=1700000100)
+    ios_device.add_directory("/Downloads")
+
+    assert afc.readdir("/") == ["DCIM", "Downloads"]
+    assert afc.stat("/DCIM/100APPLE/IMG_0001.JPG") == {"is_dir": False, "is_link": False, "size": 1500,
+                                                        "mtime": 1700000000}
+    assert afc.stat("/DCIM")["is_dir"]
+    assert [(name, is_dir, size) for name, is_dir, size, _ in afc.listdir("/DCIM/100APPLE")] == [
+        ("IMG_0001.JPG", False, 1500), ("IMG_0002.JPG", False, 10)]
+    assert afc.scan("/DCIM") == {
+        "100APPLE": (True, 64, 0),
+        "100APPLE/IMG_0001.JPG": (False, 1500, 1700000000),
+        "100APPLE/IMG_0002.JPG": (False, 10, 1700000100),
+    }
+    with pytest.raises(AfcError):
+        afc.scan("/Missing")
+
+
+def test_errors_carry_the_afc_code(afc, ios_device):
+    ios_device.add_file("/Documents/notes.txt", b"notes")
+
+    with pytest.raises(AfcError) as error:
+        afc.stat("/Documents/missing.txt")
+    assert error.value.code == AFC_E_OBJECT_NOT_FOUND
+
+    # A folder with something in it is only removed with remove_tree
+    with pytest.raises(AfcError):
+        afc.remove("/Documents")
+    afc.remove_tree("/Documents")
+    assert "/Documents/notes.txt" not in ios_device.files
+
+    with pytest.raises(AfcError) as error:
+        afc.open_file("/Nowhere/file.txt", 3)
+    assert error.value.code == AFC_E_OBJECT_NOT_FOUND
+
+
+def test_get_and_put_round_trip(afc, ios_device, tmp_path):
+    data = os.urandom(3 * CHUNK_SIZE + 12345)
+    source = tmp_path / "upload.bin"
+    source.write_bytes(data)
+    os.utime(source, (1600000000, 1600000000))
+
+    sent = []
+    afc.mkdir("/Uploads")
+    afc.put(str(source), "/Uploads/file.bin", len(data), progress=sent.append)
+    assert ios_device.files["/Uploads/file.bin"] == (data, 1600000000)
+    assert sum(sent) == len(data)
+
+    received = []
+    target = tmp_path / "download.bin"
+    afc.get("/Uploads/file.bin", str(target), len(data), progress=received.append)
+    assert target.read_bytes() == data
+    assert sum(received) == len(data)
+    assert not os.path.exists(str(target) + ".part")
+
+
+def test_get_reads_past_a_stale_size(afc, ios_device, tmp_path):
+    data = os.urandom(2 * CHUNK_SIZE + 1)
+    ios_device.add_file("/grown.bin", data)
+
+    target = tmp_path / "grown.bin"
+    afc.get("/grown.bin", str(target), CHUNK_SIZE)
+    assert target.read_bytes() == data
+
+
+def test_reads_and_writes_are_pipelined(afc, ios_device, tmp_path):
+    data = os.urandom(8 * CHUNK_SIZE)
+    ios_device.add_file("/big.bin", data)
+    ios_device.afc_latency = 0.1
+    target = tmp_path / "big.bin"
+
+    # One request at a time would wait out the latency for each of the nine reads
+    started = time.monotonic()
+    afc.get("/big.bin", str(target), len(data))
+    assert time.monotonic() - started < 0.8
+    assert target.read_bytes() == data
+
+    started = time.monotonic()
+    afc.put(str(target), "/copy.bin", len(data))
+    assert time.monotonic() - started < 0.8
+    assert ios_device.files["/copy.bin"][0] == data
+
+
+def test_failed_get_keeps_the_local_file(afc, tmp_path):
+    target = tmp_path / "photo.jpg"
+    target.write_bytes(b"earlier copy")
+
+    with pytest.raises(AfcError):
+        afc.get("/missing.jpg", str(target), 100)
+    assert target.read_bytes() == b"earlier copy"
+    assert os.listdir(tmp_path) == ["photo.jpg"]
+
+
+def test_failed_put_leaves_nothing_behind(afc, ios_device, tmp_path):
+    with pytest.raises(OSError):
+        afc.put(str(tmp_path / "missing.bin"), "/partial.bin", 100)
+    assert "/partial.bin" not in ios_device.files
+
+
+def test_close_fails_waiting_requests(afc, ios_device):
+    ios_device.afc_latency = 1
+    future = afc.submit(AFC_OP_READ_DIR, b"/\0")
+
+    afc.close()
+    assert afc.closed
+    with pytest.raises(AfcError, match="session ended"):
+        future.result(timeout=1)
+    with pytest.raises(AfcError, match="session ended"):
+        afc.readdir("/")
+
+
+def test_sessions_are_shared_and_reopened(usbmux, ios_device):
+    ios_device.add_file("/a.txt", b"a")
+    sessions = AfcSessions(usbmux)
+    try:
+        files = sessions.files(ios_device.udid)
+        assert files.readdir("/") == ["a.txt"]
+        first = sessions.get(ios_device.udid)
+        assert isinstance(first, AfcClient)
+        assert sessions.get(ios_device.udid) is first
+
+        first.close()
+        assert files.readdir("/") == ["a.txt"]
+        assert sessions.get(ios_device.udid) is not first
+    finally:
+        sessions.close()
+
+
+def test_a_slow_device_does_not_hold_up_other_sessions(usbmux, usbmux_server, ios_device):
+    slow = FakeIOSDevice("UDID-SLOW")
+    answer = slow.lockdown
+    slow.services[LOCKDOWN_PORT] = lambda sock: (time.sleep(1), answer(sock))
+    usbmux_server.add_device(slow)
+    sessions = AfcSessions(usbmux)
+    try:
+        opening = [threading.Thread(target=sessions.get, args=("UDID-SLOW",)) for _ in range(2)]
+        for thread in opening:
+            thread.start()
+        time.sleep(0.1)
+
+        started = time.monotonic()
+        assert sessions.get(ios_device.udid).readdir("/") == []
+        assert time.monotonic() - started < 0.5
+
+        for thread in opening:
+            thread.join()
+        # Both callers opened a session; only one is kept and the other was closed
+        assert sessions.get("UDID-SLOW") is sessions.get("UDID-SLOW")
+        assert len(sessions.sessions) == 2
+    finally:
+        sessions.close()
@@ -0,0 +1,51 @@
+"""DeviceMetadataCache freshness, invalidation and SQLite persistence"""
+import time
+
+from umm.cache import PERSISTED_TTL, DeviceMetadataCache
+
+
+def test_fields_expire_by_ttl():
+    cache = DeviceMetadataCache(ttls={"name": 600, "model": None, "battery": 0})
+    cache.update("SERIAL", {"name": "Phone", "model": "Pixel", "battery": 80})
+
+    assert cache.get("SERIAL", "name") == "Phone"
+    assert cache.get("SERIAL", "model") == "Pixel"
+    assert cache.get("SERIAL", "battery") is None
+    assert cache.get_many("SERIAL", ["name", "model"]) == {"name": "Phone", "model": "Pixel"}
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+def test_invalidate_keeps_devices_known(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = DeviceMetadataCache(path)
+    cache.update("SERIAL", {"name": "Phone", "model": "Pixel"})
+
+    cache.invalidate("SERIAL")
+    assert cache.get("SERIAL", "name") is None
+    assert cache.known_devices() == {"SERIAL": {"name": "Phone", "model": "Pixel"}}
+    # A disconnect does not take the device off the next start's list
+    assert DeviceMetadataCache(path).known_devices() == {"SERIAL": {"name": "Phone", "model": "Pixel"}}
+
+
+def test_persisted_fields_stay_fresh_within_their_ttl(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite3")
+    DeviceMetadataCache(path).update("SERIAL", {"name": "Phone", "model": "Pixel"})
+
+    restarted = DeviceMetadataCache(path)
+    assert restarted.get("SERIAL", "name") == "Phone"
+    assert restarted.get("SERIAL", "model") == "Pixel"
+
+    # Fields otherwise kept until disconnect are not trusted from disk forever
+    later = time.time() + PERSISTED_TTL + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert restarted.get("SERIAL", "model") is None
+    assert restarted.known_devices() == {"SERIAL": {"name": "Phone", "model": "Pixel"}}
+
+
+def test_broken_cache_file_is_ignored(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    path.write_bytes(b"not a database")
+
+    cache = DeviceMetadataCache(str(path))
+    cache.set("SERIAL", "name", "Phone")
+    assert cache.get("SERIAL", "name") == "Phone"
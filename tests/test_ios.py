@@ -0,0 +1,55 @@
+"""IpaInstaller staging over AFC and installing through installation_proxy, against umm.fake_usbmux"""
+import os
+
+from umm.fake_usbmux import synthetic_ipa
+from umm.installer import BulkInstall
+from umm.ios import IpaInstaller
+
+
+def test_stage_install_and_cleanup(usbmux, ios_device, tmp_path):
+    ipa = synthetic_ipa(str(tmp_path / "app.ipa"), "com.example.app", "3", {"Payload/Fake.app/Fake": b"x" * 5000})
+    installer = IpaInstaller(usbmux)
+
+    sent = []
+    staged = installer.stage(ios_device.udid, 0, [ipa], progress=sent.append)
+    assert staged == ["PublicStaging/staged_0_app.ipa"]
+    assert ios_device.files["/PublicStaging/staged_0_app.ipa"][0] == open(ipa, "rb").read()
+    assert sum(sent) == os.path.getsize(ipa)
+
+    result = installer.install(ios_device.udid, [ipa], staged)
+    assert result.returncode == 0
+    assert installer.installed_version(ios_device.udid, "com.example.app") == "3"
+
+    installer.cleanup(ios_device.udid, staged)
+    assert "/PublicStaging/staged_0_app.ipa" not in ios_device.files
+
+
+def test_install_reports_installd_errors(usbmux, ios_device):
+    result = IpaInstaller(usbmux).install(ios_device.udid, ["gone.ipa"], ["PublicStaging/gone.ipa"])
+    assert result.returncode == 1
+    assert "PackageInspectionFailed" in result.stderr
+
+
+def test_bulk_install_stages_the_next_ipa_during_an_install(usbmux, ios_device, tmp_path):
+    ipas = [synthetic_ipa(str(tmp_path / f"app{i}.ipa"), f"com.example.app{i}", "1") for i in range(3)]
+    ios_device.install_seconds = 0.3
+    events = []
+
+    class RecordingInstaller(IpaInstaller):
+        def stage(self, udid, index, ipa_paths, progress=None):
+            events.append(("stage", index))
+            return super().stage(udid, index, ipa_paths, progress)
+
+        def install(self, udid, ipa_paths, staged, replace=True, progress=None):
+            events.append(("install", staged[0]))
+            result = super().install(udid, ipa_paths, staged, replace, progress)
+            events.append(("installed", staged[0]))
+            return result
+
+    stats = BulkInstall(None, [ios_device.udid], [[ipa] for ipa in ipas], installer=RecordingInstaller(usbmux)).run()
+    assert stats[ios_device.udid].state == "Installed"
+    assert set(ios_device.apps) == {"com.example.app0", "com.example.app1", "com.example.app2"}
+    # Each IPA after the first was uploaded while the one before it was being installed
+    assert events.index(("stage", 1)) < events.index(("installed", "PublicStaging/staged_0_app0.ipa"))
+    assert events.index(("stage", 2)) < events.index(("installed", "PublicStaging/staged_1_app1.ipa"))
+    assert not [path for path in ios_device.files if path.startswith("/PublicStaging/")]
@@ -0,0 +1,135 @@
+"""LogStore sealing, filtered search, retention and journal recovery"""
+import gzip
+import os
+
+from umm.logstore import LogStore, LogWriter, parse_syslog_line
+
+
+def syslog(process, level, message):
+    return f"Mar 10 12:34:56 iPhone {process}(UIKit)[57] <{level}>: {message}"
+
+
+def segments(store):
+    return store.db.execute("SELECT path, first_ts, last_ts, lines FROM segments ORDER BY first_ts").fetchall()
+
+
+def test_parse_syslog_line():
+    assert parse_syslog_line(syslog("SpringBoard", "Notice", "hello")) == ("SpringBoard", "Notice")
+    assert parse_syslog_line("not a syslog line") == (None, None)
+
+
+def test_full_segments_are_sealed_and_indexed(tmp_path):
+    store = LogStore(str(tmp_path), segment_lines=10)
+    for index in range(25):
+        store.append(syslog("backboardd", "Info", f"line {index}"), timestamp=1000 + index)
+
+    sealed = segments(store)
+    assert [(first, last, lines) for _, first, last, lines in sealed] == [(1000, 1009, 10), (1010, 1019, 10)]
+    with gzip.open(sealed[0][0], "rt", encoding="utf-8") as f:
+        assert f.readline() == "1000.000\t" + syslog("backboardd", "Info", "line 0") + "\n"
+    assert len(store.open_lines) == 5
+    store.close()
+
+
+def test_segments_started_in_the_same_millisecond_keep_their_own_files(tmp_path):
+    store = LogStore(str(tmp_path), segment_lines=10)
+    for index in range(30):
+        store.append(f"line {index}", timestamp=1500)
+
+    assert len({path for path, _, _, _ in segments(store)}) == 3
+    assert list(store.search()) == [f"line {index}\n" for index in range(30)]
+    store.close()
+
+
+def test_search_filters_sealed_and_open_lines(tmp_path):
+    store = LogStore(str(tmp_path), segment_lines=4)
+    lines = [
+        syslog("SpringBoard", "Notice", "Unlocked the device"),
+        syslog("backboardd", "Error", "HID event dropped"),
+        syslog("SpringBoard", "Error", "Failed to launch app"),
+        syslog("locationd", "Info", "fix acquired"),
+        syslog("SpringBoard", "Info", "launch finished"),
+        "a line without syslog fields",
+    ]
+    for index, line in enumerate(lines):
+        store.append(line, timestamp=2000 + index)
+
+    assert list(store.search(process="SpringBoard", level="Error")) == [lines[2] + "\n"]
+    assert list(store.search(pattern="LAUNCH")) == [lines[2] + "\n", lines[4] + "\n"]
+    assert list(store.search(pattern=r"dropped|acquired")) == [lines[1] + "\n", lines[3] + "\n"]
+    assert list(store.search(since=2003, until=2004)) == [lines[3] + "\n", lines[4] + "\n"]
+    assert list(store.search(limit=2)) == [lines[0] + "\n", lines[1] + "\n"]
+    store.close()
+
+
+def test_search_skips_segments_that_cannot_match(tmp_path):
+    store = LogStore(str(tmp_path), segment_lines=2)
+    for index in range(6):
+        store.append(syslog("locationd", "Info", f"fix {index}"), timestamp=3000 + index)
+    store.append(syslog("SpringBoard", "Error", "needle"), timestamp=3010)
+    store.append(syslog("locationd", "Info", "fix 7"), timestamp=3011)
+
+    assert list(store.candidate_segments(process="SpringBoard")) == [segments(store)[-1][0]]
+    assert list(store.candidate_segments(required={"nee", "eed", "edl", "dle"})) == [segments(store)[-1][0]]
+    assert list(store.candidate_segments(since=3004, until=3005)) == [segments(store)[2][0]]
+    store.close()
+
+
+def test_retention_deletes_the_oldest_segments(tmp_path):
+    store = LogStore(str(tmp_path), segment_lines=50, max_bytes=10 ** 9)
+    for index in range(200):
+        store.append(syslog("kernel", "Info", os.urandom(40).hex()), timestamp=4000 + index)
+    sizes = [os.path.getsize(path) for path, _, _, _ in segments(store)]
+    assert len(sizes) == 4
+
+    store.max_bytes = sum(sizes[-2:])
+    store.enforce_retention()
+    kept = segments(store)
+    assert [first for _, first, _, _ in kept] == [4100, 4150]
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".gz")) == sorted(
+        os.path.basename(path) for path, _, _, _ in kept)
+    assert not store.db.execute("SELECT 1 FROM terms WHERE segment NOT IN (SELECT id FROM segments)").fetchone()
+    store.close()
+
+
+def test_lines_survive_a_crash_before_sealing(tmp_path):
+    store = LogStore(str(tmp_path), segment_lines=100)
+    for index in range(3):
+        store.append(syslog("SpringBoard", "Notice", f"line {index}"), timestamp=5000 + index)
+    # A kill mid-write leaves a torn last record
+    store.journal.write("5003.")
+    store.journal.flush()
+
+    recovered = LogStore(str(tmp_path), segment_lines=100)
+    assert [line for _, line in recovered.open_lines] == [
+        syslog("SpringBoard", "Notice", f"line {index}") for index in range(3)]
+    assert len(list(recovered.search(process="SpringBoard"))) == 3
+    recovered.close()
+
+
+def test_journal_already_sealed_is_not_sealed_twice(tmp_path):
+    store = LogStore(str(tmp_path), segment_lines=100)
+    store.append("first", timestamp=6000)
+    store.append("second", timestamp=6001)
+    with open(store.journal_path, encoding="utf-8") as f:
+        journal = f.read()
+    store.close()
+    # As if the process died after sealing but before the journal was emptied
+    with open(store.journal_path, "w", encoding="utf-8") as f:
+        f.write(journal)
+
+    reopened = LogStore(str(tmp_path), segment_lines=100)
+    assert reopened.open_lines == []
+    assert list(reopened.search()) == ["first\n", "second\n"]
+    reopened.close()
+
+
+def test_writer_stores_every_line_in_order(tmp_path):
+    store = LogStore(str(tmp_path), segment_lines=100)
+    writer = LogWriter(store)
+    for index in range(250):
+        writer.append(f"line {index}")
+    writer.close(wait=True)
+
+    assert [line for line in store.search()] == [f"line {index}\n" for index in range(250)]
+    store.close()
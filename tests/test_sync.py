@@ -0,0 +1,212 @@
+"""FolderSync planning and runs over AdbFiles against umm.fake_adb"""
+import os
+
+import pytest
+
+from umm.adb import AdbError
+from umm.afc import AfcError
+from umm.sync import BOTH, PULL, PUSH, AdbFiles, FolderSync, SyncManifest
+
+REMOTE = "/sdcard/Sync"
+MODE = 0o100644
+
+
+@pytest.fixture
+def files(adb, android_device):
+    return AdbFiles(adb, android_device.serial)
+
+
+@pytest.fixture
+def local(tmp_path):
+    return tmp_path / "local"
+
+
+def write_local(root, path, data, mtime=1700000000):
+    target = root.joinpath(*path.split("/"))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(data)
+    os.utime(target, (mtime, mtime))
+
+
+def write_remote(device, path, data, mtime=1700000000):
+    device.files[f"{REMOTE}/{path}"] = (data, MODE, mtime)
+
+
+def remote_files(device):
+    return {path[len(REMOTE) + 1:]: entry[0] for path, entry in device.files.items() if path.startswith(REMOTE + "/")}
+
+
+def plan(sync):
+    return [(action, path, reason) for action, path, _, reason in sync.plan()]
+
+
+def test_push_copies_what_differs_then_settles(files, android_device, local):
+    write_local(local, "a.txt", b"new file")
+    write_local(local, "sub/b.txt", b"changed contents")
+    write_remote(android_device, "sub/b.txt", b"old")
+    write_remote(android_device, "extra.txt", b"only on the device")
+    manifest = SyncManifest(None)
+
+    sync = FolderSync(files, str(local), REMOTE, PUSH, manifest=manifest)
+    actions, stats = sync.run()
+    assert [(action, path, size, reason) for action, path, size, reason in actions] == [
+        ("push", "a.txt", 8, "missing on device"),
+        ("push", "sub/b.txt", 16, "differs"),
+    ]
+    assert not stats.errors
+    # Without delete a push leaves files only the device has
+    assert remote_files(android_device) == {"a.txt": b"new file", "sub/b.txt": b"changed contents",
+                                            "extra.txt": b"only on the device"}
+
+    assert FolderSync(files, str(local), REMOTE, PUSH, manifest=manifest).plan() == []
+
+
+def test_push_deletes_remote_extras_only_with_delete(files, android_device, local):
+    write_local(local, "keep.txt", b"keep")
+    write_remote(android_device, "keep.txt", b"keep")
+    write_remote(android_device, "stale.txt", b"stale")
+
+    assert FolderSync(files, str(local), REMOTE, PUSH).plan() == []
+    sync = FolderSync(files, str(local), REMOTE, PUSH, delete=True)
+    assert plan(sync) == [("delete-remote", "stale.txt", "not here")]
+    sync.run()
+    assert remote_files(android_device) == {"keep.txt": b"keep"}
+
+
+def test_push_needs_a_local_folder(files, local):
+    with pytest.raises(ValueError):
+        FolderSync(files, str(local), REMOTE, PUSH).plan()
+
+
+def test_dry_run_changes_nothing(files, android_device, local, tmp_path):
+    write_local(local, "a.txt", b"a")
+
+    # The remote folder does not exist yet and is not created
+    actions, _ = FolderSync(files, str(local), REMOTE, PUSH).run(dry_run=True)
+    assert [action[:2] for action in actions] == [("push", "a.txt")]
+    assert android_device.files == {}
+    assert android_device.directories == set()
+
+    write_remote(android_device, "b.txt", b"b")
+    target = tmp_path / "not yet"
+    actions, _ = FolderSync(files, str(target), REMOTE, PULL).run(dry_run=True)
+    assert [action[:2] for action in actions] == [("pull", "b.txt")]
+    assert not target.exists()
+
+
+def test_pull_keeps_device_times(files, android_device, local):
+    write_remote(android_device, "photos/1.jpg", b"jpeg", mtime=1600000000)
+    write_local(local, "local only.txt", b"x")
+    manifest = SyncManifest(None)
+
+    sync = FolderSync(files, str(local), REMOTE, PULL, delete=True, manifest=manifest)
+    assert plan(sync) == [("delete-local", "local only.txt", "not on device"),
+                          ("pull", "photos/1.jpg", "missing here")]
+    sync.run()
+    pulled = local / "photos" / "1.jpg"
+    assert pulled.read_bytes() == b"jpeg"
+    assert os.path.getmtime(pulled) == 1600000000
+    assert not (local / "local only.txt").exists()
+
+    assert FolderSync(files, str(local), REMOTE, PULL, manifest=manifest).plan() == []
+
+
+def test_checksum_tells_equal_contents_apart_from_times(files, android_device, local):
+    write_local(local, "same.txt", b"same", mtime=1700000000)
+    write_local(local, "other.txt", b"ours", mtime=1700000000)
+    write_remote(android_device, "same.txt", b"same", mtime=1700000500)
+    write_remote(android_device, "other.txt", b"them", mtime=1700000500)
+
+    assert plan(FolderSync(files, str(local), REMOTE, PUSH)) == [
+        ("push", "other.txt", "differs"), ("push", "same.txt", "differs")]
+    assert plan(FolderSync(files, str(local), REMOTE, PUSH, checksum=True)) == [
+        ("push", "other.txt", "differs")]
+
+
+@pytest.fixture
+def synced(files, android_device, local):
+    """A two-way pair with a.txt, b.txt, c.txt and d.txt in sync, and its manifest"""
+    for name in "abcd":
+        write_local(local, f"{name}.txt", name.encode())
+    manifest = SyncManifest(None)
+    FolderSync(files, str(local), REMOTE, BOTH, manifest=manifest).run()
+    assert remote_files(android_device) == {f"{name}.txt": name.encode() for name in "abcd"}
+    assert FolderSync(files, str(local), REMOTE, BOTH, manifest=manifest).plan() == []
+    return manifest
+
+
+def test_both_copies_the_side_that_changed(files, android_device, local, synced):
+    write_local(local, "a.txt", b"edited here", mtime=1700000100)
+    write_remote(android_device, "b.txt", b"edited on the device", mtime=1700000100)
+
+    sync = FolderSync(files, str(local), REMOTE, BOTH, manifest=synced)
+    assert plan(sync) == [("push", "a.txt", "changed here"), ("pull", "b.txt", "changed on device")]
+    sync.run()
+    assert remote_files(android_device)["a.txt"] == b"edited here"
+    assert (local / "b.txt").read_bytes() == b"edited on the device"
+
+    assert FolderSync(files, str(local), REMOTE, BOTH, manifest=synced).plan() == []
+
+
+def test_both_resolves_newer_files_and_reports_conflicts(files, android_device, local, synced):
+    # Changed on both sides: the clearly newer copy wins, otherwise neither is touched
+    write_local(local, "c.txt", b"here, later", mtime=1700000900)
+    write_remote(android_device, "c.txt", b"device, earlier", mtime=1700000100)
+    write_local(local, "d.txt", b"here", mtime=1700000100)
+    write_remote(android_device, "d.txt", b"device", mtime=1700000100)
+
+    sync = FolderSync(files, str(local), REMOTE, BOTH, manifest=synced)
+    assert plan(sync) == [("push", "c.txt", "newer here"), ("conflict", "d.txt", "changed on both sides")]
+    sync.run()
+    assert remote_files(android_device)["c.txt"] == b"here, later"
+    assert (local / "d.txt").read_bytes() == b"here"
+    assert remote_files(android_device)["d.txt"] == b"device"
+
+    # A conflict stays one until it is settled by hand
+    assert plan(FolderSync(files, str(local), REMOTE, BOTH, manifest=synced)) == [
+        ("conflict", "d.txt", "changed on both sides")]
+
+
+def test_both_carries_deletes_only_with_delete(files, android_device, local, synced):
+    os.remove(local / "a.txt")
+    del android_device.files[f"{REMOTE}/b.txt"]
+
+    # Without delete the missing copies come back
+    assert plan(FolderSync(files, str(local), REMOTE, BOTH, manifest=synced)) == [
+        ("pull", "a.txt", "missing here"), ("push", "b.txt", "missing on device")]
+
+    sync = FolderSync(files, str(local), REMOTE, BOTH, delete=True, manifest=synced)
+    assert plan(sync) == [("delete-remote", "a.txt", "deleted here"), ("delete-local", "b.txt", "deleted on device")]
+    sync.run()
+    assert set(remote_files(android_device)) == {"c.txt", "d.txt"}
+    assert sorted(os.listdir(local)) == ["c.txt", "d.txt"]
+
+
+class LockedFiles(AdbFiles):
+    """AdbFiles on a device that refuses every delete, as AFC does for a protected path"""
+
+    def remove(self, path):
+        raise AfcError(f"{path}: Permission denied", 10)
+
+
+def test_failed_delete_still_settles_the_rest(adb, files, android_device, local, synced):
+    os.remove(local / "a.txt")
+    write_remote(android_device, "b.txt", b"edited on the device", mtime=1700000100)
+
+    sync = FolderSync(LockedFiles(adb, android_device.serial), str(local), REMOTE, BOTH, delete=True, manifest=synced)
+    actions, stats = sync.run()
+    assert [action[:2] for action in actions] == [("delete-remote", "a.txt"), ("pull", "b.txt")]
+    assert [path for path, _ in stats.errors] == ["a.txt"]
+    # The pull after the failed delete still takes the device's time and is recorded
+    assert os.path.getmtime(local / "b.txt") == 1700000100
+    assert plan(FolderSync(files, str(local), REMOTE, BOTH, delete=True, manifest=synced)) == [
+        ("delete-remote", "a.txt", "deleted here")]
+
+
+def test_remove_reports_failures(files, android_device):
+    write_remote(android_device, "a.txt", b"a")
+
+    files.remove(f"{REMOTE}/a.txt")
+    assert remote_files(android_device) == {}
+    with pytest.raises(AdbError, match="No such file"):
+        files.remove(f"{REMOTE}/a.txt")
@@ -0,0 +1,101 @@
+"""UsbmuxClient requests and DeviceListener's Listen stream against umm.fake_usbmux"""
+import pytest
+
+from conftest import wait_until
+from umm.fake_usbmux import FakeIOSDevice, FakeUsbmuxServer
+from umm.usbmux import DeviceListener, UsbmuxClient, UsbmuxError, UsbmuxUnavailable
+
+
+def test_list_and_find_devices(usbmux, usbmux_server):
+    usbmux_server.add_device(FakeIOSDevice("UDID-A", connection="Network"))
+    usbmux_server.add_device(FakeIOSDevice("UDID-A"))
+    usbmux_server.add_device(FakeIOSDevice("UDID-B"))
+
+    devices = usbmux.list_devices()
+    assert sorted(device["udid"] for device in devices) == ["UDID-A", "UDID-A", "UDID-B"]
+    # A device on both USB and Wi-Fi is reached over USB
+    assert usbmux.find_device("UDID-A") == {"id": 2, "udid": "UDID-A", "connection": "USB"}
+    with pytest.raises(UsbmuxError, match="not attached"):
+        usbmux.find_device("UDID-C")
+
+
+def test_read_pair_record(usbmux, usbmux_server):
+    usbmux_server.add_device(FakeIOSDevice("UDID-A", pair_record={"HostID": "HOST-1", "SystemBUID": "BUID-1"}))
+
+    assert usbmux.read_pair_record("UDID-A") == {"HostID": "HOST-1", "SystemBUID": "BUID-1"}
+    with pytest.raises(UsbmuxError, match="error 2"):
+        usbmux.read_pair_record("UDID-B")
+
+
+def test_connect_reaches_a_device_port(usbmux, usbmux_server):
+    def echo(sock):
+        sock.sendall(sock.recv(5).upper())
+
+    device = usbmux_server.add_device(FakeIOSDevice("UDID-A", services={4000: echo}))
+    sock = usbmux.connect_device(device.device_id, 4000)
+    try:
+        sock.sendall(b"hello")
+        assert sock.recv(5) == b"HELLO"
+    finally:
+        sock.close()
+
+    with pytest.raises(UsbmuxError, match="error 3"):
+        usbmux.connect_device(device.device_id, 4001)
+
+
+def test_unreachable_daemon_raises_usbmux_error():
+    with pytest.raises(UsbmuxUnavailable):
+        UsbmuxClient(address=("127.0.0.1", 1)).list_devices()
+
+
+@pytest.fixture
+def listener(usbmux_server):
+    events = []
+    listener = DeviceListener(lambda kind, udid: events.append((kind, udid)), address=usbmux_server.address,
+                              reconnect_delay=0.05)
+    listener.events = events
+    listener.start()
+    yield listener
+    listener.stop()
+
+
+def test_listener_reports_hotplug(listener, usbmux_server):
+    assert listener.attempted.wait(5) and listener.connected
+
+    usbmux_server.add_device(FakeIOSDevice("UDID-A"))
+    wait_until(lambda: listener.events == [("Attached", "UDID-A")])
+    usbmux_server.add_device(FakeIOSDevice("UDID-B"))
+    wait_until(lambda: listener.udids() == ["UDID-A", "UDID-B"])
+
+    usbmux_server.remove_device("UDID-A")
+    wait_until(lambda: listener.events[-1] == ("Detached", "UDID-A"))
+    assert listener.udids() == ["UDID-B"]
+
+
+def test_listener_tracks_a_device_by_its_last_connection(listener, usbmux_server):
+    usbmux_server.add_device(FakeIOSDevice("UDID-A"))
+    usbmux_server.add_device(FakeIOSDevice("UDID-A", connection="Network"))
+    wait_until(lambda: len(listener.connections) == 2)
+    # The second connection of a device already attached is not a new device
+    assert listener.events == [("Attached", "UDID-A")]
+
+    usbmux_server.remove_device("UDID-A")
+    wait_until(lambda: not listener.connections)
+    assert listener.events == [("Attached", "UDID-A"), ("Detached", "UDID-A")]
+
+
+def test_listener_detaches_everything_when_the_daemon_goes_and_recovers(listener, usbmux_server):
+    usbmux_server.add_device(FakeIOSDevice("UDID-A"))
+    wait_until(lambda: listener.udids() == ["UDID-A"])
+    port = usbmux_server.address[1]
+
+    usbmux_server.stop()
+    wait_until(lambda: listener.events[-1] == ("Detached", "UDID-A") and not listener.connected)
+
+    restarted = FakeUsbmuxServer(port).start()
+    try:
+        restarted.add_device(FakeIOSDevice("UDID-B"))
+        wait_until(lambda: listener.udids() == ["UDID-B"])
+        assert listener.events[-1] == ("Attached", "UDID-B")
+    finally:
+        restarted.stop()
@@ -0,0 +1 @@
+"""Shared device tooling used by the Ultimate Mobile Manager front ends"""
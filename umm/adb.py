@@ -0,0 +1,598 @@
+"""Client for the adb server's host protocol (the smart socket on port 5037)"""
+import os
+import posixpath
+import re
+import shlex
+import socket
+import stat
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+ADB_HOST = "127.0.0.1"
+ADB_PORT = 5037
+
+# Largest DATA chunk the sync protocol accepts
+SYNC_DATA_MAX = 64 * 1024
+
+# Idle sync connections kept per device
+SYNC_IDLE_PER_DEVICE = 4
+
+# Shell protocol v2 packet IDs
+SHELL_STDOUT = 1
+SHELL_STDERR = 2
+SHELL_EXIT = 3
+
+
+class AdbError(subprocess.SubprocessError):
+    """Raised when the adb server rejects a request or the connection fails
+
+    It subclasses SubprocessError so callers handle it exactly like a failed
+    adb invocation.
+    """
+
+
+class AdbServerUnavailable(AdbError):
+    """Raised when no adb server is listening"""
+
+
+def connect(host=ADB_HOST, port=ADB_PORT, timeout=5):
+    """Open a TCP connection to the adb server"""
+    try:
+        return socket.create_connection((host, port), timeout=timeout)
+    except OSError as e:
+        raise AdbServerUnavailable(f"Cannot reach adb server at {host}:{port}: {e}") from e
+
+
+def read_exact(sock, size):
+    """Read exactly size bytes from sock"""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise AdbError("Connection closed by adb server")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def read_message(sock):
+    """Read one hex length-prefixed message"""
+    length = int(read_exact(sock, 4), 16)
+    return read_exact(sock, length).decode("utf-8", errors="replace")
+
+
+def read_all(sock):
+    """Read until the server closes the connection"""
+    data = bytearray()
+    while True:
+        chunk = sock.recv(SYNC_DATA_MAX)
+        if not chunk:
+            return bytes(data)
+        data.extend(chunk)
+
+
+def send_request(sock, request):
+    """Send a host request and wait for the server to acknowledge it"""
+    payload = request.encode("utf-8")
+    sock.sendall(b"%04x" % len(payload) + payload)
+
+    status = read_exact(sock, 4)
+    if status == b"OKAY":
+        return
+    if status == b"FAIL":
+        raise AdbError(read_message(sock))
+    raise AdbError(f"Unexpected adb server response: {status!r}")
+
+
+def parse_device_list(text):
+    """Parse `adb devices -l` style lines into device dicts"""
+    devices = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 2 or line.startswith("List of devices"):
+            continue
+
+        device_model = "Unknown"
+        model_match = re.search(r'model:(\S+)', line)
+        if model_match:
+            device_model = model_match.group(1)
+
+        devices.append({"id": parts[0], "name": "Unknown", "model": device_model, "status": parts[1]})
+    return devices
+
+
+class DeviceTracker:
+    """Follow the adb server's track-devices stream and report every change
+
+    The server pushes the full device list whenever a device connects,
+    disconnects or changes state, so no process is spawned and no polling
+    happens while the set of devices is stable. on_change is called from the
+    tracker thread with the new device list.
+    """
+
+    def __init__(self, on_change, host=ADB_HOST, port=ADB_PORT, start_server=None, reconnect_delay=1.0):
+        self.on_change = on_change
+        self.host = host
+        self.port = port
+        self.start_server = start_server
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self.running = False
+        self.sock = None
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def run(self):
+        devices = []
+        server_started = False
+
+        while self.running:
+            try:
+                self.sock = self.open_stream()
+                self.connected = True
+
+                while self.running:
+                    # The stream blocks until the device list changes
+                    current = parse_device_list(read_message(self.sock))
+                    if current != devices:
+                        devices = current
+                        self.on_change(devices)
+
+            except (AdbError, OSError, ValueError):
+                # Start the server once if it was never reachable in the first place
+                if self.start_server and not self.connected and not server_started:
+                    server_started = True
+                    self.start_server()
+                    continue
+
+            self.connected = False
+            if devices:
+                # Losing the server means losing every device it knew about
+                devices = []
+                self.on_change(devices)
+
+            if self.running:
+                time.sleep(self.reconnect_delay)
+
+    def open_stream(self):
+        sock = connect(self.host, self.port)
+        sock.settimeout(None)
+        try:
+            send_request(sock, "host:track-devices-l")
+        except AdbError:
+            # Older servers only know the short form without device details
+            sock.close()
+            sock = connect(self.host, self.port)
+            sock.settimeout(None)
+            send_request(sock, "host:track-devices")
+        return sock
+
+
+def send_sync(sock, request_id, payload=b""):
+    sock.sendall(request_id + struct.pack("<I", len(payload)) + payload)
+
+
+def read_sync_header(sock):
+    header = read_exact(sock, 8)
+    return header[:4], struct.unpack("<I", header[4:])[0]
+
+
+def check_sync_status(sock):
+    """Read the server's verdict on a finished SEND"""
+    status, length = read_sync_header(sock)
+    if status == b"FAIL":
+        raise AdbError(read_exact(sock, length).decode("utf-8", errors="replace"))
+    if status != b"OKAY":
+        raise AdbError(f"Unexpected sync response: {status!r}")
+
+
+class AdbClient:
+    """Talk to the adb server directly instead of spawning an adb process per command
+
+    The server ties every device connection to a single service and closes it
+    when the service ends, so those connections are opened per command and
+    only their number is bounded. Sync-service connections stay open between
+    transfers and are pooled per device. When the server cannot be reached
+    even after starting it, commands fall back to running the adb binary.
+    """
+
+    def __init__(self, host=ADB_HOST, port=ADB_PORT, adb_path=None, max_connections=16, timeout=10):
+        self.host = host
+        self.port = port
+        self.adb_path = adb_path
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.features = {}
+        self.sync_pool = {}
+        self.lock = threading.Lock()
+        self.server_started = False
+
+    def open(self, timeout=None):
+        try:
+            return connect(self.host, self.port, timeout or self.timeout)
+        except AdbServerUnavailable:
+            if not self.adb_path or self.server_started:
+                raise
+
+        # Start the server once, then give it a single retry
+        self.server_started = True
+        try:
+            subprocess.run([self.adb_path, "start-server"], capture_output=True, timeout=10)
+        except (subprocess.SubprocessError, FileNotFoundError):
+            pass
+        return connect(self.host, self.port, timeout or self.timeout)
+
+    @contextmanager
+    def transport(self, serial, service, timeout=None, bounded=True):
+        """Open a connection to service on the given device"""
+        if bounded:
+            self.slots.acquire()
+        try:
+            sock = self.open(timeout)
+            try:
+                send_request(sock, f"host:transport:{serial}")
+                send_request(sock, service)
+                sock.settimeout(timeout)
+                yield sock
+            except OSError as e:
+                raise AdbError(f"Connection to {serial} failed: {e}") from e
+            finally:
+                sock.close()
+        finally:
+            if bounded:
+                self.slots.release()
+
+    def host_query(self, request):
+        with self.slots:
+            sock = self.open()
+            try:
+                send_request(sock, request)
+                return read_message(sock)
+            except OSError as e:
+                raise AdbError(f"adb server request failed: {e}") from e
+            finally:
+                sock.close()
+
+    def version(self):
+        return int(self.host_query("host:version"), 16)
+
+    def devices(self):
+        try:
+            return parse_device_list(self.host_query("host:devices-l"))
+        except AdbServerUnavailable:
+            return parse_device_list(self.run_binary(["devices", "-l"], timeout=self.timeout).stdout)
+
+    def device_features(self, serial):
+        if serial not in self.features:
+            self.features[serial] = set(self.host_query(f"host-serial:{serial}:features").split(","))
+        return self.features[serial]
+
+    def forget(self, serial):
+        """Drop cached state for a device that went away"""
+        self.features.pop(serial, None)
+        with self.lock:
+            idle = self.sync_pool.pop(serial, [])
+        for sock in idle:
+            sock.close()
+
+    def run_binary(self, args, timeout=None):
+        if not self.adb_path:
+            raise AdbServerUnavailable("adb server is not running and no adb binary is configured")
+        return subprocess.run([self.adb_path] + args, capture_output=True, text=True, timeout=timeout)
+
+    def shell(self, serial, command, timeout=None):
+        """Run a shell command and return a CompletedProcess
+
+        The exit status is only known on devices that speak shell protocol v2;
+        on older ones returncode is None.
+        """
+        try:
+            if "shell_v2" in self.device_features(serial):
+                return self.shell_v2(serial, command, timeout)
+
+            with self.transport(serial, f"shell:{command}", timeout) as sock:
+                output = read_all(sock).decode("utf-8", errors="replace")
+            return subprocess.CompletedProcess(command, None, output, "")
+        except AdbServerUnavailable:
+            return self.run_binary(["-s", serial, "shell", command], timeout)
+
+    def shell_v2(self, serial, command, timeout=None):
+        stdout = bytearray()
+        stderr = bytearray()
+        with self.transport(serial, f"shell,v2,raw:{command}", timeout) as sock:
+            while True:
+                header = read_exact(sock, 5)
+                packet = read_exact(sock, struct.unpack("<I", header[1:])[0])
+                if header[0] == SHELL_STDOUT:
+                    stdout.extend(packet)
+                elif header[0] == SHELL_STDERR:
+                    stderr.extend(packet)
+                elif header[0] == SHELL_EXIT:
+                    returncode = packet[0]
+                    break
+
+        return subprocess.CompletedProcess(
+            command, returncode,
+            stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace")
+        )
+
+    def stream_shell(self, serial, command):
+        """Yield output lines of a long-running shell command such as logcat"""
+        try:
+            with self.transport(serial, f"shell:{command}", bounded=False) as sock:
+                reader = sock.makefile("r", encoding="utf-8", errors="replace", newline="")
+                for line in reader:
+                    yield line
+            return
+        except AdbServerUnavailable:
+            if not self.adb_path:
+                raise
+
+        process = subprocess.Popen(
+            [self.adb_path, "-s", serial, "shell", command],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1
+        )
+        try:
+            for line in iter(process.stdout.readline, ''):
+                yield line
+        finally:
+            process.kill()
+            process.wait()
+
+    def exec_out(self, serial, command, timeout=None):
+        """Run a command through exec: and return its raw stdout bytes"""
+        try:
+            with self.transport(serial, f"exec:{command}", timeout) as sock:
+                return read_all(sock)
+        except AdbServerUnavailable:
+            if not self.adb_path:
+                raise
+            return subprocess.run(
+                [self.adb_path, "-s", serial, "exec-out", command],
+                capture_output=True, timeout=timeout, check=True
+            ).stdout
+
+    def reboot(self, serial, target=""):
+        try:
+            with self.transport(serial, f"reboot:{target}") as sock:
+                read_all(sock)
+        except AdbServerUnavailable:
+            self.run_binary(["-s", serial, "reboot"] + ([target] if target else []))
+
+    @contextmanager
+    def sync(self, serial):
+        """Borrow a sync-service connection, reusing an idle one for the same device"""
+        with self.lock:
+            idle = self.sync_pool.get(serial)
+            sock = idle.pop() if idle else None
+
+        if sock is None:
+            sock = self.open()
+            try:
+                send_request(sock, f"host:transport:{serial}")
+                send_request(sock, "sync:")
+            except (AdbError, OSError):
+                sock.close()
+                raise
+
+        try:
+            yield sock
+        except OSError as e:
+            sock.close()
+            raise AdbError(f"Sync with {serial} failed: {e}") from e
+        except BaseException:
+            # The protocol state is unknown after an error, so never reuse the connection
+            sock.close()
+            raise
+
+        with self.lock:
+            idle = self.sync_pool.setdefault(serial, [])
+            if len(idle) < SYNC_IDLE_PER_DEVICE:
+                idle.append(sock)
+                return
+        sock.close()
+
+    def push(self, serial, local_path, remote_path, progress=None):
+        """Copy a local file to the device; progress is called with each chunk size"""
+        try:
+            file_stat = os.stat(local_path)
+            mode = stat.S_IFREG | stat.S_IMODE(file_stat.st_mode)
+            with self.sync(serial) as sock:
+                send_sync(sock, b"SEND", f"{remote_path},{mode}".encode("utf-8"))
+                with open(local_path, "rb") as f:
+                    while True:
+                        chunk = f.read(SYNC_DATA_MAX)
+                        if not chunk:
+                            break
+                        send_sync(sock, b"DATA", chunk)
+                        if progress:
+                            progress(len(chunk))
+                sock.sendall(b"DONE" + struct.pack("<I", int(file_stat.st_mtime)))
+                check_sync_status(sock)
+        except AdbServerUnavailable:
+            self.run_binary(["-s", serial, "push", local_path, remote_path]).check_returncode()
+
+    def pull(self, serial, remote_path, local_path, progress=None):
+        """Copy a device file to local_path; progress is called with each chunk size
+
+        The file is written beside local_path and only replaces it once
+        complete, so a failed pull keeps whatever was there before.
+        """
+        partial = local_path + ".part"
+        try:
+            self.pull_to(serial, remote_path, partial, progress)
+            os.replace(partial, local_path)
+        except BaseException:
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+            raise
+
+    def pull_to(self, serial, remote_path, local_path, progress):
+        try:
+            with self.sync(serial) as sock, open(local_path, "wb") as f:
+                send_sync(sock, b"RECV", remote_path.encode("utf-8"))
+                while True:
+                    response, length = read_sync_header(sock)
+                    if response == b"DONE":
+                        break
+                    if response == b"FAIL":
+                        raise AdbError(read_exact(sock, length).decode("utf-8", errors="replace"))
+                    if response != b"DATA":
+                        raise AdbError(f"Unexpected sync response: {response!r}")
+
+                    f.write(read_exact(sock, length))
+                    if progress:
+                        progress(length)
+        except AdbServerUnavailable:
+            self.run_binary(["-s", serial, "pull", remote_path, local_path]).check_returncode()
+
+    def send_file(self, serial, service, local_path, progress=None):
+        """Feed a local file to an exec: service as its stdin and return the service's output"""
+        with self.transport(serial, service) as sock:
+            with open(local_path, "rb") as f:
+                while True:
+                    chunk = f.read(SYNC_DATA_MAX)
+                    if not chunk:
+                        break
+                    sock.sendall(chunk)
+                    if progress:
+                        progress(len(chunk))
+            return read_all(sock).decode("utf-8", errors="replace")
+
+    def install(self, serial, apk_path, replace=True, progress=None):
+        """Install an APK, streaming it straight into the package manager when supported
+
+        progress is called with the size of each chunk sent to the device.
+        """
+        options = "-r" if replace else ""
+        try:
+            if "cmd" in self.device_features(serial):
+                size = os.path.getsize(apk_path)
+                output = self.send_file(serial, f"exec:cmd package install -S {size} {options}", apk_path, progress)
+            else:
+                # Older devices need the APK staged on disk first
+                remote_path = "/data/local/tmp/" + os.path.basename(apk_path)
+                self.push(serial, apk_path, remote_path, progress)
+                try:
+                    output = self.install_staged(serial, [remote_path], [os.path.getsize(apk_path)], replace).stdout
+                finally:
+                    self.shell(serial, f"rm -f {shlex.quote(remote_path)}")
+        except AdbServerUnavailable:
+            return self.run_binary(["-s", serial, "install"] + ([options] if options else []) + [apk_path])
+
+        return subprocess.CompletedProcess(apk_path, 0 if "Success" in output else 1, output, "")
+
+    def install_staged(self, serial, remote_paths, sizes, replace=True):
+        """Install APKs that were already pushed to the device
+
+        Several paths are a base APK and its splits, installed in one
+        session; sizes are their sizes in bytes. The staged files are left
+        for the caller to remove.
+        """
+        options = "-r" if replace else ""
+        if len(remote_paths) == 1:
+            output = self.shell(serial, f"pm install {options} {shlex.quote(remote_paths[0])}").stdout
+            return subprocess.CompletedProcess(list(remote_paths), 0 if "Success" in output else 1, output, "")
+
+        output = self.shell(serial, f"pm install-create -S {sum(sizes)} {options}").stdout
+        session = re.search(r"\[(\d+)\]", output)
+        if not session:
+            return subprocess.CompletedProcess(list(remote_paths), 1, output, "")
+        session = session.group(1)
+
+        for index, (remote_path, size) in enumerate(zip(remote_paths, sizes)):
+            name = f"{index}_{posixpath.basename(remote_path)}"
+            output = self.shell(serial, f"pm install-write -S {size} {session} {name} {shlex.quote(remote_path)}").stdout
+            if "Success" not in output:
+                self.shell(serial, f"pm install-abandon {session}")
+                break
+        else:
+            output = self.shell(serial, f"pm install-commit {session}").stdout
+        return subprocess.CompletedProcess(list(remote_paths), 0 if "Success" in output else 1, output, "")
+
+    def install_multiple(self, serial, apk_paths, replace=True, progress=None):
+        """Install a base APK and its splits as one app, in a single package manager session
+
+        Like `adb install-multiple`: the session is created with the total
+        size, every APK is written into it and the session is committed only
+        if all writes succeeded.
+        """
+        options = "-r" if replace else ""
+        try:
+            sizes = [os.path.getsize(apk_path) for apk_path in apk_paths]
+            if "cmd" not in self.device_features(serial):
+                # Older devices read the splits from disk
+                remote_paths = []
+                try:
+                    for apk_path in apk_paths:
+                        remote_paths.append("/data/local/tmp/" + os.path.basename(apk_path))
+                        self.push(serial, apk_path, remote_paths[-1], progress)
+                    result = self.install_staged(serial, remote_paths, sizes, replace)
+                finally:
+                    for remote_path in remote_paths:
+                        self.shell(serial, f"rm -f {shlex.quote(remote_path)}")
+                return subprocess.CompletedProcess(list(apk_paths), result.returncode, result.stdout, "")
+
+            output = self.shell(serial, f"cmd package install-create -S {sum(sizes)} {options}").stdout
+            session = re.search(r"\[(\d+)\]", output)
+            if not session:
+                return subprocess.CompletedProcess(list(apk_paths), 1, output, "")
+            session = session.group(1)
+
+            for index, (apk_path, size) in enumerate(zip(apk_paths, sizes)):
+                name = f"{index}_{os.path.basename(apk_path)}"
+                output = self.send_file(
+                    serial, f"exec:cmd package install-write -S {size} {session} {name} -", apk_path, progress)
+                if "Success" not in output:
+                    self.shell(serial, f"cmd package install-abandon {session}")
+                    break
+            else:
+                output = self.shell(serial, f"cmd package install-commit {session}").stdout
+        except AdbServerUnavailable:
+            return self.run_binary(["-s", serial, "install-multiple"] + ([options] if options else []) + list(apk_paths))
+
+        return subprocess.CompletedProcess(list(apk_paths), 0 if "Success" in output else 1, output, "")
+
+    def package_version(self, serial, package):
+        """versionCode of an installed package, or None if it is not installed"""
+        output = self.shell(serial, f"dumpsys package {shlex.quote(package)}").stdout
+        match = re.search(r"versionCode=(\d+)", output)
+        return match.group(1) if match else None
+
+    def uninstall(self, serial, package):
+        try:
+            return self.shell(serial, f"pm uninstall {shlex.quote(package)}")
+        except AdbServerUnavailable:
+            return self.run_binary(["-s", serial, "uninstall", package])
+
+    def for_each(self, serials, func, max_workers=8):
+        """Call func(serial) for every device concurrently
+
+        Returns a dict mapping each serial to its result, or to the exception
+        it raised.
+        """
+        def call(serial):
+            try:
+                return func(serial)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return dict(zip(serials, pool.map(call, serials)))
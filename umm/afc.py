@@ -0,0 +1,462 @@
+"""Client for AFC, the file service of iOS devices, over one persistent usbmux connection
+
+AFC packets are a 40-byte little-endian header (the CFA6LPAA magic, total
+length, header length, packet number and operation) followed by the
+operation's arguments and data. The device answers requests in order and
+echoes each packet number, so any number of requests can be in flight on
+one connection: a reader thread hands every reply to the request waiting
+for it. Directory listings stat all their entries at once, and file
+reads and writes keep several chunks on the wire instead of waiting for
+each round trip. AFC serves the media folder; AFC2, which jailbreaks
+install, serves the whole filesystem.
+"""
+import os
+import socket
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import CancelledError, Future, TimeoutError
+
+from umm.lockdown import LockdownClient
+from umm.transfer import PARTIAL_SUFFIX, IdevicefsClient
+from umm.usbmux import UsbmuxError, read_exact
+
+AFC_SERVICE = "com.apple.afc"
+AFC2_SERVICE = "com.apple.afc2"
+
+AFC_MAGIC = b"CFA6LPAA"
+HEADER = struct.Struct("<8sQQQQ")
+
+# Operations
+AFC_OP_STATUS = 0x01
+AFC_OP_DATA = 0x02
+AFC_OP_READ_DIR = 0x03
+AFC_OP_REMOVE_PATH = 0x08
+AFC_OP_MAKE_DIR = 0x09
+AFC_OP_GET_FILE_INFO = 0x0A
+AFC_OP_FILE_OPEN = 0x0D
+AFC_OP_FILE_OPEN_RES = 0x0E
+AFC_OP_FILE_READ = 0x0F
+AFC_OP_FILE_WRITE = 0x10
+AFC_OP_FILE_CLOSE = 0x14
+AFC_OP_RENAME_PATH = 0x18
+AFC_OP_SET_FILE_MOD_TIME = 0x1E
+AFC_OP_REMOVE_PATH_AND_CONTENTS = 0x22
+
+# File open modes
+AFC_FOPEN_RDONLY = 1
+AFC_FOPEN_WRONLY = 3
+
+# Status codes worth a readable message; the rest are reported by number
+AFC_ERRORS = {
+    7: "Invalid argument",
+    8: "No such file or directory",
+    9: "Is a directory",
+    10: "Permission denied",
+    15: "Operation not supported",
+    16: "File exists",
+    17: "Resource busy",
+    18: "No space left on device",
+}
+AFC_E_OBJECT_NOT_FOUND = 8
+
+# Bytes per read or write request, and requests kept in flight per file
+CHUNK_SIZE = 1024 * 1024
+WINDOW = 8
+
+
+class AfcError(subprocess.SubprocessError):
+    """Raised when the device answers an AFC request with an error, or the session fails"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def parse_pairs(data):
+    """Decode a NUL-separated key/value list into a dict"""
+    fields = data.decode("utf-8", errors="replace").split("\0")
+    return dict(zip(fields[0::2], fields[1::2]))
+
+
+def format_date(mtime):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime))
+
+
+class AfcClient:
+    """One AFC session, shared safely by any number of threads
+
+    Methods raise AfcError. The file methods match IdevicefsClient, so
+    DirectoryTransfer, FolderSync and the file browser work over either.
+    Reported mtimes are whole seconds since the epoch.
+    """
+
+    def __init__(self, sock, udid=None, timeout=10):
+        self.sock = sock
+        self.udid = udid
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.pending = {}
+        self.next_packet = 0
+        self.error = None
+
+        # The reader waits for as long as the session lives; each request has its own timeout
+        sock.settimeout(None)
+        threading.Thread(target=self.read_replies, daemon=True).start()
+
+    @property
+    def device(self):
+        return self.udid
+
+    @property
+    def closed(self):
+        return self.error is not None
+
+    def read_replies(self):
+        try:
+            while True:
+                magic, entire_length, _, packet_num, operation = HEADER.unpack(read_exact(self.sock, HEADER.size))
+                if magic != AFC_MAGIC or entire_length < HEADER.size:
+                    raise AfcError("Malformed AFC packet")
+                body = read_exact(self.sock, entire_length - HEADER.size)
+                with self.lock:
+                    future = self.pending.pop(packet_num, None)
+                if future is not None:
+                    future.set_result((operation, body))
+        except (AfcError, UsbmuxError, OSError) as e:
+            self.fail(e)
+
+    def fail(self, error):
+        """End the session and fail every request still waiting"""
+        with self.lock:
+            if self.error is None:
+                self.error = AfcError(f"AFC session ended: {error}")
+            pending, self.pending = self.pending, {}
+        try:
+            # Closing alone would leave the reader blocked in recv
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        for future in pending.values():
+            future.set_exception(self.error)
+
+    def close(self):
+        self.fail("closed")
+
+    def submit(self, operation, arguments=b"", data=b""):
+        """Send a request without waiting; returns a Future of (operation, body)"""
+        future = Future()
+        with self.send_lock:
+            with self.lock:
+                if self.error is not None:
+                    raise self.error
+                packet_num = self.next_packet
+                self.next_packet += 1
+                self.pending[packet_num] = future
+            header_length = HEADER.size + len(arguments)
+            try:
+                self.sock.sendall(HEADER.pack(AFC_MAGIC, header_length + len(data), header_length, packet_num,
+                                              operation) + arguments + data)
+            except OSError as e:
+                self.fail(e)
+                raise AfcError(f"AFC request failed: {e}") from e
+        return future
+
+    def reply(self, future, what):
+        """The body of a reply, raising AfcError for an error status"""
+        try:
+            operation, body = future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Replies arrive in order, so a lost one leaves the session unusable
+            self.fail("no reply")
+            raise AfcError(f"{what}: no reply from the device") from None
+        if operation == AFC_OP_STATUS and len(body) >= 8:
+            code = struct.unpack("<Q", body[:8])[0]
+            if code != 0:
+                raise AfcError(f"{what}: {AFC_ERRORS.get(code, f'AFC error {code}')}", code)
+        return body
+
+    def request(self, operation, arguments=b"", data=b"", what="AFC request"):
+        return self.reply(self.submit(operation, arguments, data), what)
+
+    def path_request(self, operation, path, prefix=b""):
+        return self.request(operation, prefix + path.encode("utf-8") + b"\0", what=path)
+
+    # Files and folders
+
+    def readdir(self, path):
+        """Names in a folder, without . and .."""
+        names = self.path_request(AFC_OP_READ_DIR, path).decode("utf-8", errors="replace").split("\0")
+        return [name for name in names if name and name not in (".", "..")]
+
+    def submit_stat(self, path):
+        return self.submit(AFC_OP_GET_FILE_INFO, path.encode("utf-8") + b"\0")
+
+    def stat_reply(self, future, path):
+        info = parse_pairs(self.reply(future, path))
+        return {
+            "is_dir": info.get("st_ifmt") == "S_IFDIR",
+            "is_link": info.get("st_ifmt") == "S_IFLNK",
+            "size": int(info.get("st_size", 0)),
+            "mtime": int(info.get("st_mtime", 0)) // 1000000000,
+        }
+
+    def stat(self, path):
+        """{is_dir, is_link, size, mtime} of a path"""
+        return self.stat_reply(self.submit_stat(path), path)
+
+    def entries(self, path):
+        """(name, stat) for everything in a folder, with every stat in flight at once"""
+        names = self.readdir(path)
+        futures = [(name, self.submit_stat(path.rstrip("/") + "/" + name)) for name in names]
+        rows = []
+        for name, future in futures:
+            try:
+                rows.append((name, self.stat_reply(future, name)))
+            except AfcError as e:
+                # Deleted between the listing and the stat
+                if e.code != AFC_E_OBJECT_NOT_FOUND:
+                    raise
+        return rows
+
+    def listdir(self, path):
+        """(name, is directory, size, date) rows, as parse_listing gives for idevicefs"""
+        return [(name, info["is_dir"], info["size"], format_date(info["mtime"])) for name, info in self.entries(path)]
+
+    def scan(self, root, on_error=None, max_workers=None):
+        """{relative path: (is directory, size, mtime)} of everything under root
+
+        Every folder of a level is read at once and every entry stated at
+        once, so a tree takes two round trips per level. Symbolic links
+        are left out. A subfolder that cannot be read is passed to
+        on_error(path, exception) if given, and raises otherwise.
+        """
+        root = root.rstrip("/") or "/"
+
+        def full_path(relative):
+            return root.rstrip("/") + "/" + relative if relative else root
+
+        entries = {}
+        directories = [""]
+        while directories:
+            listings = [(relative, self.submit(AFC_OP_READ_DIR, full_path(relative).encode("utf-8") + b"\0"))
+                        for relative in directories]
+            stats = []
+            for relative, future in listings:
+                try:
+                    names = self.reply(future, full_path(relative)).decode("utf-8", errors="replace").split("\0")
+                except AfcError as e:
+                    if on_error is None or not relative:
+                        raise
+                    on_error(full_path(relative), e)
+                    continue
+                for name in names:
+                    if name and name not in (".", ".."):
+                        child = relative + "/" + name if relative else name
+                        stats.append((child, self.submit_stat(full_path(child))))
+
+            directories = []
+            for child, future in stats:
+                try:
+                    info = self.stat_reply(future, full_path(child))
+                except AfcError as e:
+                    if e.code == AFC_E_OBJECT_NOT_FOUND:
+                        continue
+                    raise
+                if info["is_link"]:
+                    continue
+                entries[child] = (info["is_dir"], info["size"], info["mtime"])
+                if info["is_dir"]:
+                    directories.append(child)
+        return entries
+
+    def hashes(self, root, paths):
+        """AFC can only hash with SHA-1 and not on every iOS version, so no remote digests are known"""
+        return {}
+
+    def mkdir(self, path):
+        """Create a folder and any missing parents"""
+        self.path_request(AFC_OP_MAKE_DIR, path)
+
+    def remove(self, path):
+        """Remove a file or an empty folder"""
+        self.path_request(AFC_OP_REMOVE_PATH, path)
+
+    def remove_tree(self, path):
+        """Remove a file or a folder with everything in it"""
+        self.path_request(AFC_OP_REMOVE_PATH_AND_CONTENTS, path)
+
+    def rename(self, source, target):
+        self.request(AFC_OP_RENAME_PATH, source.encode("utf-8") + b"\0" + target.encode("utf-8") + b"\0",
+                     what=source)
+
+    def set_mtime(self, path, mtime):
+        self.path_request(AFC_OP_SET_FILE_MOD_TIME, path, struct.pack("<Q", int(mtime * 1000000000)))
+
+    def open_file(self, path, mode):
+        return struct.unpack("<Q", self.path_request(AFC_OP_FILE_OPEN, path, struct.pack("<Q", mode))[:8])[0]
+
+    def close_file(self, handle):
+        self.request(AFC_OP_FILE_CLOSE, struct.pack("<Q", handle), what="close")
+
+    def get(self, remote_path, local_path, size, progress=None, cancelled=None):
+        """Download a file, with up to WINDOW reads of CHUNK_SIZE in flight"""
+        handle = self.open_file(remote_path, AFC_FOPEN_RDONLY)
+        # Written beside the target, which keeps its old contents until the copy is complete
+        partial = local_path + PARTIAL_SUFFIX
+        try:
+            with open(partial, "wb") as target:
+                in_flight = []
+                requested = 0
+                end_of_file = False
+                while True:
+                    # Read up to just past the expected size, then one chunk at a time until a short read
+                    while not end_of_file and len(in_flight) < WINDOW and (requested <= size or not in_flight):
+                        in_flight.append(self.submit(AFC_OP_FILE_READ, struct.pack("<QQ", handle, CHUNK_SIZE)))
+                        requested += CHUNK_SIZE
+                    if not in_flight:
+                        break
+                    data = self.reply(in_flight.pop(0), remote_path)
+                    if cancelled is not None and cancelled.is_set():
+                        raise CancelledError()
+                    end_of_file = end_of_file or len(data) < CHUNK_SIZE
+                    target.write(data)
+                    if data and progress:
+                        progress(len(data))
+            os.replace(partial, local_path)
+        except BaseException:
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+            raise
+        finally:
+            self.release(handle)
+
+    def put(self, local_path, remote_path, size, progress=None, cancelled=None):
+        """Upload a file with up to WINDOW writes of CHUNK_SIZE in flight, reporting each as the device takes it"""
+        handle = self.open_file(remote_path, AFC_FOPEN_WRONLY)
+        try:
+            with open(local_path, "rb") as source:
+                in_flight = []
+                data = source.read(CHUNK_SIZE)
+                while data or in_flight:
+                    if cancelled is not None and cancelled.is_set():
+                        raise CancelledError()
+                    if data and len(in_flight) < WINDOW:
+                        in_flight.append((len(data), self.submit(AFC_OP_FILE_WRITE, struct.pack("<Q", handle), data)))
+                        data = source.read(CHUNK_SIZE)
+                        continue
+                    written, future = in_flight.pop(0)
+                    self.reply(future, remote_path)
+                    if progress:
+                        progress(written)
+        except BaseException:
+            self.release(handle)
+            handle = None
+            try:
+                self.remove(remote_path)
+            except AfcError:
+                pass
+            raise
+        finally:
+            if handle is not None:
+                self.release(handle)
+        try:
+            # Keep the local time, as adb push does, so later syncs see the file as unchanged
+            self.set_mtime(remote_path, os.path.getmtime(local_path))
+        except AfcError:
+            pass
+
+    def release(self, handle):
+        """Close a file handle, if the session is still there to close it on"""
+        try:
+            self.close_file(handle)
+        except AfcError:
+            pass
+
+
+def open_afc(udid, usbmux=None, service=AFC_SERVICE, timeout=10):
+    """Start AFC (or AFC2) through lockdown and return an AfcClient on it
+
+    Raises LockdownError when the device does not offer the service, e.g.
+    AFC2 on a device that is not jailbroken.
+    """
+    with LockdownClient(udid, usbmux, timeout) as lockdown:
+        sock = lockdown.start_service(service)
+    return AfcClient(sock, udid, timeout)
+
+
+class DeviceFiles:
+    """The file methods of one device's AFC session, which is looked up on each call
+
+    Neither creating one nor looking up its methods does any I/O, so the Tk
+    thread can hand them to workers; the session opens on the worker that
+    first calls one, and a session that has failed is replaced on the next
+    call.
+    """
+
+    def __init__(self, sessions, udid, service=AFC_SERVICE):
+        self.sessions = sessions
+        self.udid = udid
+        self.service = service
+
+    @property
+    def device(self):
+        return self.udid
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            return getattr(self.sessions.get(self.udid, self.service), name)(*args, **kwargs)
+        return call
+
+
+class AfcSessions:
+    """One AFC session per device and service, opened on first use and again after it fails
+
+    When usbmuxd cannot be reached and an engine is given, get() returns an
+    IdevicefsClient instead, which has the same file methods.
+    """
+
+    def __init__(self, usbmux=None, engine=None, timeout=10):
+        self.usbmux = usbmux
+        self.engine = engine
+        self.timeout = timeout
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, udid, service=AFC_SERVICE):
+        key = (udid, service)
+        with self.lock:
+            client = self.sessions.get(key)
+            if client is not None and not client.closed:
+                return client
+
+        # Opened without the lock, so a slow or locked device holds up only its own callers
+        try:
+            client = open_afc(udid, self.usbmux, service, self.timeout)
+        except (UsbmuxError, OSError):
+            if self.engine is None or service != AFC_SERVICE:
+                raise
+            return IdevicefsClient(self.engine, udid)
+
+        with self.lock:
+            current = self.sessions.get(key)
+            if current is None or current.closed:
+                self.sessions[key] = client
+                return client
+        # Another thread opened one first; keep that and drop this one
+        client.close()
+        return current
+
+    def files(self, udid, service=AFC_SERVICE):
+        return DeviceFiles(self, udid, service)
+
+    def close(self, udid=None):
+        """Close the sessions of one device, or of all devices"""
+        with self.lock:
+            for key in [key for key in self.sessions if udid is None or key[0] == udid]:
+                self.sessions.pop(key).close()
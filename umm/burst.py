@@ -0,0 +1,129 @@
+"""Timed screenshot bursts across many devices at once"""
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# The frame index keeps names unique when frames land in the same millisecond
+DEFAULT_TEMPLATE = os.path.join("{serial}", "{timestamp}-{index:04d}.png")
+
+# Longest the scheduler waits before noticing a cancel
+CANCEL_POLL = 0.2
+
+
+class BurstStats:
+    """Running totals for one device in a burst"""
+
+    def __init__(self, serial):
+        self.serial = serial
+        self.frames = 0
+        self.failures = 0
+        self.started = None
+        self.finished = None
+        self.last_error = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def fps(self):
+        return self.frames / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class BurstCapture:
+    """Capture count frames per device, one every interval seconds
+
+    capture(serial, path) must write one screenshot to path. Every device
+    keeps its own schedule, with at most one frame in flight. Frames go to
+    a shared worker pool only once they are due, so no worker sleeps through
+    an interval and a slow device never delays the others, however many
+    devices there are. on_progress(stats) is called from worker threads
+    after every frame with the BurstStats of that device.
+    """
+
+    def __init__(self, capture, serials, output_dir, count=10, interval=1.0,
+                 template=DEFAULT_TEMPLATE, max_workers=8, on_progress=None):
+        self.capture = capture
+        self.serials = list(serials)
+        self.output_dir = output_dir
+        self.count = count
+        self.interval = interval
+        self.template = template
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self.stats = {serial: BurstStats(serial) for serial in self.serials}
+        self.cancelled = threading.Event()
+
+    def output_path(self, serial, index):
+        now = time.time()
+        timestamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+        # Serials of network devices contain ':' which is not valid in Windows file names
+        safe_serial = serial.replace(":", "_")
+        path = os.path.join(self.output_dir, self.template.format(serial=safe_serial, timestamp=timestamp, index=index))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def capture_frame(self, serial, index):
+        stats = self.stats[serial]
+        try:
+            self.capture(serial, self.output_path(serial, index))
+            stats.frames += 1
+        except Exception as e:
+            stats.failures += 1
+            stats.last_error = e
+
+        if self.on_progress:
+            self.on_progress(stats)
+
+    def run(self):
+        """Run the burst to completion and return the per-device stats"""
+        started = time.monotonic()
+        # (due time, serial, frame index) of each device's next frame
+        due = [(started, serial, 0) for serial in self.serials]
+        heapq.heapify(due)
+        pending = {}
+        for stats in self.stats.values():
+            stats.started = started
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(self.serials)))) as pool:
+            while (due or pending) and not self.cancelled.is_set():
+                now = time.monotonic()
+                while due and due[0][0] <= now:
+                    _, serial, index = heapq.heappop(due)
+                    pending[pool.submit(self.capture_frame, serial, index)] = (serial, index)
+
+                timeout = min(due[0][0] - now, CANCEL_POLL) if due else CANCEL_POLL
+                if not pending:
+                    self.cancelled.wait(timeout)
+                    continue
+
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    serial, index = pending.pop(future)
+                    stats = self.stats[serial]
+                    if index + 1 < self.count:
+                        # Scheduled against the start time so slow captures don't cause drift
+                        heapq.heappush(due, (started + (index + 1) * self.interval, serial, index + 1))
+                    else:
+                        stats.finished = time.monotonic()
+
+        # Devices stopped by a cancel end where they were
+        for stats in self.stats.values():
+            if stats.finished is None:
+                stats.finished = time.monotonic()
+        return self.stats
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def summary(self):
+        frames = sum(stats.frames for stats in self.stats.values())
+        failures = sum(stats.failures for stats in self.stats.values())
+        rates = [stats.fps for stats in self.stats.values() if stats.frames]
+        average_fps = sum(rates) / len(rates) if rates else 0.0
+        return (f"Burst: {len(self.serials)} device(s), {frames} frame(s), {failures} failure(s), "
+                f"{average_fps:.2f} fps/device")
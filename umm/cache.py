@@ -0,0 +1,149 @@
+"""Per-device metadata cache with per-field expiry and optional SQLite persistence"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), "iOSDeviceManager", "device_cache.sqlite3")
+
+# Seconds each field stays fresh; None means it is kept until the device disconnects
+DEFAULT_TTLS = {
+    # Android
+    "name": 600,
+    "model": None,
+    # iOS
+    "DeviceName": 600,
+    "ProductType": None,
+    "ProductVersion": None,
+    "SerialNumber": None,
+    "BatteryCurrentCapacity": 30,
+    "BatteryIsCharging": 30,
+}
+
+# Fields missing from the TTL table expire after this many seconds
+DEFAULT_TTL = 60
+
+# Seconds a field kept until disconnect stays fresh when read back from disk,
+# since the device may have been updated while the manager was closed
+PERSISTED_TTL = 3600
+
+
+class DeviceMetadataCache:
+    """Cache device facts keyed by serial/UDID and field name
+
+    Entries stop being fresh when a device disconnects, but stay known. With
+    a path the cache is mirrored to SQLite so a cold start can show known
+    devices before any device tool has answered. Entries read back from disk
+    keep their update time, so they save queries within their TTL; fields
+    that are otherwise kept until disconnect expire after PERSISTED_TTL.
+    """
+
+    def __init__(self, path=None, ttls=None, default_ttl=DEFAULT_TTL):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = None
+
+        if path:
+            self.open_database(path)
+
+    def open_database(self, path):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "serial TEXT, field TEXT, value TEXT, updated REAL, PRIMARY KEY (serial, field))"
+            )
+            for serial, field, value, updated in self.db.execute("SELECT serial, field, value, updated FROM metadata"):
+                self.entries.setdefault(serial, {})[field] = (json.loads(value), updated, True)
+        except (sqlite3.Error, OSError, ValueError):
+            # A broken cache file must never keep the manager from starting
+            self.db = None
+
+    def is_fresh(self, field, entry):
+        _, updated, persisted = entry
+        if updated is None:
+            return False
+        ttl = self.ttls.get(field, self.default_ttl)
+        if ttl is None and persisted:
+            ttl = PERSISTED_TTL
+        return ttl is None or time.time() - updated < ttl
+
+    def get(self, serial, field, default=None):
+        """Return a fresh cached value, counting the lookup as a hit or a miss"""
+        with self.lock:
+            entry = self.entries.get(serial, {}).get(field)
+            if entry is not None and self.is_fresh(field, entry):
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            return default
+
+    def get_many(self, serial, fields):
+        """Return the fresh subset of fields; a lookup is a hit only if nothing is missing"""
+        with self.lock:
+            cached = self.entries.get(serial, {})
+            values = {
+                field: cached[field][0]
+                for field in fields if field in cached and self.is_fresh(field, cached[field])
+            }
+
+            if len(values) == len(fields):
+                self.hits += 1
+            else:
+                self.misses += 1
+            return values
+
+    def set(self, serial, field, value):
+        self.update(serial, {field: value})
+
+    def update(self, serial, values):
+        now = time.time()
+        with self.lock:
+            device = self.entries.setdefault(serial, {})
+            for field, value in values.items():
+                device[field] = (value, now, False)
+
+            if self.db:
+                try:
+                    with self.db:
+                        self.db.executemany(
+                            "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+                            [(serial, field, json.dumps(value), now) for field, value in values.items()]
+                        )
+                except sqlite3.Error:
+                    pass
+
+    def invalidate(self, serial):
+        """Stop trusting what is cached for a device, typically on disconnect
+
+        The values stay in memory and on disk for known_devices(), so a
+        later start still shows the device; only their freshness goes.
+        """
+        with self.lock:
+            device = self.entries.get(serial, {})
+            for field, entry in device.items():
+                device[field] = (entry[0], None, entry[2])
+
+    def known_devices(self):
+        """Return the fields cached for every device, including stale and unconfirmed ones"""
+        with self.lock:
+            return {
+                serial: {field: entry[0] for field, entry in fields.items()}
+                for serial, fields in self.entries.items()
+            }
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,397 @@
+"""Headless command line for fleet operations
+
+    python -m umm android devices
+    python -m umm android install --all app.apk
+    python -m umm ios apps --udid 00008030-... --json
+
+Commands run on every target device in parallel and report one result per
+device, as text or as a single JSON document. Device modules are imported
+only by the command that needs them, so a run starts quickly and never
+loads tkinter, Pillow or requests.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Devices worked on at once unless --jobs says otherwise
+DEFAULT_JOBS = 8
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CliError(Exception):
+    """A problem with the command line itself, reported without a traceback"""
+
+
+def default_adb_path():
+    """The adb bundled next to the Android manager, else adb from PATH"""
+    bundled = os.path.join(REPO_ROOT, "android", "adb.exe" if platform.system() == "Windows" else "adb")
+    return bundled if os.path.exists(bundled) else "adb"
+
+
+def run_parallel(targets, func, jobs):
+    """Call func(target) for every target concurrently; one result dict per target, in order"""
+    def call(target):
+        started = time.time()
+        try:
+            result = {"device": target, "ok": True, "result": func(target)}
+        except Exception as e:
+            result = {"device": target, "ok": False, "error": str(e) or type(e).__name__}
+        result["seconds"] = round(time.time() - started, 3)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(targets) or 1))) as pool:
+        return list(pool.map(call, targets))
+
+
+def run_bulk_install(args, installer, targets, packages, ledger, **options):
+    """Install through the install queue, or with --resume finish what is queued for the targets"""
+    from umm.installer import BulkInstall
+    from umm.installqueue import InstallQueue, DEFAULT_QUEUE_PATH
+    queue = InstallQueue(DEFAULT_QUEUE_PATH)
+    options.update(max_workers=args.jobs, ledger=ledger, force=args.force)
+    if args.retries is not None:
+        options["retries"] = args.retries
+    if args.resume:
+        install = BulkInstall.resume(queue, installer, devices=targets, **options)
+    else:
+        install = BulkInstall(None, targets, packages, installer=installer, queue=queue, **options)
+    return [stats.as_result() for stats in install.run().values()]
+
+
+def check_packages(paths, resume, kind):
+    if resume and paths:
+        raise CliError(f"--resume installs the queued packages and takes no {kind}s")
+    if not resume and not paths:
+        raise CliError(f"No {kind}s given")
+    for path in paths:
+        if not os.path.isfile(path):
+            raise CliError(f"No such {kind}: {path}")
+
+
+def run_sync(args, targets, device_files):
+    """Sync LOCAL with REMOTE on every target; with several targets each gets LOCAL/<device>"""
+    from umm.sync import BOTH, DEFAULT_SYNC_PATH, PULL, PUSH, FolderSync, SyncManifest
+    direction = BOTH if args.both else PULL if args.pull else PUSH
+    if direction == PUSH and not os.path.isdir(args.local):
+        raise CliError(f"No such folder: {args.local}")
+    manifest = SyncManifest(DEFAULT_SYNC_PATH)
+
+    def sync(device):
+        local = args.local if len(targets) == 1 or direction == PUSH else os.path.join(args.local, device)
+        actions, stats = FolderSync(device_files(device), local, args.remote, direction, args.checksum, args.delete,
+                                    manifest).run(dry_run=args.dry_run)
+        if stats.errors:
+            path, message = stats.errors[0]
+            raise RuntimeError(f"{len(stats.errors)} file(s) failed, first {path}: {message}")
+        counts = {}
+        for action, _, _, _ in actions:
+            counts[action] = counts.get(action, 0) + 1
+        result = {"planned" if args.dry_run else "done": counts or "already in sync",
+                  "bytes": stats.bytes_done}
+        if args.dry_run or "conflict" in counts:
+            result["actions"] = [f"{action} {path} ({reason})" for action, path, _, reason in actions
+                                 if args.dry_run or action == "conflict"]
+        return result
+    return run_parallel(targets, sync, args.jobs)
+
+
+def completed(process):
+    """Turn a CompletedProcess from a device into a result, raising on failure"""
+    output = process.stdout.decode("utf-8", errors="replace") if isinstance(process.stdout, bytes) else process.stdout
+    if process.returncode not in (0, None):
+        raise RuntimeError((output or process.stderr or f"exit status {process.returncode}").strip())
+    return (output or "").strip()
+
+
+# Android
+
+def android_client(args):
+    from umm.adb import ADB_PORT, AdbClient
+    # Same variable the adb binary honours for a server on another port
+    port = int(os.environ.get("ANDROID_ADB_SERVER_PORT", ADB_PORT))
+    return AdbClient(port=port, adb_path=args.adb)
+
+
+def android_targets(args, client):
+    if args.all:
+        serials = [device["id"] for device in client.devices() if device["status"] == "device"]
+        if not serials:
+            raise CliError("No Android devices are online")
+        return serials
+    return args.serial
+
+
+def android_devices(args):
+    return android_client(args).devices()
+
+
+def android_install(args):
+    from umm.installer import ApkInstaller
+    from umm.ledger import InstallLedger, DEFAULT_LEDGER_PATH
+    check_packages(args.apks, args.resume, "APK")
+    client = android_client(args)
+    ledger = InstallLedger(DEFAULT_LEDGER_PATH)
+
+    deploy = None
+    if args.fast:
+        from umm.fastdeploy import FastDeploy
+        deploy = FastDeploy(client, ledger.hashes)
+    packages = [args.apks] if args.split else [[apk] for apk in args.apks]
+    return run_bulk_install(args, ApkInstaller(client, deploy), android_targets(args, client), packages, ledger,
+                            replace=not args.no_replace)
+
+
+def android_sync(args):
+    from umm.sync import AdbFiles
+    client = android_client(args)
+    return run_sync(args, android_targets(args, client), lambda serial: AdbFiles(client, serial))
+
+
+def android_uninstall(args):
+    client = android_client(args)
+    return run_parallel(android_targets(args, client),
+                        lambda serial: completed(client.uninstall(serial, args.package)), args.jobs)
+
+
+def android_shell(args):
+    client = android_client(args)
+    command = " ".join(args.shell_command)
+    return run_parallel(android_targets(args, client),
+                        lambda serial: completed(client.shell(serial, command, timeout=args.timeout)), args.jobs)
+
+
+def android_reboot(args):
+    client = android_client(args)
+    return run_parallel(android_targets(args, client), lambda serial: client.reboot(serial) or "rebooting", args.jobs)
+
+
+def android_screenshot(args):
+    from umm import screencap
+    client = android_client(args)
+    os.makedirs(args.output, exist_ok=True)
+
+    def capture(serial):
+        path = os.path.join(args.output, serial.replace(":", "_") + ".png")
+        with open(path, "wb") as f:
+            f.write(screencap.capture(client, serial, raw=args.raw))
+        return path
+    return run_parallel(android_targets(args, client), capture, args.jobs)
+
+
+# iOS
+
+def ios_targets(args):
+    if args.all:
+        from umm.ios import list_devices
+        udids = list_devices()
+        if not udids:
+            raise CliError("No iOS devices are attached")
+        return udids
+    return args.udid
+
+
+def run_ios_tool(command, timeout):
+    import subprocess
+    return completed(subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    text=True, timeout=timeout))
+
+
+def ios_devices(args):
+    from umm.ios import list_devices
+    return list_devices()
+
+
+def ios_info(args):
+    from umm.lockdown import read_device_info
+    return run_parallel(ios_targets(args), read_device_info, args.jobs)
+
+
+def ios_apps(args):
+    from umm.ios import list_apps
+
+    def apps(udid):
+        return [{"name": name, "bundle_id": bundle_id, "version": version}
+                for name, bundle_id, version in list_apps(udid)]
+    return run_parallel(ios_targets(args), apps, args.jobs)
+
+
+def ios_install(args):
+    from umm.ios import IpaInstaller
+    from umm.ledger import InstallLedger, DEFAULT_LEDGER_PATH
+    check_packages(args.ipas, args.resume, "IPA")
+    return run_bulk_install(args, IpaInstaller(timeout=args.timeout), ios_targets(args), [[ipa] for ipa in args.ipas],
+                            InstallLedger(DEFAULT_LEDGER_PATH))
+
+
+def ios_sync(args):
+    from umm.afc import AfcSessions
+    from umm.engine import CommandEngine
+    sessions = AfcSessions(engine=CommandEngine())
+    try:
+        return run_sync(args, ios_targets(args), sessions.files)
+    finally:
+        sessions.close()
+
+
+def ios_uninstall(args):
+    return run_parallel(ios_targets(args),
+                        lambda udid: run_ios_tool(["ideviceinstaller", "-u", udid, "-U", args.bundle_id], args.timeout),
+                        args.jobs)
+
+
+def ios_screenshot(args):
+    os.makedirs(args.output, exist_ok=True)
+
+    def capture(udid):
+        path = os.path.join(args.output, udid + ".png")
+        run_ios_tool(["idevicescreenshot", "-u", udid, path], args.timeout)
+        return path
+    return run_parallel(ios_targets(args), capture, args.jobs)
+
+
+# Output
+
+def print_text(command, results):
+    if command.endswith(" devices"):
+        for device in results:
+            if isinstance(device, dict):
+                print(f"{device['id']}\t{device['status']}\t{device['model']}")
+            else:
+                print(device)
+        return
+
+    for result in results:
+        if not result["ok"]:
+            print(f"{result['device']}: ERROR {result['error']}")
+            continue
+
+        value = result["result"]
+        if isinstance(value, list):
+            print(f"{result['device']}: {len(value)} item(s)")
+            for item in value:
+                print("  " + "\t".join(str(v) for v in (item.values() if isinstance(item, dict) else [item])))
+        elif isinstance(value, dict):
+            rate = f" {result['mb_per_s']} MB/s in {result['seconds']} s" if "mb_per_s" in result else ""
+            print(f"{result['device']}:{rate}")
+            for key, item in value.items():
+                print(f"  {key}: {item}")
+        else:
+            print(f"{result['device']}: {value}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="umm", description="Manage Android and iOS devices without the GUI")
+    parser.add_argument("--json", action="store_true", help="print one JSON document instead of text")
+    parser.add_argument("--jobs", "-j", type=int, default=DEFAULT_JOBS, help="devices worked on at once")
+    platforms = parser.add_subparsers(dest="platform", required=True)
+
+    def command(subparsers, name, func, help_text, targets=None):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.set_defaults(func=func)
+        # Accept the global options after the command too, as CI scripts tend to write them
+        sub.add_argument("--json", action="store_true", default=argparse.SUPPRESS)
+        sub.add_argument("--jobs", "-j", type=int, default=argparse.SUPPRESS)
+        if targets:
+            group = sub.add_mutually_exclusive_group(required=True)
+            group.add_argument("--all", action="store_true", help="every connected device")
+            flag, dest = targets
+            group.add_argument(*flag, dest=dest, action="append", help="target device; repeat for several")
+        return sub
+
+    def install_options(sub):
+        sub.add_argument("--retries", type=int,
+                         help="further attempts at a package that failed for a transient reason")
+        sub.add_argument("--resume", action="store_true",
+                         help="finish the installs an interrupted run left queued for the target devices")
+
+    def sync_options(sub):
+        sub.add_argument("local", metavar="LOCAL", help="folder on this computer")
+        sub.add_argument("remote", metavar="REMOTE", help="folder on the device")
+        direction = sub.add_mutually_exclusive_group()
+        direction.add_argument("--pull", action="store_true", help="make LOCAL match the device instead")
+        direction.add_argument("--both", action="store_true", help="copy whichever side changed since the last sync")
+        sub.add_argument("--checksum", action="store_true",
+                         help="compare files of equal size by SHA-256 where the device can hash them")
+        sub.add_argument("--delete", action="store_true", help="delete files the other side no longer has")
+        sub.add_argument("--dry-run", "-n", action="store_true", help="list what would be copied or deleted")
+
+    android = platforms.add_parser("android", help="Android devices over adb")
+    android.add_argument("--adb", default=default_adb_path(), help="adb binary used to start the server")
+    android_commands = android.add_subparsers(dest="command", required=True)
+    serial = (["--serial", "-s"], "serial")
+
+    command(android_commands, "devices", android_devices, "list devices")
+    sub = command(android_commands, "install", android_install, "install APKs", serial)
+    sub.add_argument("apks", nargs="*", metavar="APK")
+    sub.add_argument("--no-replace", action="store_true", help="fail instead of replacing an installed app")
+    sub.add_argument("--split", action="store_true", help="the APKs are a base and its splits (install-multiple)")
+    sub.add_argument("--force", action="store_true", help="install even where the same build is already installed")
+    sub.add_argument("--fast", action="store_true",
+                     help="send only the entries that changed since the installed build, when it is known")
+    install_options(sub)
+    sub = command(android_commands, "sync", android_sync, "sync a folder with devices", serial)
+    sync_options(sub)
+    sub = command(android_commands, "uninstall", android_uninstall, "uninstall a package", serial)
+    sub.add_argument("package")
+    sub = command(android_commands, "shell", android_shell, "run a shell command", serial)
+    sub.add_argument("shell_command", nargs=argparse.REMAINDER, metavar="COMMAND")
+    sub.add_argument("--timeout", type=float, default=60)
+    command(android_commands, "reboot", android_reboot, "reboot devices", serial)
+    sub = command(android_commands, "screenshot", android_screenshot, "capture screenshots", serial)
+    sub.add_argument("--output", "-o", default=".", help="directory for <serial>.png files")
+    sub.add_argument("--raw", action="store_true", help="encode the raw framebuffer on the host")
+
+    ios = platforms.add_parser("ios", help="iOS devices over usbmuxd")
+    ios_commands = ios.add_subparsers(dest="command", required=True)
+    udid = (["--udid", "-u"], "udid")
+
+    command(ios_commands, "devices", ios_devices, "list devices")
+    command(ios_commands, "info", ios_info, "show lockdown device info", udid)
+    command(ios_commands, "apps", ios_apps, "list installed apps", udid)
+    sub = command(ios_commands, "install", ios_install, "install IPAs", udid)
+    sub.add_argument("ipas", nargs="*", metavar="IPA")
+    sub.add_argument("--timeout", type=float, default=600, help="seconds allowed for each IPA")
+    sub.add_argument("--force", action="store_true", help="install even where the same build is already installed")
+    install_options(sub)
+    sub = command(ios_commands, "sync", ios_sync, "sync a folder with devices", udid)
+    sync_options(sub)
+    sub = command(ios_commands, "uninstall", ios_uninstall, "uninstall an app", udid)
+    sub.add_argument("bundle_id")
+    sub.add_argument("--timeout", type=float, default=60)
+    sub = command(ios_commands, "screenshot", ios_screenshot, "capture screenshots", udid)
+    sub.add_argument("--output", "-o", default=".", help="directory for <udid>.png files")
+    sub.add_argument("--timeout", type=float, default=15)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    name = f"{args.platform} {args.command}"
+    started = time.time()
+
+    try:
+        results = args.func(args)
+    except CliError as e:
+        print(f"umm: {e}", file=sys.stderr)
+        return 2
+    except Exception as e:
+        if args.json:
+            print(json.dumps({"command": name, "ok": False, "error": str(e)}))
+        else:
+            print(f"umm: {name} failed: {e}", file=sys.stderr)
+        return 1
+
+    ok = all(result.get("ok", True) for result in results if isinstance(result, dict) and "device" in result)
+    if args.json:
+        # Lockdown values include bytes and dates, which JSON has no type for
+        print(json.dumps({"command": name, "ok": ok, "seconds": round(time.time() - started, 3),
+                          "results": results}, indent=2, default=str))
+    else:
+        print_text(name, results)
+    return 0 if ok else 1
@@ -0,0 +1,411 @@
+"""Tk dialogs shared by the device manager front ends"""
+import os
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from umm.burst import DEFAULT_TEMPLATE
+from umm.installer import DEFAULT_PARALLEL
+from umm.sync import BOTH, PULL, PUSH
+
+
+class BurstDialog:
+    """Ask which devices to capture, how often and where to put the frames
+
+    devices is a list of (serial, label) pairs. on_start is called with
+    (serials, output_dir, count, interval, template) once the user confirms.
+    """
+
+    def __init__(self, root, devices, on_start):
+        self.devices = devices
+        self.on_start = on_start
+
+        self.dialog = tk.Toplevel(root)
+        self.dialog.title("Burst Screenshots")
+        self.dialog.geometry("420x460")
+        self.dialog.transient(root)
+        self.dialog.grab_set()
+
+        ttk.Label(self.dialog, text="Devices to capture:").pack(anchor=tk.W, padx=10, pady=(10, 5))
+
+        listbox_frame = ttk.Frame(self.dialog)
+        listbox_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        scrollbar = ttk.Scrollbar(listbox_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.device_listbox = tk.Listbox(listbox_frame, selectmode=tk.EXTENDED, yscrollcommand=scrollbar.set)
+        self.device_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.device_listbox.yview)
+
+        for serial, label in devices:
+            self.device_listbox.insert(tk.END, label)
+        self.device_listbox.select_set(0, tk.END)
+
+        options_frame = ttk.Frame(self.dialog)
+        options_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(options_frame, text="Frames per device:").grid(row=0, column=0, sticky=tk.W, pady=2)
+        self.count_var = tk.StringVar(value="10")
+        ttk.Entry(options_frame, textvariable=self.count_var, width=10).grid(row=0, column=1, sticky=tk.W, pady=2)
+
+        ttk.Label(options_frame, text="Interval (seconds):").grid(row=1, column=0, sticky=tk.W, pady=2)
+        self.interval_var = tk.StringVar(value="1.0")
+        ttk.Entry(options_frame, textvariable=self.interval_var, width=10).grid(row=1, column=1, sticky=tk.W, pady=2)
+
+        ttk.Label(options_frame, text="Output folder:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        self.output_var = tk.StringVar(value=os.path.join(os.path.expanduser("~"), "Screenshots"))
+        ttk.Entry(options_frame, textvariable=self.output_var, width=28).grid(row=2, column=1, sticky=tk.W, pady=2)
+        ttk.Button(options_frame, text="Browse", command=self.browse_output).grid(row=2, column=2, padx=5, pady=2)
+
+        ttk.Label(options_frame, text="File name template:").grid(row=3, column=0, sticky=tk.W, pady=2)
+        self.template_var = tk.StringVar(value=DEFAULT_TEMPLATE)
+        ttk.Entry(options_frame, textvariable=self.template_var, width=28).grid(row=3, column=1, sticky=tk.W, pady=2)
+
+        button_frame = ttk.Frame(self.dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        ttk.Button(button_frame, text="Cancel", command=self.dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Start", command=self.start).pack(side=tk.RIGHT, padx=5)
+
+    def browse_output(self):
+        output_dir = filedialog.askdirectory(title="Select Output Folder", parent=self.dialog)
+        if output_dir:
+            self.output_var.set(output_dir)
+
+    def start(self):
+        serials = [self.devices[index][0] for index in self.device_listbox.curselection()]
+        if not serials:
+            messagebox.showwarning("No Selection", "Please select at least one device", parent=self.dialog)
+            return
+
+        try:
+            count = int(self.count_var.get())
+            interval = float(self.interval_var.get())
+        except ValueError:
+            messagebox.showerror("Invalid Settings", "Frames and interval must be numbers", parent=self.dialog)
+            return
+
+        template = self.template_var.get().strip() or DEFAULT_TEMPLATE
+        self.dialog.destroy()
+        self.on_start(serials, self.output_var.get(), count, interval, template)
+
+
+class InstallDialog:
+    """Ask which devices to install on, which APKs to install and how many devices at once
+
+    devices is a list of (serial, label) pairs; the serials in selected start
+    out selected. on_start is called with (serials, apk_paths, split,
+    replace, parallel, force, fast) once the user confirms.
+    """
+
+    def __init__(self, root, devices, on_start, selected=()):
+        self.devices = devices
+        self.on_start = on_start
+        self.apk_paths = []
+
+        self.dialog = tk.Toplevel(root)
+        self.dialog.title("Install APKs")
+        self.dialog.geometry("460x570")
+        self.dialog.transient(root)
+        self.dialog.grab_set()
+
+        ttk.Label(self.dialog, text="Devices to install on:").pack(anchor=tk.W, padx=10, pady=(10, 5))
+
+        device_frame = ttk.Frame(self.dialog)
+        device_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        device_scrollbar = ttk.Scrollbar(device_frame)
+        device_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.device_listbox = tk.Listbox(device_frame, selectmode=tk.EXTENDED, exportselection=False,
+                                         yscrollcommand=device_scrollbar.set)
+        self.device_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        device_scrollbar.config(command=self.device_listbox.yview)
+
+        for index, (serial, label) in enumerate(devices):
+            self.device_listbox.insert(tk.END, label)
+            if serial in selected:
+                self.device_listbox.select_set(index)
+        if not self.device_listbox.curselection():
+            self.device_listbox.select_set(0, tk.END)
+
+        apk_header = ttk.Frame(self.dialog)
+        apk_header.pack(fill=tk.X, padx=10, pady=(10, 5))
+        ttk.Label(apk_header, text="APKs:").pack(side=tk.LEFT)
+        ttk.Button(apk_header, text="Remove", command=self.remove_apks).pack(side=tk.RIGHT)
+        ttk.Button(apk_header, text="Add...", command=self.add_apks).pack(side=tk.RIGHT, padx=5)
+
+        self.apk_listbox = tk.Listbox(self.dialog, selectmode=tk.EXTENDED, exportselection=False, height=6)
+        self.apk_listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        options_frame = ttk.Frame(self.dialog)
+        options_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        self.split_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="APKs are splits of one app (install-multiple)",
+                        variable=self.split_var).grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=2)
+
+        self.replace_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Replace existing app",
+                        variable=self.replace_var).grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=2)
+
+        self.force_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Reinstall even if the same build is installed",
+                        variable=self.force_var).grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=2)
+
+        self.fast_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="Fast deploy (send only what changed since the installed build)",
+                        variable=self.fast_var).grid(row=3, column=0, columnspan=2, sticky=tk.W, pady=2)
+
+        ttk.Label(options_frame, text="Devices at once:").grid(row=4, column=0, sticky=tk.W, pady=2)
+        self.parallel_var = tk.StringVar(value=str(DEFAULT_PARALLEL))
+        ttk.Entry(options_frame, textvariable=self.parallel_var, width=10).grid(row=4, column=1, sticky=tk.W, pady=2)
+
+        button_frame = ttk.Frame(self.dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        ttk.Button(button_frame, text="Cancel", command=self.dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Install", command=self.start).pack(side=tk.RIGHT, padx=5)
+
+    def add_apks(self):
+        paths = filedialog.askopenfilenames(
+            title="Select APK files to install", parent=self.dialog,
+            filetypes=[("APK files", "*.apk"), ("All files", "*.*")]
+        )
+        for path in paths:
+            if path not in self.apk_paths:
+                self.apk_paths.append(path)
+                self.apk_listbox.insert(tk.END, os.path.basename(path))
+
+    def remove_apks(self):
+        for index in reversed(self.apk_listbox.curselection()):
+            self.apk_listbox.delete(index)
+            del self.apk_paths[index]
+
+    def start(self):
+        serials = [self.devices[index][0] for index in self.device_listbox.curselection()]
+        if not serials:
+            messagebox.showwarning("No Selection", "Please select at least one device", parent=self.dialog)
+            return
+        if not self.apk_paths:
+            messagebox.showwarning("No APKs", "Please add at least one APK", parent=self.dialog)
+            return
+
+        try:
+            parallel = int(self.parallel_var.get())
+            if parallel < 1:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Invalid Settings", "Devices at once must be a positive number", parent=self.dialog)
+            return
+
+        self.dialog.destroy()
+        self.on_start(serials, list(self.apk_paths), self.split_var.get(), self.replace_var.get(), parallel,
+                      self.force_var.get(), self.fast_var.get())
+
+
+class InstallProgressDialog:
+    """One row per device with its install state, progress, throughput and time
+
+    Call update_device(stats) with InstallStats from the Tk thread, and
+    finish(summary) once the install is over. on_cancel is called when the
+    user asks to stop.
+    """
+
+    def __init__(self, root, serials, on_cancel):
+        self.on_cancel = on_cancel
+
+        self.dialog = tk.Toplevel(root)
+        self.dialog.title("Installing")
+        self.dialog.geometry("640x360")
+        self.dialog.transient(root)
+
+        tree_frame = ttk.Frame(self.dialog)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.tree = ttk.Treeview(tree_frame, columns=("state", "progress", "rate", "time", "package"), show="tree headings")
+        self.tree.heading("#0", text="Device")
+        self.tree.heading("state", text="Status")
+        self.tree.heading("progress", text="Progress")
+        self.tree.heading("rate", text="MB/s")
+        self.tree.heading("time", text="Time")
+        self.tree.heading("package", text="Package")
+        self.tree.column("#0", width=140)
+        for column, width in (("state", 80), ("progress", 70), ("rate", 60), ("time", 60), ("package", 180)):
+            self.tree.column(column, width=width)
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        for serial in serials:
+            self.tree.insert("", tk.END, iid=serial, text=serial, values=("Waiting", "", "", "", ""))
+
+        self.summary_var = tk.StringVar(value=f"Installing on {len(serials)} device(s)...")
+        ttk.Label(self.dialog, textvariable=self.summary_var).pack(anchor=tk.W, padx=10)
+
+        self.button = ttk.Button(self.dialog, text="Cancel", command=self.cancel)
+        self.button.pack(pady=10)
+
+    def update_device(self, stats):
+        if not self.dialog.winfo_exists():
+            return
+        self.tree.item(stats.serial, values=(
+            stats.state, f"{stats.percent:.0f}%", f"{stats.mb_per_second:.1f}",
+            f"{stats.elapsed:.1f}s", stats.error or stats.current or ""
+        ))
+
+    def cancel(self):
+        self.on_cancel()
+        self.summary_var.set("Cancelling; packages being installed now will finish, the rest stay queued...")
+
+    def finish(self, summary):
+        if not self.dialog.winfo_exists():
+            return
+        self.summary_var.set(summary)
+        self.button.config(text="Close", command=self.dialog.destroy)
+
+
+class TransferProgressDialog:
+    """Byte progress, file counts and rates of a DirectoryTransfer
+
+    Call update(stats) with TransferStats from the Tk thread, and
+    finish(summary) once the transfer is over. on_cancel is called when the
+    user asks to stop.
+    """
+
+    def __init__(self, root, title, on_cancel):
+        self.on_cancel = on_cancel
+
+        self.dialog = tk.Toplevel(root)
+        self.dialog.title(title)
+        self.dialog.geometry("440x170")
+        self.dialog.transient(root)
+
+        self.progress = ttk.Progressbar(self.dialog, mode="determinate", maximum=100)
+        self.progress.pack(fill=tk.X, padx=20, pady=(20, 10))
+
+        self.summary_var = tk.StringVar(value="Listing files...")
+        ttk.Label(self.dialog, textvariable=self.summary_var, wraplength=400).pack(anchor=tk.W, padx=20)
+
+        self.button = ttk.Button(self.dialog, text="Cancel", command=self.cancel)
+        self.button.pack(pady=10)
+
+    def update(self, stats):
+        if not self.dialog.winfo_exists():
+            return
+        self.progress["value"] = stats.percent
+        self.summary_var.set(
+            f"{stats.files_done}/{stats.files_total} files, {stats.bytes_done / 1e6:.1f} of "
+            f"{stats.bytes_total / 1e6:.1f} MB ({stats.files_per_second:.1f} files/s, {stats.mb_per_second:.1f} MB/s)"
+            + (f", {len(stats.errors)} failed" if stats.errors else "")
+        )
+
+    def cancel(self):
+        self.on_cancel()
+        self.summary_var.set("Cancelling...")
+
+    def finish(self, summary):
+        if not self.dialog.winfo_exists():
+            return
+        self.progress["value"] = 100
+        self.summary_var.set(summary)
+        self.button.config(text="Close", command=self.dialog.destroy)
+
+
+class SyncDialog:
+    """Pick a local folder to sync with a device folder, preview the plan and start
+
+    on_preview and on_start are called with (local folder, direction,
+    checksum, delete); on_preview should answer with show_plan(actions).
+    can_hash hides the checksum option for devices that cannot hash files.
+    """
+
+    def __init__(self, root, remote_path, on_preview, on_start, can_hash=True):
+        self.on_preview = on_preview
+        self.on_start = on_start
+
+        self.dialog = tk.Toplevel(root)
+        self.dialog.title("Sync Folder")
+        self.dialog.geometry("520x460")
+        self.dialog.transient(root)
+        self.dialog.grab_set()
+
+        options_frame = ttk.Frame(self.dialog)
+        options_frame.pack(fill=tk.X, padx=10, pady=(10, 5))
+
+        ttk.Label(options_frame, text="Local folder:").grid(row=0, column=0, sticky=tk.W, pady=2)
+        self.local_var = tk.StringVar()
+        ttk.Entry(options_frame, textvariable=self.local_var, width=40).grid(row=0, column=1, sticky=tk.W, pady=2)
+        ttk.Button(options_frame, text="Browse", command=self.browse_local).grid(row=0, column=2, padx=5, pady=2)
+
+        ttk.Label(options_frame, text="Device folder:").grid(row=1, column=0, sticky=tk.W, pady=2)
+        ttk.Label(options_frame, text=remote_path).grid(row=1, column=1, columnspan=2, sticky=tk.W, pady=2)
+
+        self.direction_var = tk.StringVar(value=PUSH)
+        for row, (direction, text) in enumerate([(PUSH, "Make the device match this computer"),
+                                                 (PULL, "Make this computer match the device"),
+                                                 (BOTH, "Copy whichever side changed")], start=2):
+            ttk.Radiobutton(options_frame, text=text, variable=self.direction_var,
+                            value=direction).grid(row=row, column=0, columnspan=3, sticky=tk.W)
+
+        self.checksum_var = tk.BooleanVar(value=False)
+        if can_hash:
+            ttk.Checkbutton(options_frame, text="Compare contents of files with the same size",
+                            variable=self.checksum_var).grid(row=5, column=0, columnspan=3, sticky=tk.W)
+        self.delete_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Delete files the other side no longer has",
+                        variable=self.delete_var).grid(row=6, column=0, columnspan=3, sticky=tk.W)
+
+        ttk.Label(self.dialog, text="Planned changes:").pack(anchor=tk.W, padx=10, pady=(5, 0))
+        listbox_frame = ttk.Frame(self.dialog)
+        listbox_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        scrollbar = ttk.Scrollbar(listbox_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.plan_listbox = tk.Listbox(listbox_frame, yscrollcommand=scrollbar.set)
+        self.plan_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.plan_listbox.yview)
+
+        button_frame = ttk.Frame(self.dialog)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        ttk.Button(button_frame, text="Cancel", command=self.dialog.destroy).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Sync", command=self.start).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="Preview", command=self.preview).pack(side=tk.RIGHT, padx=5)
+
+    def browse_local(self):
+        folder = filedialog.askdirectory(title="Select Folder to Sync", parent=self.dialog)
+        if folder:
+            self.local_var.set(folder)
+
+    def settings(self):
+        local = self.local_var.get().strip()
+        if not local:
+            messagebox.showwarning("No Folder", "Please choose a local folder", parent=self.dialog)
+            return None
+        return local, self.direction_var.get(), self.checksum_var.get(), self.delete_var.get()
+
+    def preview(self):
+        settings = self.settings()
+        if settings:
+            self.plan_listbox.delete(0, tk.END)
+            self.plan_listbox.insert(tk.END, "Comparing folders...")
+            self.on_preview(*settings)
+
+    def show_plan(self, actions):
+        if not self.dialog.winfo_exists():
+            return
+        self.plan_listbox.delete(0, tk.END)
+        for action, path, size, reason in actions:
+            self.plan_listbox.insert(tk.END, f"{action}  {path}  ({reason})")
+        if not actions:
+            self.plan_listbox.insert(tk.END, "Already in sync")
+
+    def start(self):
+        settings = self.settings()
+        if settings:
+            self.dialog.destroy()
+            self.on_start(*settings)
@@ -0,0 +1,193 @@
+"""Asyncio engine that runs device tool processes for both managers from one background loop
+
+Every tool process is started with asyncio.create_subprocess_exec on a
+single event loop thread, so a long-running stream costs a coroutine rather
+than a thread. Async code iterates a ToolRun directly; threaded callers such
+as the Tk front ends use run() and stream(), which return
+concurrent.futures.Future objects that can be cancelled to kill the tool.
+"""
+import asyncio
+import subprocess
+import threading
+from contextlib import asynccontextmanager
+
+# Tools allowed to run at once against a single device
+DEFAULT_PER_DEVICE = 4
+
+# Tools allowed to run at once overall
+DEFAULT_MAX_PROCESSES = 64
+
+
+def decode(data):
+    return data.decode("utf-8", errors="replace")
+
+
+class ToolRun:
+    """One tool invocation
+
+    `async for line in run` starts the tool and yields its output lines as
+    they arrive; returncode and stderr are set once it exits. The tool is
+    killed when the deadline passes (raising subprocess.TimeoutExpired),
+    when the consuming task is cancelled, or when iteration stops early.
+    """
+
+    def __init__(self, engine, command, device=None, timeout=None, merge_stderr=False):
+        self.engine = engine
+        self.command = list(command)
+        self.device = device
+        self.timeout = timeout
+        self.merge_stderr = merge_stderr
+        self.returncode = None
+        self.stderr = ""
+
+    def __aiter__(self):
+        return self.lines()
+
+    async def wait(self, awaitable, deadline):
+        if deadline is None:
+            return await awaitable
+
+        remaining = deadline - asyncio.get_running_loop().time()
+        try:
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            return await asyncio.wait_for(awaitable, remaining)
+        except asyncio.TimeoutError:
+            raise subprocess.TimeoutExpired(self.command, self.timeout) from None
+
+    async def lines(self):
+        async with self.engine.slot(self.device):
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout if self.timeout else None
+            process = await asyncio.create_subprocess_exec(
+                *self.command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT if self.merge_stderr else subprocess.PIPE,
+            )
+
+            # Drain stderr alongside stdout so a chatty tool cannot fill the pipe and stall
+            errors = None if self.merge_stderr else asyncio.ensure_future(process.stderr.read())
+            try:
+                while True:
+                    line = await self.wait(process.stdout.readline(), deadline)
+                    if not line:
+                        break
+                    yield decode(line)
+
+                self.returncode = await self.wait(process.wait(), deadline)
+                if errors:
+                    self.stderr = decode(await self.wait(errors, deadline))
+            finally:
+                if process.returncode is None:
+                    try:
+                        process.kill()
+                    except ProcessLookupError:
+                        pass
+                    await process.wait()
+                if errors and not errors.done():
+                    errors.cancel()
+
+    async def collect(self):
+        """Run to completion and return a CompletedProcess with text output"""
+        output = [line async for line in self]
+        return subprocess.CompletedProcess(self.command, self.returncode, "".join(output), self.stderr)
+
+    async def follow(self, on_line):
+        """Call on_line for every output line; returns (returncode, stderr)"""
+        async for line in self:
+            on_line(line)
+        return self.returncode, self.stderr
+
+
+class CommandEngine:
+    """Run device tools as asyncio subprocesses on one background loop
+
+    Each device gets a semaphore, so a burst of requests against one device
+    queues instead of flooding it, while different devices proceed in
+    parallel up to max_processes tools in total.
+    """
+
+    def __init__(self, per_device=DEFAULT_PER_DEVICE, max_processes=DEFAULT_MAX_PROCESSES):
+        self.per_device = per_device
+        self.max_processes = max_processes
+        self.device_limits = {}
+        self.process_limit = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run_loop, name="umm-engine", daemon=True)
+        self.thread.start()
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @asynccontextmanager
+    async def slot(self, device):
+        """Hold a process slot, and a per-device one when device is given"""
+        # Semaphores are created on the loop thread, where they are used
+        if self.process_limit is None:
+            self.process_limit = asyncio.Semaphore(self.max_processes)
+
+        async with self.process_limit:
+            if device is None:
+                yield
+                return
+
+            limit = self.device_limits.get(device)
+            if limit is None:
+                limit = self.device_limits[device] = asyncio.Semaphore(self.per_device)
+            async with limit:
+                yield
+
+    def tool(self, command, device=None, timeout=None, merge_stderr=False):
+        """A ToolRun for async callers on the engine loop"""
+        return ToolRun(self, command, device, timeout, merge_stderr)
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the engine loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, command, device=None, timeout=None):
+        """Run a tool to completion; the future resolves to a CompletedProcess"""
+        return self.submit(self.tool(command, device, timeout).collect())
+
+    def stream(self, command, on_line, device=None, timeout=None, merge_stderr=False):
+        """Run a tool, calling on_line from the engine thread for each output line
+
+        The future resolves to (returncode, stderr); cancelling it kills the tool.
+        """
+        return self.submit(self.tool(command, device, timeout, merge_stderr).follow(on_line))
+
+    def probe(self, commands, timeout=10):
+        """Run every {name: command} at once to see which tools are usable
+
+        The future resolves to {name: returncode}, with None for a tool that
+        could not be started or did not exit in time.
+        """
+        async def check(command):
+            try:
+                return (await self.tool(command, timeout=timeout).collect()).returncode
+            except (OSError, subprocess.SubprocessError):
+                return None
+
+        async def check_all():
+            codes = await asyncio.gather(*(check(command) for command in commands.values()))
+            return dict(zip(commands, codes))
+
+        return self.submit(check_all())
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_engine():
+    """The process-wide engine, started on first use"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = CommandEngine()
+        return _shared
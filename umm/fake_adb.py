@@ -0,0 +1,390 @@
+"""Minimal stand-in for the adb server, for exercising AdbClient without devices
+
+Run it with `python -m umm.fake_adb [port]` to serve one fake device, or
+create a FakeAdbServer in-process and add FakeDevice instances to it.
+"""
+import hashlib
+import io
+import shlex
+import socketserver
+import struct
+import sys
+import threading
+import time
+import zipfile
+
+from umm.adb import SHELL_EXIT, SHELL_STDOUT, SYNC_DATA_MAX
+from umm.packages import parse_manifest
+
+
+def compiled_manifest(package, version_code):
+    """A binary AndroidManifest.xml holding only <manifest package=... android:versionCode=...>"""
+    strings = ["versionCode", "package", "manifest", package]
+    offsets = []
+    pool = b""
+    for string in strings:
+        offsets.append(len(pool))
+        pool += struct.pack("<H", len(string)) + string.encode("utf-16-le") + b"\0\0"
+    pool += b"\0" * (-len(pool) % 4)
+    strings_start = 28 + 4 * len(strings)
+    string_pool = (struct.pack("<HHIIIIII", 0x0001, 28, strings_start + len(pool), len(strings), 0, 0, strings_start, 0)
+                   + b"".join(struct.pack("<I", offset) for offset in offsets) + pool)
+    resource_map = struct.pack("<HHII", 0x0180, 8, 12, 0x0101021B)
+
+    attributes = (struct.pack("<IIIHBBI", 0xFFFFFFFF, 0, 0xFFFFFFFF, 8, 0, 0x10, version_code)
+                  + struct.pack("<IIIHBBI", 0xFFFFFFFF, 1, 3, 8, 0, 0x03, 3))
+    element = struct.pack("<IIIIHHHHHH", 1, 0xFFFFFFFF, 0xFFFFFFFF, 2, 20, 20, 2, 0, 0, 0) + attributes
+    element = struct.pack("<HHI", 0x0102, 16, 8 + len(element)) + element
+
+    body = string_pool + resource_map + element
+    return struct.pack("<HHI", 0x0003, 8, 8 + len(body)) + body
+
+
+def synthetic_apk(path, package="com.example.fake", version_code=1, entries=None):
+    """Write an uncompressed APK-shaped zip with a real manifest and the given {name: bytes} entries"""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as apk:
+        apk.writestr("AndroidManifest.xml", compiled_manifest(package, version_code))
+        for name, data in (entries or {}).items():
+            apk.writestr(name, data)
+    return path
+
+
+class FakeDevice:
+    """A scripted device: canned shell output, an in-memory filesystem and package list
+
+    Installed APKs are kept as /data/app/<package>-1/base.apk, so pm path,
+    dumpsys package, sha256sum and the dd-based scripts of a delta install
+    behave as on a real device.
+    """
+
+    def __init__(self, serial, model="Fake_Phone", state="device", features=("shell_v2", "cmd")):
+        self.serial = serial
+        self.model = model
+        self.state = state
+        self.features = set(features)
+        self.responses = {}
+        self.files = {}
+        self.packages = set()
+        self.commands = []
+        self.sessions = {}
+        # Folders made with mkdir -p; others exist only while they hold files
+        self.directories = set()
+        self.versions = {}
+        # Seconds the package manager spends verifying each install
+        self.verify_seconds = 0
+
+    def install_apk(self, data):
+        """Install APK bytes as the package manager would; returns the package name"""
+        time.sleep(self.verify_seconds)
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as apk:
+                package, version = parse_manifest(apk.read("AndroidManifest.xml"))
+        except (ValueError, KeyError, zipfile.BadZipFile):
+            package, version = f"installed.package.{len(self.packages)}", "1"
+        self.packages.add(package)
+        self.versions[package] = version
+        self.files[f"/data/app/{package}-1/base.apk"] = (data, 0o100644, int(time.time()))
+        return package
+
+    def run_script(self, script):
+        """Run the subset of sh a delta install uses: truncation and dd with byte offsets"""
+        for line in script.splitlines():
+            args = shlex.split(line)
+            if args[:2] == [":", ">"]:
+                self.files[args[2]] = (b"", 0o100644, int(time.time()))
+            elif args[:1] == ["dd"] and args[-2] == ">>":
+                options = dict(arg.split("=", 1) for arg in args[1:-2])
+                source = self.files[options["if"]][0]
+                skip, count = int(options["skip"]), int(options["count"])
+                target = self.files[args[-1]][0]
+                self.files[args[-1]] = (target + source[skip:skip + count], 0o100644, int(time.time()))
+            elif args:
+                return f"sh: {args[0]}: not found\n".encode(), 127
+        return b"", 0
+
+    def find(self, root):
+        """Output of `find ROOT -mindepth 1 -exec stat -c '%F|%s|%Y|%n' {} +` over the in-memory files"""
+        lines = {}
+        for path, (data, _, mtime) in self.files.items():
+            if not path.startswith(root + "/"):
+                continue
+            lines[path] = f"regular file|{len(data)}|{mtime}|{path}"
+            parent = path.rsplit("/", 1)[0]
+            while parent != root:
+                lines.setdefault(parent, f"directory|4096|0|{parent}")
+                parent = parent.rsplit("/", 1)[0]
+        if not lines and root not in self.directories:
+            return f"find: {root}: No such file or directory\n".encode(), 1
+        return "".join(line + "\n" for _, line in sorted(lines.items())).encode(), 0
+
+    def shell(self, command):
+        """Return (stdout bytes, exit code) for a shell or exec command"""
+        self.commands.append(command)
+        if command in self.responses:
+            return self.responses[command], 0
+
+        args = shlex.split(command)
+        if args[:2] == ["pm", "path"] and args[2] in self.packages:
+            return f"package:/data/app/{args[2]}-1/base.apk\n".encode(), 0
+        if args[:2] == ["dumpsys", "package"] and args[2] in self.versions:
+            return f"Packages:\n  Package [{args[2]}]\n    versionCode={self.versions[args[2]]} minSdk=21\n".encode(), 0
+        if args[:1] == ["sha256sum"] and all(path in self.files for path in args[1:]):
+            return "".join(f"{hashlib.sha256(self.files[path][0]).hexdigest()}  {path}\n" for path in args[1:]).encode(), 0
+        if args[:1] == ["find"] and "stat" in args:
+            return self.find(args[1].rstrip("/"))
+        if args[:2] == ["mkdir", "-p"]:
+            self.directories.update(path.rstrip("/") for path in args[2:])
+            return b"", 0
+        if args[:1] == ["sh"] and args[1] in self.files:
+            return self.run_script(self.files[args[1]][0].decode("utf-8"))
+        if args[:2] == ["pm", "install"] and args[-1] in self.files:
+            self.install_apk(self.files[args[-1]][0])
+            return b"Success\n", 0
+        if args[:2] == ["pm", "uninstall"] and len(args) == 3:
+            if args[2] in self.packages:
+                self.packages.discard(args[2])
+                self.versions.pop(args[2], None)
+                self.files.pop(f"/data/app/{args[2]}-1/base.apk", None)
+                return b"Success\n", 0
+            return b"Failure [DELETE_FAILED_INTERNAL_ERROR]\n", 1
+        if args[:2] == ["pm", "install"]:
+            self.packages.add(f"installed.package.{len(self.packages)}")
+            return b"Success\n", 0
+        if args[:2] in (["pm", "install-create"], ["cmd", "package"]) and "install-create" in args:
+            session = 1000 + len(self.sessions)
+            self.sessions[session] = []
+            return f"Success: created install session [{session}]\n".encode(), 0
+        if args[:2] == ["pm", "install-write"] and int(args[4]) in self.sessions:
+            self.sessions[int(args[4])].append((args[5], self.files.get(args[6], (b"",))[0]))
+            return b"Success: streamed 0 bytes\n", 0
+        if "install-commit" in args and int(args[-1]) in self.sessions:
+            splits = self.sessions.pop(int(args[-1]))
+            self.install_apk(splits[0][1] if splits else b"")
+            return b"Success\n", 0
+        if "install-abandon" in args:
+            self.sessions.pop(int(args[-1]), None)
+            return b"Success\n", 0
+        if args[:3] == ["pm", "list", "packages"]:
+            return "".join(f"package:{name}\n" for name in sorted(self.packages)).encode(), 0
+        if args[:2] == ["rm", "-f"]:
+            for path in args[2:]:
+                self.files.pop(path, None)
+            return b"", 0
+        if args[:1] == ["rm"]:
+            missing = [path for path in args[1:] if self.files.pop(path, None) is None]
+            return "".join(f"rm: {path}: No such file or directory\n" for path in missing).encode(), 1 if missing else 0
+        return b"", 0
+
+    def device_line(self):
+        return f"{self.serial}\t{self.state} product:fake model:{self.model} device:fake transport_id:1\n"
+
+
+class FakeAdbHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        self.server.fake.connections += 1
+        try:
+            request = self.read_request()
+            self.dispatch(request)
+        except (ConnectionError, ValueError):
+            pass
+
+    def read_exact(self, size):
+        if self.server.fake.link_rate:
+            # Host to device transfers are paced like a USB link
+            time.sleep(size / self.server.fake.link_rate)
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("client went away")
+            data.extend(chunk)
+        return bytes(data)
+
+    def read_request(self):
+        return self.read_exact(int(self.read_exact(4), 16)).decode("utf-8")
+
+    def okay(self, message=None):
+        self.request.sendall(b"OKAY")
+        if message is not None:
+            self.send_message(message)
+
+    def fail(self, message):
+        self.request.sendall(b"FAIL")
+        self.send_message(message)
+
+    def send_message(self, message):
+        payload = message.encode("utf-8")
+        self.request.sendall(b"%04x" % len(payload) + payload)
+
+    def dispatch(self, request):
+        fake = self.server.fake
+        if request == "host:version":
+            self.okay("0029")
+        elif request in ("host:devices", "host:devices-l"):
+            self.okay(fake.device_list())
+        elif request in ("host:track-devices", "host:track-devices-l"):
+            self.okay()
+            self.track_devices()
+        elif request.startswith("host-serial:") and request.endswith(":features"):
+            device = fake.devices.get(request.split(":")[1])
+            if device:
+                self.okay(",".join(sorted(device.features)))
+            else:
+                self.fail("device not found")
+        elif request.startswith("host:transport:"):
+            device = fake.devices.get(request[len("host:transport:"):])
+            if not device or device.state != "device":
+                self.fail("device not found")
+                return
+            self.okay()
+            self.device_service(device, self.read_request())
+        else:
+            self.fail(f"unknown host service {request}")
+
+    def track_devices(self):
+        fake = self.server.fake
+        while fake.running:
+            with fake.changed:
+                generation = fake.generation
+                listing = fake.device_list()
+            self.send_message(listing)
+            with fake.changed:
+                fake.changed.wait_for(lambda: fake.generation != generation or not fake.running)
+
+    def device_service(self, device, service):
+        if service.startswith("shell,v2,raw:"):
+            output, code = device.shell(service[len("shell,v2,raw:"):])
+            self.okay()
+            self.request.sendall(bytes([SHELL_STDOUT]) + struct.pack("<I", len(output)) + output)
+            self.request.sendall(bytes([SHELL_EXIT]) + struct.pack("<I", 1) + bytes([code]))
+        elif service.startswith("shell:"):
+            self.okay()
+            self.request.sendall(device.shell(service[len("shell:"):])[0])
+        elif service.startswith("exec:cmd package install -S "):
+            size = int(service.split()[4])
+            self.okay()
+            data = self.read_exact(size)
+            device.commands.append(service[len("exec:"):])
+            device.install_apk(data)
+            self.request.sendall(b"Success\n")
+        elif service.startswith("exec:cmd package install-write -S "):
+            size, session, name = service.split()[4:7]
+            self.okay()
+            data = self.read_exact(int(size))
+            device.commands.append(service[len("exec:"):])
+            if int(session) not in device.sessions:
+                self.request.sendall(b"Failure [INSTALL_FAILED_INVALID_SESSION]\n")
+                return
+            device.sessions[int(session)].append((name, data))
+            self.request.sendall(f"Success: streamed {size} bytes\n".encode())
+        elif service.startswith("exec:"):
+            self.okay()
+            self.request.sendall(device.shell(service[len("exec:"):])[0])
+        elif service.startswith("reboot:"):
+            device.commands.append(service)
+            self.okay()
+        elif service == "sync:":
+            self.okay()
+            self.sync_service(device)
+        else:
+            self.fail(f"unknown device service {service}")
+
+    def sync_service(self, device):
+        while True:
+            header = self.read_exact(8)
+            request_id, length = header[:4], struct.unpack("<I", header[4:])[0]
+            payload = self.read_exact(length)
+
+            if request_id == b"QUIT":
+                return
+            elif request_id == b"SEND":
+                path, mode = payload.decode("utf-8").rsplit(",", 1)
+                data = bytearray()
+                while True:
+                    chunk_id, chunk_length = self.read_exact(4), struct.unpack("<I", self.read_exact(4))[0]
+                    if chunk_id == b"DONE":
+                        device.files[path] = (bytes(data), int(mode), chunk_length)
+                        break
+                    data.extend(self.read_exact(chunk_length))
+                self.request.sendall(b"OKAY" + struct.pack("<I", 0))
+            elif request_id == b"RECV":
+                entry = device.files.get(payload.decode("utf-8"))
+                if entry is None:
+                    message = b"No such file or directory"
+                    self.request.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+                    continue
+                for offset in range(0, len(entry[0]), SYNC_DATA_MAX):
+                    chunk = entry[0][offset:offset + SYNC_DATA_MAX]
+                    self.request.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                self.request.sendall(b"DONE" + struct.pack("<I", 0))
+            elif request_id == b"STAT":
+                entry = device.files.get(payload.decode("utf-8"))
+                mode, size, mtime = (entry[1], len(entry[0]), entry[2]) if entry else (0, 0, 0)
+                self.request.sendall(b"STAT" + struct.pack("<III", mode, size, mtime))
+            else:
+                return
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """Serve the adb host protocol for a set of FakeDevice instances on localhost"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, link_rate=None):
+        super().__init__(("127.0.0.1", port), FakeAdbHandler)
+        self.fake = self
+        # Bytes per second from host to device, or None for no limit
+        self.link_rate = link_rate
+        self.devices = {}
+        self.connections = 0
+        self.generation = 0
+        self.running = True
+        self.changed = threading.Condition()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def device_list(self):
+        return "".join(device.device_line() for device in self.devices.values())
+
+    def add_device(self, device):
+        with self.changed:
+            self.devices[device.serial] = device
+            self.generation += 1
+            self.changed.notify_all()
+        return device
+
+    def remove_device(self, serial):
+        with self.changed:
+            self.devices.pop(serial, None)
+            self.generation += 1
+            self.changed.notify_all()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        with self.changed:
+            self.running = False
+            self.changed.notify_all()
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5037
+    server = FakeAdbServer(port)
+    server.add_device(FakeDevice("FAKE0001"))
+    print(f"Fake adb server listening on 127.0.0.1:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,458 @@
+"""Minimal stand-in for usbmuxd, for exercising the usbmux client without devices
+
+Run it with `python -m umm.fake_usbmux [port]` and point clients at it with
+USBMUXD_SOCKET_ADDRESS=127.0.0.1:<port>, or create a FakeUsbmuxServer
+in-process and add FakeIOSDevice instances to it.
+"""
+import io
+import plistlib
+import posixpath
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import zipfile
+
+from umm.afc import (AFC_FOPEN_RDONLY, AFC_MAGIC, AFC_OP_DATA, AFC_OP_FILE_CLOSE, AFC_OP_FILE_OPEN,
+                     AFC_OP_FILE_OPEN_RES, AFC_OP_FILE_READ, AFC_OP_FILE_WRITE, AFC_OP_GET_FILE_INFO,
+                     AFC_OP_MAKE_DIR, AFC_OP_READ_DIR, AFC_OP_REMOVE_PATH, AFC_OP_REMOVE_PATH_AND_CONTENTS,
+                     AFC_OP_RENAME_PATH, AFC_OP_SET_FILE_MOD_TIME, AFC_OP_STATUS, AFC_SERVICE, HEADER)
+from umm.lockdown import LOCKDOWN_PORT, read_plist, send_plist
+from umm.packages import ipa_identity
+from umm.usbmux import UsbmuxError, read_packet, send_packet
+
+
+def synthetic_ipa(path, bundle_id="com.example.fake", version="1", entries=None):
+    """Write an IPA-shaped zip with an Info.plist and the given {name: bytes} entries"""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as ipa:
+        ipa.writestr("Payload/Fake.app/Info.plist",
+                     plistlib.dumps({"CFBundleIdentifier": bundle_id, "CFBundleVersion": version}))
+        for name, data in (entries or {}).items():
+            ipa.writestr(name, data)
+    return path
+
+
+class FakeIOSDevice:
+    """A scripted iOS device
+
+    services maps a device port to handler(sock); lockdownd is served on its
+    usual port from values, a dict of {domain: {key: value}} where the
+    default domain is None. AFC serves files, {path: (bytes, mtime in
+    seconds)}, and directories; add afc to lockdown_services under AFC2 to
+    make the device look jailbroken. afc_latency delays every AFC reply by
+    that many seconds without holding up the requests behind it, as a USB
+    link does.
+    """
+
+    def __init__(self, udid, connection="USB", services=None, pair_record=None, values=None):
+        self.udid = udid
+        self.connection = connection
+        self.services = dict(services or {})
+        self.services.setdefault(LOCKDOWN_PORT, self.lockdown)
+        self.pair_record = pair_record or {"HostID": "FAKE-HOST", "SystemBUID": "FAKE-BUID"}
+        self.values = values or {
+            None: {
+                "UniqueDeviceID": udid,
+                "DeviceName": "Fake iPhone",
+                "ProductType": "iPhone10,3",
+                "ProductVersion": "16.5",
+                "SerialNumber": "FAKESERIAL01",
+            },
+            "com.apple.mobile.battery": {"BatteryCurrentCapacity": 87, "BatteryIsCharging": False},
+        }
+        self.apps = {}
+        self.lockdown_services = {"com.apple.mobile.installation_proxy": self.installation_proxy,
+                                  AFC_SERVICE: self.afc}
+        self.files = {}
+        self.directories = {"/"}
+        self.afc_latency = 0
+        # Seconds installd spends unpacking each install
+        self.install_seconds = 0
+        self.requests = []
+        self.device_id = None
+
+    def lockdown(self, sock):
+        """Answer lockdown requests; sessions are granted without TLS"""
+        try:
+            while True:
+                message = read_plist(sock)
+                request = message.get("Request")
+                self.requests.append(request)
+                reply = {"Request": request}
+                if request == "QueryType":
+                    reply["Type"] = "com.apple.mobile.lockdown"
+                elif request == "StartSession":
+                    if message.get("HostID") != self.pair_record["HostID"]:
+                        reply["Error"] = "InvalidHostID"
+                    else:
+                        reply.update(SessionID="FAKE-SESSION", EnableSessionSSL=False)
+                elif request == "StopSession":
+                    pass
+                elif request == "StartService":
+                    handler = self.lockdown_services.get(message.get("Service"))
+                    if handler is None:
+                        reply["Error"] = "InvalidService"
+                    else:
+                        port = 49152 + len(self.services)
+                        self.services[port] = handler
+                        reply.update(Service=message["Service"], Port=port, EnableServiceSSL=False)
+                elif request == "GetValue":
+                    domain = self.values.get(message.get("Domain"))
+                    if domain is None:
+                        reply["Error"] = "MissingValue"
+                    elif "Key" in message:
+                        if message["Key"] in domain:
+                            reply["Value"] = domain[message["Key"]]
+                        else:
+                            reply["Error"] = "MissingValue"
+                    else:
+                        reply["Value"] = domain
+                else:
+                    reply["Error"] = "InvalidRequest"
+                send_plist(sock, reply)
+        except (UsbmuxError, OSError):
+            pass
+
+    def add_file(self, path, data, mtime=None):
+        """Put a file on the device, creating its folders"""
+        self.files[path] = (bytes(data), int(time.time() if mtime is None else mtime))
+        self.add_directory(posixpath.dirname(path))
+
+    def add_directory(self, path):
+        """Create a folder and any missing parents"""
+        while path not in self.directories:
+            self.directories.add(path)
+            path = posixpath.dirname(path)
+
+    def afc(self, sock):
+        """Answer AFC requests from files and directories, in order"""
+        replies = queue.Queue()
+
+        def send_replies():
+            while True:
+                reply = replies.get()
+                if reply is None:
+                    return
+                due, packet = reply
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    sock.sendall(packet)
+                except OSError:
+                    return
+
+        sender = threading.Thread(target=send_replies, daemon=True)
+        sender.start()
+        handles = {}
+        try:
+            while True:
+                header = bytearray()
+                while len(header) < HEADER.size:
+                    chunk = sock.recv(HEADER.size - len(header))
+                    if not chunk:
+                        return
+                    header.extend(chunk)
+                magic, entire_length, header_length, packet_num, operation = HEADER.unpack(bytes(header))
+                if magic != AFC_MAGIC:
+                    return
+                body = b""
+                while len(body) < entire_length - HEADER.size:
+                    chunk = sock.recv(entire_length - HEADER.size - len(body))
+                    if not chunk:
+                        return
+                    body += chunk
+                arguments, data = body[:header_length - HEADER.size], body[header_length - HEADER.size:]
+                reply_operation, payload = self.afc_request(operation, arguments, data, handles)
+                packet = HEADER.pack(AFC_MAGIC, HEADER.size + len(payload), HEADER.size + len(payload),
+                                     packet_num, reply_operation) + payload
+                replies.put((time.monotonic() + self.afc_latency, packet))
+        except OSError:
+            pass
+        finally:
+            replies.put(None)
+
+    def afc_request(self, operation, arguments, data, handles):
+        """(reply operation, payload) for one AFC request"""
+        def status(code=0):
+            return AFC_OP_STATUS, struct.pack("<Q", code)
+
+        def paths(offset=0):
+            return [path.decode("utf-8") for path in arguments[offset:].split(b"\0")[:-1]]
+
+        if operation == AFC_OP_READ_DIR:
+            path = paths()[0].rstrip("/") or "/"
+            if path not in self.directories:
+                return status(8)
+            names = {posixpath.basename(entry) for entry in list(self.files) + list(self.directories)
+                     if entry != "/" and posixpath.dirname(entry) == path}
+            return AFC_OP_DATA, "".join(name + "\0" for name in [".", ".."] + sorted(names)).encode("utf-8")
+        if operation == AFC_OP_GET_FILE_INFO:
+            path = paths()[0].rstrip("/") or "/"
+            if path in self.files:
+                size, kind, mtime = len(self.files[path][0]), "S_IFREG", self.files[path][1]
+            elif path in self.directories:
+                size, kind, mtime = 64, "S_IFDIR", 0
+            else:
+                return status(8)
+            info = {"st_size": size, "st_blocks": (size + 511) // 512, "st_nlink": 1, "st_ifmt": kind,
+                    "st_mtime": mtime * 1000000000, "st_birthtime": mtime * 1000000000}
+            return AFC_OP_DATA, "".join(f"{key}\0{value}\0" for key, value in info.items()).encode("utf-8")
+        if operation == AFC_OP_MAKE_DIR:
+            path = paths()[0].rstrip("/")
+            if path in self.files:
+                return status(16)
+            self.add_directory(path)
+            return status()
+        if operation in (AFC_OP_REMOVE_PATH, AFC_OP_REMOVE_PATH_AND_CONTENTS):
+            path = paths()[0].rstrip("/")
+            inside = [entry for entry in list(self.files) + list(self.directories) if entry.startswith(path + "/")]
+            if path in self.files:
+                del self.files[path]
+            elif path in self.directories and path != "/":
+                if inside and operation == AFC_OP_REMOVE_PATH:
+                    # Directory not empty
+                    return status(1)
+                for entry in inside:
+                    self.files.pop(entry, None)
+                    self.directories.discard(entry)
+                self.directories.discard(path)
+            else:
+                return status(8)
+            return status()
+        if operation == AFC_OP_RENAME_PATH:
+            source, target = paths()
+            if source not in self.files:
+                return status(8)
+            self.files[target] = self.files.pop(source)
+            return status()
+        if operation == AFC_OP_SET_FILE_MOD_TIME:
+            path = paths(8)[0]
+            if path not in self.files:
+                return status(8)
+            self.files[path] = (self.files[path][0], struct.unpack("<Q", arguments[:8])[0] // 1000000000)
+            return status()
+        if operation == AFC_OP_FILE_OPEN:
+            mode, path = struct.unpack("<Q", arguments[:8])[0], paths(8)[0]
+            if mode == AFC_FOPEN_RDONLY:
+                if path not in self.files:
+                    return status(8 if path not in self.directories else 9)
+            elif posixpath.dirname(path) not in self.directories:
+                return status(8)
+            else:
+                self.files[path] = (b"", int(time.time()))
+            handle = max(handles, default=0) + 1
+            handles[handle] = [path, 0]
+            return AFC_OP_FILE_OPEN_RES, struct.pack("<Q", handle)
+        if operation in (AFC_OP_FILE_READ, AFC_OP_FILE_WRITE, AFC_OP_FILE_CLOSE):
+            handle = struct.unpack("<Q", arguments[:8])[0]
+            if handle not in handles:
+                return status(7)
+            path, position = handles[handle]
+            if operation == AFC_OP_FILE_CLOSE:
+                del handles[handle]
+                return status()
+            if operation == AFC_OP_FILE_READ:
+                chunk = self.files[path][0][position:position + struct.unpack("<Q", arguments[8:16])[0]]
+                handles[handle][1] += len(chunk)
+                return AFC_OP_DATA, chunk
+            contents = self.files[path][0]
+            self.files[path] = (contents[:position] + data, self.files[path][1])
+            handles[handle][1] += len(data)
+            return status()
+        # Operation not supported
+        return status(15)
+
+    def install(self, package_path):
+        """Install an IPA from the AFC media root as installd would; returns the final reply"""
+        path = "/" + package_path.lstrip("/")
+        if path not in self.files:
+            return {"Error": "PackageInspectionFailed", "ErrorDescription": f"{package_path} not found"}
+        time.sleep(self.install_seconds)
+        try:
+            bundle_id, version = ipa_identity(io.BytesIO(self.files[path][0]))
+        except ValueError as e:
+            return {"Error": "PackageInspectionFailed", "ErrorDescription": str(e)}
+        self.apps[bundle_id] = {"CFBundleVersion": version, "CFBundleName": bundle_id.rsplit(".", 1)[-1]}
+        return {"Status": "Complete"}
+
+    def attached_message(self):
+        return {
+            "MessageType": "Attached",
+            "DeviceID": self.device_id,
+            "Properties": {
+                "DeviceID": self.device_id,
+                "SerialNumber": self.udid,
+                "ConnectionType": self.connection,
+                "ProductID": 0x12a8,
+            },
+        }
+
+    def installation_proxy(self, sock):
+        """Answer Lookup and Browse from apps, a dict of {bundle ID: attributes}, and Install from AFC files"""
+        try:
+            while True:
+                message = read_plist(sock)
+                command = message.get("Command")
+                self.requests.append(command)
+                options = message.get("ClientOptions", {})
+                if command == "Lookup":
+                    wanted = options.get("BundleIDs") or list(self.apps)
+                    result = {bundle_id: dict(self.apps[bundle_id], CFBundleIdentifier=bundle_id)
+                              for bundle_id in wanted if bundle_id in self.apps}
+                    send_plist(sock, {"LookupResult": result, "Status": "Complete"})
+                elif command == "Browse":
+                    apps = [dict(attributes, CFBundleIdentifier=bundle_id)
+                            for bundle_id, attributes in self.apps.items()]
+                    send_plist(sock, {"CurrentList": apps, "Status": "BrowsingApplications"})
+                    send_plist(sock, {"Status": "Complete"})
+                elif command == "Install":
+                    send_plist(sock, self.install(message.get("PackagePath", "")))
+                else:
+                    send_plist(sock, {"Error": "UnknownCommand"})
+        except (UsbmuxError, OSError):
+            pass
+
+
+class FakeUsbmuxHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        fake = self.server.fake
+        fake.connections += 1
+        try:
+            while True:
+                tag, message = read_packet(self.request)
+                if not self.dispatch(tag, message):
+                    return
+        except (UsbmuxError, OSError):
+            pass
+
+    def result(self, tag, number=0):
+        send_packet(self.request, {"MessageType": "Result", "Number": number}, tag)
+
+    def dispatch(self, tag, message):
+        """Answer one request; returns False once the connection changes purpose"""
+        fake = self.server.fake
+        kind = message.get("MessageType")
+        if kind == "ListDevices":
+            with fake.changed:
+                listing = [device.attached_message() for device in fake.devices.values()]
+            send_packet(self.request, {"DeviceList": listing}, tag)
+        elif kind == "ReadPairRecord":
+            device = fake.find(message.get("PairRecordID"))
+            if device:
+                send_packet(self.request, {"PairRecordData": plistlib.dumps(device.pair_record)}, tag)
+            else:
+                self.result(tag, 2)
+        elif kind == "Listen":
+            self.result(tag)
+            self.listen()
+            return False
+        elif kind == "Connect":
+            device = fake.devices.get(message.get("DeviceID"))
+            port = socket.ntohs(message.get("PortNumber", 0))
+            if not device:
+                self.result(tag, 2)
+            elif port not in device.services:
+                # usbmuxd reports a refused device port as error 3
+                self.result(tag, 3)
+            else:
+                self.result(tag)
+                device.services[port](self.request)
+                return False
+        else:
+            self.result(tag, 1)
+        return True
+
+    def listen(self):
+        fake = self.server.fake
+        known = {}
+        while fake.running:
+            with fake.changed:
+                current = dict(fake.devices)
+                generation = fake.generation
+
+            for device_id in list(known):
+                if device_id not in current:
+                    send_packet(self.request, {"MessageType": "Detached", "DeviceID": device_id})
+                    del known[device_id]
+            for device_id, device in current.items():
+                if device_id not in known:
+                    send_packet(self.request, device.attached_message())
+                    known[device_id] = device
+
+            with fake.changed:
+                fake.changed.wait_for(lambda: fake.generation != generation or not fake.running)
+
+
+class FakeUsbmuxServer(socketserver.ThreadingTCPServer):
+    """Serve the usbmux protocol for a set of FakeIOSDevice instances on localhost"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0):
+        super().__init__(("127.0.0.1", port), FakeUsbmuxHandler)
+        self.fake = self
+        self.devices = {}
+        self.next_device_id = 1
+        self.connections = 0
+        self.generation = 0
+        self.running = True
+        self.changed = threading.Condition()
+
+    @property
+    def address(self):
+        return self.server_address
+
+    def find(self, udid):
+        for device in self.devices.values():
+            if device.udid == udid:
+                return device
+        return None
+
+    def add_device(self, device):
+        with self.changed:
+            device.device_id = self.next_device_id
+            self.next_device_id += 1
+            self.devices[device.device_id] = device
+            self.generation += 1
+            self.changed.notify_all()
+        return device
+
+    def remove_device(self, udid):
+        with self.changed:
+            for device_id, device in list(self.devices.items()):
+                if device.udid == udid:
+                    del self.devices[device_id]
+            self.generation += 1
+            self.changed.notify_all()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        with self.changed:
+            self.running = False
+            self.changed.notify_all()
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 27015
+    server = FakeUsbmuxServer(port)
+    server.add_device(FakeIOSDevice("00008030-FAKE000000000001"))
+    print(f"Fake usbmuxd listening on 127.0.0.1:{server.address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
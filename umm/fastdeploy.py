@@ -0,0 +1,241 @@
+"""Reinstall an APK by sending only the zip entries that changed since the build on the device
+
+A rebuilt APK usually shares most of its entries with the one already
+installed. The device's base.apk is found with `pm path` and identified by
+its SHA-256; if a copy of that exact APK was kept locally from an earlier
+deploy, the new APK is rebuilt on the device from byte ranges of base.apk
+plus a patch holding only the entries that differ, checked against the
+local SHA-256 and installed with `pm install`. Anything unexpected falls
+back to `adb install --incremental` (when a v4 signature sits next to the
+APK) and then to a normal streamed install.
+"""
+import os
+import shlex
+import shutil
+import struct
+import subprocess
+import tempfile
+import zipfile
+
+from umm.adb import AdbError
+from umm.cache import DEFAULT_CACHE_PATH
+from umm.packages import apk_identity
+
+DEFAULT_DEPLOY_CACHE = os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), "apk_cache")
+
+# Deployed APKs kept locally as delta bases
+MAX_CACHED_APKS = 8
+
+# Scratch directory on the device
+REMOTE_DIR = "/data/local/tmp"
+
+# A delta that still sends more than this share of the APK is not worth the rebuild on the device
+MAX_DELTA_RATIO = 0.8
+
+# Seconds allowed for rebuilding and installing on the device
+DEVICE_TIMEOUT = 300
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+LOCAL_HEADER_SIGNATURE = 0x04034B50
+DATA_DESCRIPTOR_SIGNATURE = 0x08074B50
+
+
+def entry_records(path):
+    """{name: (offset, length, local header bytes)} of every entry's local record in a zip"""
+    records = {}
+    with open(path, "rb") as f, zipfile.ZipFile(f) as archive:
+        for info in archive.infolist():
+            f.seek(info.header_offset)
+            header = f.read(LOCAL_HEADER.size)
+            fields = LOCAL_HEADER.unpack(header)
+            if fields[0] != LOCAL_HEADER_SIGNATURE:
+                raise ValueError(f"{path}: bad local header for {info.filename}")
+            header += f.read(fields[9] + fields[10])
+            length = len(header) + info.compress_size
+
+            if info.flag_bits & 0x08:
+                # Sizes follow the data in a descriptor, with or without its signature
+                f.seek(info.header_offset + length)
+                signature = f.read(4)
+                length += 16 if signature == struct.pack("<I", DATA_DESCRIPTOR_SIGNATURE) else 12
+            records[info.filename] = (info.header_offset, length, header)
+    return records
+
+
+def plan_delta(old_path, new_path):
+    """Segments that rebuild new_path from old_path
+
+    Each segment is ("copy", old offset, length) for bytes the old APK
+    already has, or ("data", new offset, length) for bytes that must be
+    sent. An entry is copied only when its local header (name, CRC, sizes
+    and timestamps) is byte-for-byte the same in both APKs.
+    """
+    old_records = entry_records(old_path)
+    new_records = sorted(entry_records(new_path).items(), key=lambda item: item[1][0])
+    size = os.path.getsize(new_path)
+
+    segments = []
+
+    def add(kind, offset, length):
+        if length <= 0:
+            return
+        if segments and segments[-1][0] == kind and segments[-1][1] + segments[-1][2] == offset:
+            segments[-1] = (kind, segments[-1][1], segments[-1][2] + length)
+        else:
+            segments.append((kind, offset, length))
+
+    position = 0
+    for name, (offset, length, header) in new_records:
+        # Padding, signing block or anything else between records is sent as is
+        add("data", position, offset - position)
+        old = old_records.get(name)
+        if old and old[1] == length and old[2] == header:
+            add("copy", old[0], length)
+        else:
+            add("data", offset, length)
+        position = offset + length
+    # The central directory and signing block always change with the content
+    add("data", position, size - position)
+    return segments
+
+
+def delta_size(segments):
+    return sum(length for kind, _, length in segments if kind == "data")
+
+
+class FastDeploy:
+    """Install APKs on Android devices, sending as little as possible
+
+    install() tries a delta against the installed APK, then an incremental
+    install, then a streamed one, and returns a CompletedProcess like
+    AdbClient.install. Every APK installed successfully is kept in cache_dir
+    under its SHA-256, so the next deploy of the same app can use it as a base.
+    """
+
+    def __init__(self, client, hashes, cache_dir=DEFAULT_DEPLOY_CACHE, max_cached=MAX_CACHED_APKS):
+        self.client = client
+        self.hashes = hashes
+        self.cache_dir = cache_dir
+        self.max_cached = max_cached
+
+    def cached_path(self, digest):
+        return os.path.join(self.cache_dir, digest + ".apk")
+
+    def installed_base(self, serial, package):
+        """(remote path, local copy) of the APK the device has installed, or None if no copy is kept"""
+        output = self.client.shell(serial, f"pm path {shlex.quote(package)}").stdout
+        paths = [line[len("package:"):].strip() for line in output.splitlines() if line.startswith("package:")]
+        base = next((path for path in paths if path.endswith("/base.apk")), None)
+        if not base:
+            return None
+
+        output = self.client.shell(serial, f"sha256sum {shlex.quote(base)}").stdout.split()
+        if not output or len(output[0]) != 64:
+            return None
+        local = self.cached_path(output[0])
+        return (base, local) if os.path.exists(local) else None
+
+    def install_delta(self, serial, apk_path, progress=None):
+        """Rebuild apk_path on the device from its installed APK; None when a delta is not possible"""
+        package, _ = apk_identity(apk_path)
+        base = self.installed_base(serial, package)
+        if not base:
+            return None
+        remote_base, local_base = base
+
+        segments = plan_delta(local_base, apk_path)
+        if delta_size(segments) > MAX_DELTA_RATIO * os.path.getsize(apk_path):
+            return None
+
+        name = os.path.basename(apk_path)
+        remote_patch = f"{REMOTE_DIR}/{name}.patch"
+        remote_script = f"{REMOTE_DIR}/{name}.sh"
+        remote_apk = f"{REMOTE_DIR}/{name}"
+        handle, patch_path = tempfile.mkstemp(suffix=".patch")
+        os.close(handle)
+        script_path = patch_path[:-len(".patch")] + ".sh"
+        try:
+            lines = [f": > {shlex.quote(remote_apk)}"]
+            patch_offset = 0
+            with open(apk_path, "rb") as source, open(patch_path, "wb") as patch:
+                for kind, offset, length in segments:
+                    if kind == "data":
+                        source.seek(offset)
+                        patch.write(source.read(length))
+                        path, offset = remote_patch, patch_offset
+                        patch_offset += length
+                    else:
+                        path = remote_base
+                    lines.append(f"dd if={shlex.quote(path)} bs=65536 iflag=skip_bytes,count_bytes "
+                                 f"skip={offset} count={length} status=none >> {shlex.quote(remote_apk)}")
+            with open(script_path, "w", newline="\n") as script:
+                script.write("\n".join(lines) + "\n")
+
+            self.client.push(serial, patch_path, remote_patch, progress)
+            self.client.push(serial, script_path, remote_script)
+            self.client.shell(serial, f"sh {shlex.quote(remote_script)}", timeout=DEVICE_TIMEOUT)
+
+            output = self.client.shell(serial, f"sha256sum {shlex.quote(remote_apk)}").stdout.split()
+            if not output or output[0] != self.hashes.digest(apk_path):
+                return None
+            output = self.client.shell(serial, f"pm install -r {shlex.quote(remote_apk)}", timeout=DEVICE_TIMEOUT).stdout
+            return subprocess.CompletedProcess(apk_path, 0 if "Success" in output else 1, output, "")
+        finally:
+            for path in (patch_path, script_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.client.shell(serial, "rm -f " + " ".join(shlex.quote(path) for path in
+                                                          (remote_patch, remote_script, remote_apk)))
+
+    def install_incremental(self, serial, apk_path, replace=True):
+        """`adb install --incremental`, which needs the adb binary and the APK's .idsig signature"""
+        if not self.client.adb_path or not os.path.exists(apk_path + ".idsig"):
+            return None
+        result = self.client.run_binary(["-s", serial, "install", "--incremental"] + (["-r"] if replace else [])
+                                        + [apk_path], timeout=DEVICE_TIMEOUT)
+        return result if result.returncode == 0 else None
+
+    def install(self, serial, apk_path, replace=True, progress=None):
+        result = None
+        if replace:
+            try:
+                result = self.install_delta(serial, apk_path, progress)
+            except (AdbError, OSError, ValueError, zipfile.BadZipFile):
+                # A delta is only an optimisation; the full install below still works
+                result = None
+        if result is None or result.returncode != 0:
+            try:
+                result = self.install_incremental(serial, apk_path, replace)
+            except (subprocess.SubprocessError, OSError):
+                result = None
+        if result is None or result.returncode != 0:
+            result = self.client.install(serial, apk_path, replace=replace, progress=progress)
+
+        if result.returncode == 0:
+            self.remember(apk_path)
+        return result
+
+    def remember(self, apk_path):
+        """Keep a copy of an installed APK as a base for later deltas"""
+        try:
+            target = self.cached_path(self.hashes.digest(apk_path))
+            if os.path.exists(target):
+                os.utime(target)
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # A copy, not a link: a build that rewrites the APK in place must not change the base
+            handle, partial = tempfile.mkstemp(suffix=".part", dir=self.cache_dir)
+            os.close(handle)
+            shutil.copyfile(apk_path, partial)
+            os.replace(partial, target)
+            self.prune()
+        except OSError:
+            pass
+
+    def prune(self):
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".apk")]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_cached:]:
+            os.remove(path)
@@ -0,0 +1,193 @@
+"""Tk tree of a device's folders that lists each folder only when it is opened"""
+import posixpath
+import tkinter as tk
+from tkinter import ttk
+
+from umm.listingcache import normalize
+
+# Rows inserted as soon as a listing arrives, a screenful with room to scroll
+FIRST_BATCH = 100
+
+# Rows inserted per turn of the event loop after that, and milliseconds between turns
+STREAM_BATCH = 500
+STREAM_MS = 1
+
+# Item ID prefix of the placeholder row that gives an unlisted folder its expand arrow
+LOADING = "loading:"
+
+
+class RemoteFileTree(ttk.Frame):
+    """Folders and files under a root path, each folder fetched when it is first opened
+
+    fetch(path, on_done, on_error) starts a listing and later calls
+    on_done(rows) with (name, is directory, size, date) rows, or
+    on_error(exception), on the Tk thread; it may call back at once with
+    cached rows. Item IDs are full device paths. A listing is inserted a
+    batch at a time, so a folder of tens of thousands of entries never
+    holds up the window: the first rows appear at once and the rest follow
+    between events. Listing a folder again touches only the rows that
+    changed and keeps opened subfolders open.
+    """
+
+    def __init__(self, parent, fetch, on_error=None):
+        super().__init__(parent)
+        self.fetch = fetch
+        self.on_error = on_error
+        self.root_path = None
+        # Latest listing per folder item ("" is the root), so superseded ones stop streaming
+        self.requests = {}
+        # {name: row} of each folder item whose rows are all in the tree
+        self.listed = {}
+
+        self.tree = ttk.Treeview(self, columns=("size", "modified"), show="tree headings")
+        self.tree.heading("#0", text="Name")
+        self.tree.heading("size", text="Size")
+        self.tree.heading("modified", text="Modified")
+
+        scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<<TreeviewOpen>>", self.on_open)
+
+    def show(self, path):
+        """Make path the top of the tree and list it"""
+        self.clear()
+        path = normalize(path)
+        self.root_path = path
+        self.tree.insert("", "end", iid=LOADING + path, text="Loading...")
+        self.load("", path)
+
+    def clear(self):
+        self.root_path = None
+        self.requests.clear()
+        self.listed.clear()
+        self.tree.delete(*self.tree.get_children())
+
+    def folder_path(self, item):
+        return item or self.root_path
+
+    def load(self, item, path):
+        request = object()
+        self.requests[item] = request
+        self.fetch(path, lambda rows: self.fill(item, path, rows, request),
+                   lambda error: self.failed(item, error, request))
+
+    def current(self, item, request):
+        return self.requests.get(item) is request and (not item or self.tree.exists(item))
+
+    def on_open(self, event):
+        item = self.tree.focus()
+        if item and self.tree.exists(LOADING + item) and item not in self.requests:
+            self.load(item, item)
+
+    def fill(self, item, path, rows, request):
+        if not self.current(item, request):
+            return
+        rows = sorted(rows, key=lambda row: (not row[1], row[0].lower()))
+        previous = self.listed.pop(item, None)
+        if previous is None:
+            # First listing, or one that never finished streaming: start over
+            self.forget_below(item)
+            self.tree.delete(*self.tree.get_children(item))
+            self.insert_rows(item, path, rows, 0, FIRST_BATCH, request)
+        else:
+            self.merge(item, path, rows, previous)
+            del self.requests[item]
+            self.listed[item] = {row[0]: row for row in rows}
+
+    def insert_row(self, item, path, row, index="end"):
+        name, is_dir, size, date = row
+        child = posixpath.join(path, name)
+        self.tree.insert(item, index, iid=child, text=name, values=(size, date),
+                         tags=("directory",) if is_dir else ())
+        if is_dir:
+            self.tree.insert(child, "end", iid=LOADING + child, text="Loading...")
+
+    def insert_rows(self, item, path, rows, start, count, request):
+        if not self.current(item, request):
+            return
+        for row in rows[start:start + count]:
+            self.insert_row(item, path, row)
+        start += count
+        if start < len(rows):
+            self.after(STREAM_MS, self.insert_rows, item, path, rows, start, STREAM_BATCH, request)
+        else:
+            del self.requests[item]
+            self.listed[item] = {row[0]: row for row in rows}
+
+    def merge(self, item, path, rows, previous):
+        """Bring a listed folder in line with new rows, leaving unchanged rows and their subtrees alone"""
+        current = {row[0]: row for row in rows}
+        kept = {}
+        for name, row in previous.items():
+            if name in current and current[name][1] == row[1]:
+                kept[name] = row
+            else:
+                self.remove(posixpath.join(path, name))
+        # The kept rows are already in sorted order, so inserting the new ones by index keeps it sorted
+        for index, row in enumerate(rows):
+            if row[0] not in kept:
+                self.insert_row(item, path, row, index)
+            elif kept[row[0]] != row:
+                self.tree.item(posixpath.join(path, row[0]), values=(row[2], row[3]))
+
+    def failed(self, item, error, request):
+        if not self.current(item, request):
+            return
+        del self.requests[item]
+        if item:
+            # Closed again with its placeholder, so opening it retries
+            self.tree.item(item, open=False)
+        else:
+            self.tree.delete(*self.tree.get_children())
+        if self.on_error:
+            self.on_error(error)
+
+    def refresh(self, path):
+        """List a folder again if it is in the tree; an unopened folder is simply fetched when opened"""
+        path = normalize(path)
+        item = "" if path == self.root_path else path
+        if item and not self.tree.exists(item):
+            return
+        if item and not self.tree.item(item, "open"):
+            self.forget_below(item)
+            self.listed.pop(item, None)
+            self.requests.pop(item, None)
+            self.tree.delete(*self.tree.get_children(item))
+            self.tree.insert(item, "end", iid=LOADING + item, text="Loading...")
+            return
+        self.load(item, self.folder_path(item))
+
+    def remove(self, path):
+        """Take a deleted file or folder out of the tree"""
+        if not self.tree.exists(path):
+            return
+        self.forget_below(path)
+        self.listed.pop(path, None)
+        self.requests.pop(path, None)
+        parent = self.tree.parent(path)
+        if parent in self.listed:
+            self.listed[parent].pop(posixpath.basename(path), None)
+        self.tree.delete(path)
+
+    def forget_below(self, item):
+        """Drop the bookkeeping of folders inside item, whose rows are about to go"""
+        prefix = (item or self.root_path or "").rstrip("/") + "/"
+        for folder in [folder for folder in list(self.listed) + list(self.requests)
+                       if folder and folder.startswith(prefix)]:
+            self.listed.pop(folder, None)
+            self.requests.pop(folder, None)
+
+    def selected_entries(self):
+        """(path, is directory, size) of each selected file or folder"""
+        entries = []
+        for item in self.tree.selection():
+            if item.startswith(LOADING):
+                continue
+            size = self.tree.item(item, "values")[0]
+            entries.append((item, "directory" in self.tree.item(item, "tags"),
+                            int(size) if str(size).isdigit() else 0))
+        return entries
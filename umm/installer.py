@@ -0,0 +1,388 @@
+"""Install packages on many devices at once"""
+import os
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from umm.adb import AdbError
+from umm.ledger import HashCache
+from umm.packages import apk_identity
+
+# Devices installing at the same time unless the caller says otherwise
+DEFAULT_PARALLEL = 8
+
+# Least time between progress reports for one device, in seconds
+PROGRESS_INTERVAL = 0.1
+
+# Further attempts at a package whose install failed for a transient reason
+DEFAULT_RETRIES = 3
+
+# Seconds before the first retry, doubled for each one after it
+RETRY_DELAY = 2.0
+
+# Where APKs wait on the device for the package manager
+STAGING_DIR = "/data/local/tmp"
+
+
+def package_label(apk_paths):
+    """Short name for a package: its base APK, plus how many splits come with it"""
+    label = os.path.basename(apk_paths[0])
+    return f"{label} (+{len(apk_paths) - 1} splits)" if len(apk_paths) > 1 else label
+
+
+class InstallStats:
+    """Progress and throughput of one device in a bulk install"""
+
+    def __init__(self, serial, total_bytes):
+        self.serial = serial
+        self.total_bytes = total_bytes
+        self.bytes_sent = 0
+        self.bytes_skipped = 0
+        self.skipped = 0
+        self.state = "Waiting"
+        self.current = None
+        self.outputs = {}
+        self.retries = 0
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def percent(self):
+        # Retries send packages again, so the count can pass the total
+        done = min(self.bytes_sent + self.bytes_skipped, self.total_bytes)
+        return done * 100 / self.total_bytes if self.total_bytes else 100.0
+
+    @property
+    def mb_per_second(self):
+        return self.bytes_sent / self.elapsed / 1e6 if self.elapsed > 0 else 0.0
+
+    def as_result(self):
+        """The stats as a command line result dict"""
+        result = {"device": self.serial, "ok": self.state in ("Installed", "Up to date"), "seconds": round(self.elapsed, 3),
+                  "bytes": self.bytes_sent, "mb_per_s": round(self.mb_per_second, 2)}
+        if self.retries:
+            result["retries"] = self.retries
+        if self.error:
+            result["error"] = self.error
+        else:
+            result["result"] = self.outputs
+        return result
+
+
+class ApkInstaller:
+    """How BulkInstall stages, installs and checks APKs on Android devices
+
+    stage() pushes a package ahead of its install, so that the transfer of
+    the next package overlaps the package manager verifying the current
+    one. Fast deploy sends only what changed and is not staged.
+    """
+
+    platform = "android"
+
+    # Failures worth another attempt: the device or its package manager was briefly unavailable
+    transient = ("Can't find service", "device offline", "device not found", "INSTALL_FAILED_INTERNAL_ERROR")
+
+    def __init__(self, client, deploy=None):
+        self.client = client
+        self.deploy = deploy
+
+    def read_identity(self, path):
+        return apk_identity(path)
+
+    def stage(self, serial, index, apk_paths, progress=None):
+        """Push a package to the device; returns its remote paths, or None to install it directly"""
+        if self.deploy and len(apk_paths) == 1:
+            return None
+        remote_paths = []
+        try:
+            for apk_path in apk_paths:
+                remote_paths.append(f"{STAGING_DIR}/staged_{index}_{os.path.basename(apk_path)}")
+                self.client.push(serial, apk_path, remote_paths[-1], progress)
+        except BaseException:
+            self.cleanup(serial, remote_paths)
+            raise
+        return remote_paths
+
+    def install(self, serial, apk_paths, staged, replace=True, progress=None):
+        if staged:
+            sizes = [os.path.getsize(apk_path) for apk_path in apk_paths]
+            return self.client.install_staged(serial, staged, sizes, replace)
+        if len(apk_paths) > 1:
+            return self.client.install_multiple(serial, apk_paths, replace=replace, progress=progress)
+        if self.deploy:
+            return self.deploy.install(serial, apk_paths[0], replace=replace, progress=progress)
+        return self.client.install(serial, apk_paths[0], replace=replace, progress=progress)
+
+    def cleanup(self, serial, staged):
+        if not staged:
+            return
+        try:
+            self.client.shell(serial, "rm -f " + " ".join(shlex.quote(remote_path) for remote_path in staged))
+        except (AdbError, OSError):
+            # Leftovers in /data/local/tmp are harmless and overwritten by the next run
+            pass
+
+    def installed_version(self, serial, app):
+        return self.client.package_version(serial, app)
+
+
+class BulkInstall:
+    """Install packages on many devices, up to max_workers devices at a time
+
+    packages is a list of path lists, the same for every device, or a dict
+    of such lists per device. With the default ApkInstaller a list with one
+    path is a plain install and a longer one is a base APK with its splits;
+    pass installer=IpaInstaller() for iOS. Packages are installed in order on
+    each device, the next one being staged while the current one installs,
+    and a device stops at its first failure. Failures that look transient
+    are retried up to retries times with exponential backoff.
+    on_progress(stats) is called from worker threads as data goes out, at
+    most every PROGRESS_INTERVAL seconds per device, and whenever a device
+    changes state.
+
+    With an InstallLedger, a package is skipped on a device whose ledger
+    entry matches its ID, version and SHA-256 and which reports that
+    version installed, unless force is set. With fast, single APKs go
+    through FastDeploy, which sends only what changed since the installed
+    build; the bytes it saves count as skipped.
+
+    With an InstallQueue, every package is queued per device before the run
+    and removed once it is installed, skipped or given up on, so resume()
+    can finish a run that was cancelled or interrupted.
+    """
+
+    def __init__(self, client, serials, packages, replace=True, max_workers=DEFAULT_PARALLEL, on_progress=None,
+                 ledger=None, force=False, fast=False, installer=None, retries=DEFAULT_RETRIES, queue=None, jobs=None):
+        self.serials = list(serials)
+        if isinstance(packages, dict):
+            self.packages = {serial: [list(paths) for paths in packages[serial]] for serial in self.serials}
+        else:
+            self.packages = {serial: [list(paths) for paths in packages] for serial in self.serials}
+        self.replace = replace
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self.ledger = ledger
+        self.force = force
+        self.retries = retries
+        if installer is None:
+            deploy = None
+            if fast:
+                from umm.fastdeploy import FastDeploy
+                deploy = FastDeploy(client, ledger.hashes if ledger else HashCache())
+            installer = ApkInstaller(client, deploy)
+        self.installer = installer
+        self.builds = {}
+        self.stats = {serial: InstallStats(serial, sum(os.path.getsize(path) for paths in self.packages[serial]
+                                                       for path in paths))
+                      for serial in self.serials}
+
+        self.queue = queue
+        if queue and jobs is None:
+            jobs = {serial: queue.add(installer.platform, serial, self.packages[serial]) for serial in self.serials}
+        self.jobs = jobs or {}
+
+        self.cancelled = threading.Event()
+        self.started = None
+        self.finished = None
+
+    @classmethod
+    def resume(cls, queue, installer, devices=None, **options):
+        """A BulkInstall of the jobs left in the queue for the installer's platform, on devices if given"""
+        pending = queue.pending(installer.platform)
+        if devices is not None:
+            pending = {device: jobs for device, jobs in pending.items() if device in devices}
+        packages = {device: [paths for _, paths in jobs] for device, jobs in pending.items()}
+        jobs = {device: [job_id for job_id, _ in jobs] for device, jobs in pending.items()}
+        return cls(None, list(pending), packages, installer=installer, queue=queue, jobs=jobs, **options)
+
+    def report(self, stats):
+        if self.on_progress:
+            self.on_progress(stats)
+
+    def identify_packages(self):
+        """Work out each package's build once, before any device needs it"""
+        for packages in self.packages.values():
+            for paths in packages:
+                if tuple(paths) in self.builds:
+                    continue
+                try:
+                    self.builds[tuple(paths)] = self.ledger.identify(paths, self.installer.read_identity)
+                except ValueError:
+                    # Without an identity the package is simply always installed
+                    self.builds[tuple(paths)] = None
+
+    def is_installed(self, serial, build):
+        if not build or self.force or not self.ledger.matches(serial, build):
+            return False
+        try:
+            return self.installer.installed_version(serial, build[0]) == build[1]
+        except Exception:
+            return False
+
+    def stage(self, serial, index, progress):
+        """Get package index ready on a device; returns (already installed, staged paths)"""
+        paths = self.packages[serial][index]
+        if self.is_installed(serial, self.builds.get(tuple(paths))):
+            return True, None
+        try:
+            return False, self.installer.stage(serial, index, paths, progress)
+        except Exception:
+            # The install sends the package itself instead
+            return False, None
+
+    def install_package(self, serial, stats, paths, staged, progress):
+        """Install one package, retrying transient failures; returns an error message or None"""
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                stats.retries += 1
+                stats.state = f"Retry {attempt}/{self.retries}"
+                self.report(stats)
+                if self.cancelled.wait(RETRY_DELAY * 2 ** (attempt - 1)):
+                    break
+                stats.state = "Installing"
+
+            sent = stats.bytes_sent
+            try:
+                result = self.installer.install(serial, paths, staged, replace=self.replace, progress=progress)
+                output = (result.stdout or result.stderr or "").strip()
+                if result.returncode == 0:
+                    stats.outputs[stats.current] = output
+                    if len(paths) == 1 and not staged:
+                        # Whatever fast deploy did not have to send
+                        stats.bytes_skipped += max(0, os.path.getsize(paths[0]) - (stats.bytes_sent - sent))
+                    return self.verify(serial, self.builds.get(tuple(paths)))
+                error = output or f"exit status {result.returncode}"
+                transient = not output or any(marker in output for marker in self.installer.transient)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                transient = True
+            finally:
+                # A retry sends the package again rather than trusting the staged copy
+                self.installer.cleanup(serial, staged)
+                staged = None
+
+            stats.outputs[stats.current] = error
+            if not transient:
+                break
+        return error
+
+    def verify(self, serial, build):
+        """Check the device now reports the version just installed; returns an error message or None"""
+        if not build:
+            return None
+        try:
+            version = self.installer.installed_version(serial, build[0])
+        except Exception:
+            # The install itself succeeded; an unanswered check does not undo that
+            version = build[1]
+        if version != build[1]:
+            return f"installed, but the device reports version {version} instead of {build[1]}"
+        if self.ledger:
+            self.ledger.record(serial, build)
+        return None
+
+    def install_device(self, serial):
+        stats = self.stats[serial]
+        packages = self.packages[serial]
+        jobs = self.jobs.get(serial) or [None] * len(packages)
+        if self.cancelled.is_set():
+            stats.state = "Cancelled"
+            self.report(stats)
+            return stats
+
+        stats.started = time.monotonic()
+        stats.state = "Installing"
+        self.report(stats)
+
+        lock = threading.Lock()
+        last_report = 0.0
+
+        def progress(size):
+            nonlocal last_report
+            # Staging the next package reports from its own thread
+            with lock:
+                stats.bytes_sent += size
+                now = time.monotonic()
+                due = now - last_report >= PROGRESS_INTERVAL
+                if due:
+                    last_report = now
+            if due:
+                self.report(stats)
+
+        cancelled = False
+        with ThreadPoolExecutor(max_workers=1) as stager:
+            staging = stager.submit(self.stage, serial, 0, progress) if packages else None
+            for index, (paths, job) in enumerate(zip(packages, jobs)):
+                skipped, staged = staging.result()
+                staging = None
+                if self.cancelled.is_set():
+                    self.installer.cleanup(serial, staged)
+                    cancelled = True
+                    break
+                if index + 1 < len(packages):
+                    staging = stager.submit(self.stage, serial, index + 1, progress)
+
+                stats.current = package_label(paths)
+                if skipped:
+                    stats.outputs[stats.current] = "Already installed, skipped"
+                    stats.bytes_skipped += sum(os.path.getsize(path) for path in paths)
+                    stats.skipped += 1
+                else:
+                    error = self.install_package(serial, stats, paths, staged, progress)
+                    if error and self.cancelled.is_set():
+                        # Cancelled while waiting to retry; the package stays queued
+                        cancelled = True
+                        break
+                    if error:
+                        stats.error = f"{stats.current}: {error}"
+                if self.queue and job is not None:
+                    self.queue.remove(job)
+                if stats.error:
+                    break
+
+            if staging:
+                # Already pushed for a package that will not be installed now
+                self.installer.cleanup(serial, staging.result()[1])
+
+        stats.finished = time.monotonic()
+        if stats.error:
+            stats.state = "Failed"
+        elif cancelled:
+            stats.state = "Cancelled"
+        else:
+            stats.state = "Up to date" if stats.skipped == len(packages) else "Installed"
+        self.report(stats)
+        return stats
+
+    def run(self):
+        """Install on every device and return the per-device stats"""
+        self.started = time.monotonic()
+        if self.ledger:
+            self.identify_packages()
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(self.serials) or 1))) as pool:
+            list(pool.map(self.install_device, self.serials))
+        self.finished = time.monotonic()
+        return self.stats
+
+    def cancel(self):
+        """Stop each device after the package it is installing; what is left stays queued"""
+        self.cancelled.set()
+
+    def summary(self):
+        installed = sum(1 for stats in self.stats.values() if stats.state == "Installed")
+        current = sum(1 for stats in self.stats.values() if stats.state == "Up to date")
+        failed = sum(1 for stats in self.stats.values() if stats.state == "Failed")
+        sent = sum(stats.bytes_sent for stats in self.stats.values())
+        wall = (self.finished or time.monotonic()) - self.started if self.started else 0.0
+        rate = sent / wall / 1e6 if wall > 0 else 0.0
+        return (f"Install: {len(self.serials)} device(s), {installed} installed, {current} up to date, {failed} failed, "
+                f"{sent / 1e6:.1f} MB in {wall:.1f} s ({rate:.1f} MB/s overall)")
@@ -0,0 +1,83 @@
+"""Persistent queue of package installs, so an interrupted batch can pick up where it stopped
+
+A job is one package (an APK, an APK with its splits, or an IPA) for one
+device. Jobs stay in the queue until they are installed, skipped or given
+up on, so whatever is left after a crash, a cancel or an unplugged cable
+is exactly what a resumed run still has to do.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from umm.cache import DEFAULT_CACHE_PATH
+from umm.ledger import open_database
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), "install_queue.sqlite3")
+
+
+class InstallQueue:
+    """Install jobs per platform and device, kept in memory and mirrored to SQLite"""
+
+    def __init__(self, path=None):
+        self.jobs = {}
+        self.next_id = 1
+        self.lock = threading.Lock()
+        self.db = None
+
+        if path:
+            self.db = open_database(path, "CREATE TABLE IF NOT EXISTS jobs ("
+                                          "id INTEGER PRIMARY KEY, platform TEXT, device TEXT, paths TEXT, added REAL)")
+        if self.db:
+            try:
+                for job_id, platform, device, paths in self.db.execute(
+                        "SELECT id, platform, device, paths FROM jobs ORDER BY id"):
+                    self.jobs[job_id] = (platform, device, json.loads(paths))
+                self.next_id = max(self.jobs, default=0) + 1
+            except (sqlite3.Error, ValueError):
+                self.db = None
+
+    def execute(self, statement, rows):
+        if self.db:
+            try:
+                with self.db:
+                    self.db.executemany(statement, rows)
+            except sqlite3.Error:
+                pass
+
+    def add(self, platform, device, packages):
+        """Queue packages (lists of paths) for a device, in order; returns their job IDs"""
+        with self.lock:
+            job_ids = list(range(self.next_id, self.next_id + len(packages)))
+            self.next_id += len(packages)
+            rows = []
+            for job_id, paths in zip(job_ids, packages):
+                paths = [os.path.abspath(path) for path in paths]
+                self.jobs[job_id] = (platform, device, paths)
+                rows.append((job_id, platform, device, json.dumps(paths), time.time()))
+            self.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?)", rows)
+        return job_ids
+
+    def remove(self, job_id):
+        """Drop a job that needs no more attempts"""
+        with self.lock:
+            if self.jobs.pop(job_id, None):
+                self.execute("DELETE FROM jobs WHERE id = ?", [(job_id,)])
+
+    def pending(self, platform):
+        """{device: [(job ID, paths)]} of the jobs still queued for a platform, oldest first"""
+        devices = {}
+        with self.lock:
+            for job_id in sorted(self.jobs):
+                job_platform, device, paths = self.jobs[job_id]
+                if job_platform == platform:
+                    devices.setdefault(device, []).append((job_id, paths))
+        return devices
+
+    def clear(self, platform):
+        with self.lock:
+            job_ids = [job_id for job_id, job in self.jobs.items() if job[0] == platform]
+            for job_id in job_ids:
+                del self.jobs[job_id]
+            self.execute("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in job_ids])
@@ -0,0 +1,172 @@
+"""iOS device operations shared by the manager window and the command line"""
+import os
+import posixpath
+import subprocess
+
+from umm.afc import open_afc
+from umm.jailbreak import INSTALLATION_PROXY, lookup_apps
+from umm.lockdown import LockdownClient, LockdownError, read_plist, send_plist
+from umm.packages import ipa_identity
+from umm.usbmux import UsbmuxClient, UsbmuxError
+
+# installation_proxy attributes needed for an app list row
+APP_ATTRIBUTES = ["CFBundleIdentifier", "CFBundleDisplayName", "CFBundleName",
+                  "CFBundleShortVersionString", "CFBundleVersion"]
+
+# Folder in the AFC media root that installation_proxy installs packages from
+STAGING_DIR = "PublicStaging"
+
+
+def list_devices(usbmux=None):
+    """UDIDs of attached devices, from usbmuxd or, failing that, idevice_id"""
+    try:
+        return sorted({device["udid"] for device in (usbmux or UsbmuxClient()).list_devices()})
+    except UsbmuxError:
+        result = subprocess.run(["idevice_id", "-l"], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, timeout=5)
+        return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+
+def parse_app_list(output):
+    """Parse `ideviceinstaller -l` output into (name, bundle ID, version) rows"""
+    rows = []
+    for line in output.splitlines()[1:]:  # Skip header line
+        if line.strip():
+            parts = line.split(" - ")
+            if len(parts) >= 2:
+                bundle_id = parts[0].strip()
+                app_name = parts[1].strip()
+                version = parts[2].strip() if len(parts) > 2 else "Unknown"
+                rows.append((app_name, bundle_id, version))
+    return rows
+
+
+def browse_apps(udid, usbmux=None, timeout=10):
+    """User apps from installation_proxy, as (name, bundle ID, version) rows"""
+    with LockdownClient(udid, usbmux, timeout) as lockdown:
+        sock = lockdown.start_service(INSTALLATION_PROXY)
+        try:
+            send_plist(sock, {
+                "Command": "Browse",
+                "ClientOptions": {"ApplicationType": "User", "ReturnAttributes": APP_ATTRIBUTES},
+            })
+            rows = []
+            while True:
+                reply = read_plist(sock)
+                if "Error" in reply:
+                    raise LockdownError(f"Browse failed: {reply['Error']}")
+                for app in reply.get("CurrentList", []):
+                    bundle_id = app["CFBundleIdentifier"]
+                    name = app.get("CFBundleDisplayName") or app.get("CFBundleName") or bundle_id
+                    version = app.get("CFBundleShortVersionString") or app.get("CFBundleVersion") or "Unknown"
+                    rows.append((name, bundle_id, version))
+                if reply.get("Status") == "Complete":
+                    return rows
+        finally:
+            sock.close()
+
+
+def installed_version(udid, bundle_id, usbmux=None, timeout=10):
+    """CFBundleVersion of an installed app, or None if it is not installed"""
+    with LockdownClient(udid, usbmux, timeout) as lockdown:
+        app = lookup_apps(lockdown, [bundle_id], ["CFBundleIdentifier", "CFBundleVersion"]).get(bundle_id)
+    return str(app["CFBundleVersion"]) if app and "CFBundleVersion" in app else None
+
+
+def install_staged(udid, package_path, usbmux=None, timeout=600):
+    """Install an IPA already uploaded to the AFC media root; returns a CompletedProcess like ideviceinstaller"""
+    with LockdownClient(udid, usbmux, timeout) as lockdown:
+        sock = lockdown.start_service(INSTALLATION_PROXY)
+        try:
+            send_plist(sock, {"Command": "Install", "PackagePath": package_path, "ClientOptions": {}})
+            while True:
+                reply = read_plist(sock)
+                if "Error" in reply:
+                    error = f"{reply['Error']}: {reply.get('ErrorDescription', '')}".rstrip(": ")
+                    return subprocess.CompletedProcess(package_path, 1, "", error)
+                if reply.get("Status") == "Complete":
+                    return subprocess.CompletedProcess(package_path, 0, "Install: Complete", "")
+        finally:
+            sock.close()
+
+
+def is_build_installed(ledger, udid, build, usbmux=None):
+    """True if an InstallLedger build is the last one installed from here and the device still has it"""
+    if not ledger.matches(udid, build):
+        return False
+    try:
+        return installed_version(udid, build[0], usbmux) == build[1]
+    except (subprocess.SubprocessError, OSError):
+        return False
+
+
+class IpaInstaller:
+    """How BulkInstall stages, installs and checks IPAs on iOS devices
+
+    stage() uploads an IPA over AFC into PublicStaging ahead of its install,
+    so that the transfer of the next IPA overlaps installd unpacking the
+    current one. Without usbmuxd nothing is staged and ideviceinstaller
+    uploads and installs in one step; the version check after each install
+    still catches installs that ideviceinstaller reports wrongly.
+    """
+
+    platform = "ios"
+
+    # Failures worth another attempt: the device was briefly unreachable
+    transient = ("Could not connect", "lockdownd", "No device found")
+
+    def __init__(self, usbmux=None, timeout=600):
+        self.usbmux = usbmux
+        self.timeout = timeout
+
+    def read_identity(self, path):
+        return ipa_identity(path)
+
+    def stage(self, udid, index, ipa_paths, progress=None):
+        """Upload an IPA to PublicStaging; returns its path there"""
+        staged = posixpath.join(STAGING_DIR, f"staged_{index}_{os.path.basename(ipa_paths[0])}")
+        afc = open_afc(udid, self.usbmux)
+        try:
+            afc.mkdir("/" + STAGING_DIR)
+            afc.put(ipa_paths[0], "/" + staged, os.path.getsize(ipa_paths[0]), progress)
+        finally:
+            afc.close()
+        return [staged]
+
+    def install(self, udid, ipa_paths, staged, replace=True, progress=None):
+        if staged:
+            return install_staged(udid, staged[0], self.usbmux, self.timeout)
+        result = subprocess.run(["ideviceinstaller", "-u", udid, "-i", ipa_paths[0]], stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True, timeout=self.timeout)
+        if progress:
+            progress(os.path.getsize(ipa_paths[0]))
+        return result
+
+    def cleanup(self, udid, staged):
+        if not staged:
+            return
+        try:
+            afc = open_afc(udid, self.usbmux)
+            try:
+                for path in staged:
+                    afc.remove("/" + path)
+            finally:
+                afc.close()
+        except (subprocess.SubprocessError, OSError):
+            # installd may already have moved it; a leftover is overwritten by the next run
+            pass
+
+    def installed_version(self, udid, app):
+        return installed_version(udid, app, self.usbmux)
+
+
+def list_apps(udid, usbmux=None, timeout=10):
+    """Installed user apps; uses ideviceinstaller when usbmuxd cannot be reached"""
+    try:
+        return browse_apps(udid, usbmux, timeout)
+    except (UsbmuxError, OSError):
+        result = subprocess.run(["ideviceinstaller", "-u", udid, "-l"], stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, text=True, timeout=timeout)
+        if result.returncode != 0:
+            raise subprocess.SubprocessError(result.stderr.strip())
+        return parse_app_list(result.stdout)
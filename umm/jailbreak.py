@@ -0,0 +1,118 @@
+"""Targeted jailbreak detection for iOS devices
+
+Instead of listing every installed app, ask installation_proxy about a
+handful of package manager bundle IDs and check whether lockdownd offers
+AFC2, the unrestricted file service older jailbreaks install. Results are
+cached per UDID and iOS version, since neither check can change without
+the device reconnecting.
+"""
+import subprocess
+import threading
+import time
+
+from umm.lockdown import LockdownClient, LockdownError, read_plist, send_plist
+from umm.usbmux import UsbmuxError
+
+INSTALLATION_PROXY = "com.apple.mobile.installation_proxy"
+AFC2_SERVICE = "com.apple.afc2"
+
+# Package managers and loaders that only exist on jailbroken devices
+JAILBREAK_BUNDLE_IDS = [
+    "com.saurik.Cydia",
+    "org.coolstar.SileoStore",
+    "org.coolstar.sileo",
+    "xyz.willy.Zebra",
+    "com.opa334.Dopamine",
+]
+
+# Semi-tethered jailbreaks disappear on reboot, so results do not live forever
+DEFAULT_TTL = 600
+
+
+def lookup_apps(lockdown, bundle_ids, attributes=("CFBundleIdentifier",)):
+    """{bundle ID: attributes} for the bundle_ids installed on the device"""
+    sock = lockdown.start_service(INSTALLATION_PROXY)
+    try:
+        send_plist(sock, {
+            "Command": "Lookup",
+            "ClientOptions": {"BundleIDs": list(bundle_ids), "ReturnAttributes": list(attributes)},
+        })
+        found = {}
+        while True:
+            reply = read_plist(sock)
+            if "Error" in reply:
+                raise LockdownError(f"Lookup failed: {reply['Error']}")
+            found.update(reply.get("LookupResult", {}))
+            if reply.get("Status", "Complete") == "Complete":
+                return found
+    finally:
+        sock.close()
+
+
+def lookup_bundles(lockdown, bundle_ids):
+    """The subset of bundle_ids installed on the device"""
+    return set(lookup_apps(lockdown, bundle_ids))
+
+
+def has_service(lockdown, name):
+    try:
+        lockdown.start_service(name).close()
+        return True
+    except LockdownError:
+        return False
+
+
+def probe(udid, usbmux=None, timeout=5):
+    """True if the device shows signs of a jailbreak"""
+    with LockdownClient(udid, usbmux, timeout) as lockdown:
+        if has_service(lockdown, AFC2_SERVICE):
+            return True
+        return bool(lookup_bundles(lockdown, JAILBREAK_BUNDLE_IDS))
+
+
+def probe_with_ideviceinstaller(udid, timeout=10):
+    """Fallback when usbmuxd cannot be reached; this lists every app, so it is slow"""
+    result = subprocess.run(["ideviceinstaller", "-u", udid, "-l", "-o", "xml"],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout)
+    listing = result.stdout.lower()
+    return any(bundle_id.lower() in listing for bundle_id in JAILBREAK_BUNDLE_IDS)
+
+
+class JailbreakDetector:
+    """Cache probe results by UDID and iOS version
+
+    check() blocks on the device, so call it from a worker thread.
+    """
+
+    def __init__(self, usbmux=None, ttl=DEFAULT_TTL):
+        self.usbmux = usbmux
+        self.ttl = ttl
+        self.results = {}
+        self.lock = threading.Lock()
+
+    def check(self, udid, ios_version):
+        """True/False, or None when neither probe could reach the device"""
+        key = (udid, ios_version)
+        with self.lock:
+            cached = self.results.get(key)
+            if cached and time.time() - cached[1] < self.ttl:
+                return cached[0]
+
+        try:
+            jailbroken = probe(udid, self.usbmux)
+        except (UsbmuxError, OSError, KeyError):
+            try:
+                jailbroken = probe_with_ideviceinstaller(udid)
+            except (subprocess.SubprocessError, OSError):
+                return None
+        except LockdownError:
+            return None
+
+        with self.lock:
+            self.results[key] = (jailbroken, time.time())
+        return jailbroken
+
+    def forget(self, udid):
+        with self.lock:
+            for key in [key for key in self.results if key[0] == udid]:
+                del self.results[key]
@@ -0,0 +1,38 @@
+"""Notebook tabs that are built the first time they are shown"""
+from tkinter import ttk
+
+
+class LazyTabs:
+    """Defer building a ttk.Notebook's tabs until each is first selected
+
+    add() puts an empty frame in the notebook straight away, so the tab
+    strip is complete from the first paint, and calls build(frame) on the
+    first <<NotebookTabChanged>> that selects it. Code outside a tab must
+    not assume the tab's widgets exist until built(frame) is true.
+    """
+
+    def __init__(self, notebook):
+        self.notebook = notebook
+        self.builders = {}
+        notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed, add="+")
+
+    def add(self, build, padding=None, **options):
+        """Add a tab whose contents build(frame) creates on first selection"""
+        frame = ttk.Frame(self.notebook) if padding is None else ttk.Frame(self.notebook, padding=padding)
+        self.notebook.add(frame, **options)
+        self.builders[str(frame)] = (frame, build)
+        return frame
+
+    def built(self, frame):
+        return str(frame) not in self.builders
+
+    def build(self, frame):
+        """Build a tab now, if it has not been built yet"""
+        entry = self.builders.pop(str(frame), None)
+        if entry:
+            entry[1](entry[0])
+
+    def on_tab_changed(self, event=None):
+        selected = self.notebook.select()
+        if selected:
+            self.build(selected)
@@ -0,0 +1,139 @@
+"""Per-device install ledger, so redeploying an unchanged build can be skipped
+
+The ledger remembers, for every device and app, the version and SHA-256 of
+the package last installed from here. File digests are cached by path,
+size and mtime, so an artifact is only hashed again after it changes.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from umm.cache import DEFAULT_CACHE_PATH
+
+DEFAULT_LEDGER_PATH = os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), "install_ledger.sqlite3")
+
+# Read size while hashing
+HASH_CHUNK = 1024 * 1024
+
+
+def open_database(path, schema):
+    """Open a SQLite file and create its table, or return None if that fails"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False)
+        with db:
+            db.execute(schema)
+        return db
+    except (sqlite3.Error, OSError):
+        # A broken ledger must never block an install; it just stops saving time
+        return None
+
+
+class HashCache:
+    """SHA-256 of local files, recomputed only when a file's size or mtime changes"""
+
+    def __init__(self, path=None):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.db = None
+
+        if path:
+            self.db = open_database(path, "CREATE TABLE IF NOT EXISTS hashes ("
+                                          "path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, sha256 TEXT)")
+        if self.db:
+            try:
+                for path, size, mtime, digest in self.db.execute("SELECT path, size, mtime, sha256 FROM hashes"):
+                    self.entries[path] = (size, mtime, digest)
+            except sqlite3.Error:
+                self.db = None
+
+    def digest(self, path):
+        path = os.path.abspath(path)
+        file_stat = os.stat(path)
+        key = (file_stat.st_size, file_stat.st_mtime_ns)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry[:2] == key:
+                return entry[2]
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(HASH_CHUNK)
+                if not chunk:
+                    break
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        with self.lock:
+            self.entries[path] = key + (digest,)
+            if self.db:
+                try:
+                    with self.db:
+                        self.db.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)", (path,) + key + (digest,))
+                except sqlite3.Error:
+                    pass
+        return digest
+
+    def digest_files(self, paths):
+        """One digest for a set of files installed together, such as a base APK and its splits"""
+        if len(paths) == 1:
+            return self.digest(paths[0])
+        return hashlib.sha256("".join(self.digest(path) for path in paths).encode("ascii")).hexdigest()
+
+
+class InstallLedger:
+    """Which build of each app was last installed on each device
+
+    identify() names a build as (app ID, version, digest); matches() says
+    whether that exact build is the last one recorded for a device. The
+    device itself should still be asked for the installed version before
+    skipping, since apps can be removed or updated behind the ledger's back.
+    """
+
+    def __init__(self, path=None):
+        self.hashes = HashCache(path)
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.db = None
+
+        if path:
+            self.db = open_database(path, "CREATE TABLE IF NOT EXISTS installs ("
+                                          "device TEXT, app TEXT, version TEXT, sha256 TEXT, installed REAL, "
+                                          "PRIMARY KEY (device, app))")
+        if self.db:
+            try:
+                for device, app, version, digest in self.db.execute("SELECT device, app, version, sha256 FROM installs"):
+                    self.entries[(device, app)] = (version, digest)
+            except sqlite3.Error:
+                self.db = None
+
+    def identify(self, paths, read_identity):
+        """(app ID, version, digest) of a package; read_identity(path) reads the ID and version of paths[0]
+
+        Raises ValueError when the package cannot be read.
+        """
+        try:
+            app, version = read_identity(paths[0])
+            return app, version, self.hashes.digest_files(paths)
+        except OSError as e:
+            raise ValueError(f"Cannot read {paths[0]}: {e}") from e
+
+    def matches(self, device, build):
+        app, version, digest = build
+        with self.lock:
+            return self.entries.get((device, app)) == (version, digest)
+
+    def record(self, device, build):
+        app, version, digest = build
+        with self.lock:
+            self.entries[(device, app)] = (version, digest)
+            if self.db:
+                try:
+                    with self.db:
+                        self.db.execute("INSERT OR REPLACE INTO installs VALUES (?, ?, ?, ?, ?)",
+                                        (device, app, version, digest, time.time()))
+                except sqlite3.Error:
+                    pass
@@ -0,0 +1,94 @@
+"""LRU cache of device folder listings for the file browser
+
+Opening a folder that was listed a moment ago, or navigating back up,
+should not ask the device again. Listings are kept per device, file
+service and path until they age out or the row budget pushes them out,
+and anything this program changes on the device invalidates the listings
+it touched.
+"""
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+
+# Rows kept across all listings; one folder can hold tens of thousands
+DEFAULT_MAX_ROWS = 200000
+
+# Seconds a listing is trusted, since the device changes folders on its own too
+DEFAULT_MAX_AGE = 120
+
+
+def normalize(path):
+    path = posixpath.normpath("/" + path.lstrip("/"))
+    return "/" if path == "//" else path
+
+
+def is_within(path, folder):
+    return path == folder or path.startswith(folder.rstrip("/") + "/")
+
+
+class ListingCache:
+    """(name, is directory, size, date) rows keyed by (device, service, path), least recently used dropped first"""
+
+    def __init__(self, max_rows=DEFAULT_MAX_ROWS, max_age=DEFAULT_MAX_AGE):
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.listings = OrderedDict()
+        self.rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, device, service, path):
+        """A fresh listing, or None"""
+        key = (device, service, normalize(path))
+        with self.lock:
+            entry = self.listings.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.max_age:
+                self.misses += 1
+                return None
+            self.listings.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, device, service, path, rows):
+        key = (device, service, normalize(path))
+        rows = list(rows)
+        with self.lock:
+            self.drop(key)
+            self.listings[key] = (rows, time.monotonic())
+            self.rows += len(rows)
+            while self.rows > self.max_rows and len(self.listings) > 1:
+                self.drop(next(iter(self.listings)))
+
+    def drop(self, key):
+        entry = self.listings.pop(key, None)
+        if entry is not None:
+            self.rows -= len(entry[0])
+
+    def invalidate(self, device, service=None, path=None, recursive=True):
+        """Forget the listing of path and, if recursive, of every folder below it
+
+        Without a service or a path, every listing of the device goes.
+        """
+        folder = normalize(path) if path is not None else None
+        with self.lock:
+            for key in list(self.listings):
+                key_device, key_service, key_path = key
+                if key_device != device or service is not None and key_service != service:
+                    continue
+                if folder is None or key_path == folder or recursive and is_within(key_path, folder):
+                    self.drop(key)
+
+    def discard(self, device, service, path):
+        """Take a deleted file or folder out of its parent's listing and forget any listings below it"""
+        path = normalize(path)
+        parent, name = posixpath.split(path)
+        self.invalidate(device, service, path)
+        with self.lock:
+            key = (device, service, parent)
+            entry = self.listings.get(key)
+            if entry is not None:
+                rows = [row for row in entry[0] if row[0] != name]
+                self.rows -= len(entry[0]) - len(rows)
+                self.listings[key] = (rows, entry[1])
@@ -0,0 +1,200 @@
+"""Client for lockdownd, the iOS service that answers device queries and starts services
+
+Lockdown messages are XML plists prefixed with a 4-byte big-endian length,
+carried over a usbmux tunnel to port 62078. Most values need a session,
+which switches the connection to TLS using the host's pairing record.
+"""
+import os
+import plistlib
+import ssl
+import struct
+import subprocess
+import tempfile
+
+from umm.usbmux import PROGRAM_NAME, UsbmuxClient, UsbmuxError, read_exact
+
+LOCKDOWN_PORT = 62078
+
+# Domains fetched for the device panel; None is lockdownd's default domain
+INFO_DOMAINS = [None, "com.apple.mobile.battery"]
+
+
+class LockdownError(subprocess.SubprocessError):
+    """Raised when lockdownd answers a request with an error"""
+
+
+def send_plist(sock, message):
+    payload = plistlib.dumps(message)
+    sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+
+def read_plist(sock):
+    length = struct.unpack(">I", read_exact(sock, 4))[0]
+    try:
+        return plistlib.loads(read_exact(sock, length))
+    except plistlib.InvalidFileException as e:
+        raise LockdownError(f"Malformed lockdown message: {e}") from e
+
+
+def tls_context(pair_record):
+    """A client context presenting the host certificate from a pairing record"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    try:
+        # Older devices only offer ciphers that current OpenSSL defaults reject
+        context.set_ciphers("ALL:!aNULL:!eNULL:@SECLEVEL=0")
+    except ssl.SSLError:
+        pass
+
+    # load_cert_chain only reads from files
+    handle, path = tempfile.mkstemp(suffix=".pem")
+    try:
+        with os.fdopen(handle, "wb") as pem:
+            pem.write(pair_record["HostCertificate"])
+            pem.write(b"\n")
+            pem.write(pair_record["HostPrivateKey"])
+        context.load_cert_chain(path)
+    finally:
+        os.remove(path)
+    return context
+
+
+class LockdownClient:
+    """One lockdownd connection to a device, optionally inside a session
+
+    Use it as a context manager; the session is stopped and the tunnel
+    closed on exit.
+    """
+
+    def __init__(self, udid, usbmux=None, timeout=5):
+        self.udid = udid
+        self.usbmux = usbmux or UsbmuxClient(timeout=timeout)
+        self.timeout = timeout
+        self.sock = None
+        self.device_id = None
+        self.session_id = None
+        self.pair_record = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        self.device_id = self.usbmux.find_device(self.udid)["id"]
+        self.sock = self.usbmux.connect_device(self.device_id, LOCKDOWN_PORT)
+        self.sock.settimeout(self.timeout)
+        reply = self.request({"Request": "QueryType"})
+        if reply.get("Type") != "com.apple.mobile.lockdown":
+            self.close()
+            raise LockdownError(f"Unexpected lockdown service type: {reply.get('Type')}")
+
+    def close(self):
+        if self.sock is None:
+            return
+        try:
+            if self.session_id:
+                self.request({"Request": "StopSession", "SessionID": self.session_id})
+        except (LockdownError, UsbmuxError, OSError):
+            pass
+        finally:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+            self.session_id = None
+
+    def request(self, message):
+        send_plist(self.sock, dict(message, Label=PROGRAM_NAME))
+        reply = read_plist(self.sock)
+        if "Error" in reply:
+            raise LockdownError(f"{message['Request']} failed: {reply['Error']}")
+        return reply
+
+    def start_session(self):
+        """Start an authenticated session so protected domains can be read"""
+        self.pair_record = self.usbmux.read_pair_record(self.udid)
+        reply = self.request({
+            "Request": "StartSession",
+            "HostID": self.pair_record["HostID"],
+            "SystemBUID": self.pair_record["SystemBUID"],
+        })
+        self.session_id = reply["SessionID"]
+        if reply.get("EnableSessionSSL"):
+            self.sock = tls_context(self.pair_record).wrap_socket(self.sock)
+
+    def get_value(self, domain=None, key=None):
+        """A single value, or a whole domain as a dict when key is None"""
+        message = {"Request": "GetValue"}
+        if domain:
+            message["Domain"] = domain
+        if key:
+            message["Key"] = key
+        return self.request(message).get("Value")
+
+    def start_service(self, name):
+        """Start a device service and return a socket connected to it
+
+        Raises LockdownError when the device does not offer the service.
+        """
+        if not self.session_id:
+            self.start_session()
+
+        reply = self.request({"Request": "StartService", "Service": name})
+        sock = self.usbmux.connect_device(self.device_id, reply["Port"])
+        sock.settimeout(self.timeout)
+        if reply.get("EnableServiceSSL"):
+            sock = tls_context(self.pair_record).wrap_socket(sock)
+        return sock
+
+    def get_domains(self, domains=INFO_DOMAINS):
+        """Every key of several domains merged into one dict, in one session"""
+        if not self.session_id:
+            self.start_session()
+
+        values = {}
+        for domain in domains:
+            try:
+                values.update(self.get_value(domain) or {})
+            except LockdownError:
+                # A domain this iOS version does not have
+                continue
+        return values
+
+
+def read_domains_with_ideviceinfo(udid, domains=INFO_DOMAINS, timeout=5):
+    """Fallback when usbmuxd cannot be reached: one ideviceinfo -x run per domain"""
+    values = {}
+    for domain in domains:
+        command = ["ideviceinfo", "-u", udid, "-x"]
+        if domain:
+            command += ["-q", domain]
+        try:
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+        except FileNotFoundError as e:
+            raise LockdownError(f"usbmuxd is unreachable and ideviceinfo is not installed: {e}") from e
+        if result.returncode != 0:
+            raise LockdownError(result.stderr.decode("utf-8", errors="replace").strip()
+                                or f"ideviceinfo exited with {result.returncode}")
+        try:
+            values.update(plistlib.loads(result.stdout))
+        except plistlib.InvalidFileException as e:
+            raise LockdownError(f"Malformed ideviceinfo output: {e}") from e
+    return values
+
+
+def read_device_info(udid, domains=INFO_DOMAINS, usbmux=None, timeout=5):
+    """All keys of the given domains from one lockdown session
+
+    Falls back to ideviceinfo when usbmuxd is not reachable, e.g. on systems
+    where only the command line tools can talk to the device.
+    """
+    try:
+        with LockdownClient(udid, usbmux, timeout) as lockdown:
+            return lockdown.get_domains(domains)
+    except (UsbmuxError, OSError, ssl.SSLError, KeyError):
+        return read_domains_with_ideviceinfo(udid, domains, timeout)
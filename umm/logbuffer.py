@@ -0,0 +1,63 @@
+"""Bounded, thread-safe log line storage shared between reader threads and the UI"""
+import threading
+from collections import deque
+
+# Default number of lines kept before the oldest are dropped
+DEFAULT_MAX_LINES = 100000
+
+
+class LogBuffer:
+    """Ring buffer of log lines addressed by absolute line number
+
+    Reader threads append freely; the UI polls version on its own schedule
+    and fetches only the slice it shows. Line numbers keep counting after
+    old lines are dropped, so a view scrolled into history stays put while
+    new lines arrive.
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES):
+        self.lines = deque(maxlen=max_lines)
+        self.lock = threading.Lock()
+        self.total = 0
+        self.version = 0
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def max_lines(self):
+        return self.lines.maxlen
+
+    @property
+    def first(self):
+        """Absolute number of the oldest line still kept"""
+        return self.total - len(self.lines)
+
+    def set_max_lines(self, max_lines):
+        with self.lock:
+            self.lines = deque(self.lines, maxlen=max(1, max_lines))
+            self.version += 1
+
+    def append(self, line):
+        with self.lock:
+            self.lines.append(line)
+            self.total += 1
+            self.version += 1
+
+    def extend(self, lines):
+        lines = list(lines)
+        with self.lock:
+            self.lines.extend(lines)
+            self.total += len(lines)
+            self.version += 1
+
+    def clear(self):
+        with self.lock:
+            self.lines.clear()
+            self.version += 1
+
+    def window(self, start, count):
+        """Return up to count lines starting at absolute line number start"""
+        with self.lock:
+            offset = max(0, start - (self.total - len(self.lines)))
+            return [self.lines[index] for index in range(offset, min(offset + count, len(self.lines)))]
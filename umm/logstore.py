@@ -0,0 +1,314 @@
+"""On-disk syslog history: rotating gzip segments with a small SQLite index"""
+import gzip
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_LOG_DIR = os.path.join(os.path.expanduser("~"), "iOSDeviceManager", "Logs")
+
+# Lines per segment before it is compressed and indexed
+SEGMENT_LINES = 20000
+
+# Lines of the open segment, appended as they arrive
+JOURNAL_NAME = "open.log"
+
+# Oldest segments are deleted once the store grows beyond this
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Per-segment Bloom filter over the character trigrams of every line
+BLOOM_BITS = 64 * 1024 * 8
+BLOOM_HASHES = 3
+
+LEVELS = ["Emergency", "Alert", "Critical", "Error", "Warning", "Notice", "Info", "Debug"]
+
+# e.g. "Mar 10 12:34:56 iPhone SpringBoard(UIKit)[57] <Notice>: message"
+SYSLOG_PATTERN = re.compile(r"^\w{3}\s+\d+\s+[\d:]+\s+\S+\s+([^\s\[(]+)(?:\([^)]*\))?\[\d+\]\s+<(\w+)>:")
+
+
+def parse_syslog_line(line):
+    """Return (process, level) of an idevicesyslog line, or (None, None)"""
+    match = SYSLOG_PATTERN.match(line)
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def bloom_positions(trigram):
+    digest = hashlib.blake2b(trigram.encode("utf-8"), digest_size=4 * BLOOM_HASHES).digest()
+    return [int.from_bytes(digest[i * 4:i * 4 + 4], "little") % BLOOM_BITS for i in range(BLOOM_HASHES)]
+
+
+def required_trigrams(pattern):
+    """Trigrams every match of pattern must contain, if the pattern is a plain literal"""
+    if any(c in pattern for c in ".^$*+?{}[]\\|()"):
+        return set()
+    return trigrams(pattern)
+
+
+class LogStore:
+    """Append-only syslog history that can be filtered without reading all of it
+
+    Every line is stored with its capture time. Lines are appended to a
+    plain journal as they arrive, so a crash loses nothing already handed
+    to append; once the journal holds a segment's worth it is sealed into
+    a gzip segment indexed by time range, process names, severities and a
+    Bloom filter over character trigrams, so a query only decompresses
+    segments that can contain matches.
+    """
+
+    def __init__(self, directory=DEFAULT_LOG_DIR, segment_lines=SEGMENT_LINES, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.segment_lines = segment_lines
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.open_lines = []
+        self.open_processes = set()
+        self.open_levels = set()
+        self.open_trigrams = set()
+        self.journal_path = os.path.join(directory, JOURNAL_NAME)
+
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                "id INTEGER PRIMARY KEY, path TEXT, first_ts REAL, last_ts REAL, lines INTEGER, size INTEGER, bloom BLOB)"
+            )
+            self.db.execute("CREATE TABLE IF NOT EXISTS terms (segment INTEGER, kind TEXT, value TEXT)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS terms_lookup ON terms (kind, value)")
+
+        self.recover()
+
+    def recover(self):
+        """Take back the lines journaled before the last run ended, and start a clean journal"""
+        records = []
+        try:
+            with open(self.journal_path, encoding="utf-8", newline="\n") as f:
+                for record in f:
+                    timestamp, tab, line = record.rstrip("\n").partition("\t")
+                    try:
+                        if tab:
+                            records.append((float(timestamp), line))
+                    except ValueError:
+                        # The tail of a record cut short by a crash
+                        continue
+        except FileNotFoundError:
+            pass
+
+        # A crash between sealing and clearing the journal leaves lines that are already in a segment;
+        # the journal keeps times to the millisecond
+        if records and self.db.execute(
+                "SELECT 1 FROM segments WHERE ABS(first_ts - ?) < 0.001 AND ABS(last_ts - ?) < 0.001 AND lines = ?",
+                (records[0][0], records[-1][0], len(records))).fetchone():
+            records = []
+
+        self.journal = open(self.journal_path, "w", encoding="utf-8", newline="\n", buffering=1)
+        for timestamp, line in records:
+            self.add(timestamp, line)
+        if len(self.open_lines) >= self.segment_lines:
+            self.seal()
+
+    def segment_path(self, first_ts):
+        """A new segment's file, numbered when another segment started in the same millisecond"""
+        path = os.path.join(self.directory, f"segment-{first_ts:.3f}.log.gz")
+        number = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"segment-{first_ts:.3f}-{number}.log.gz")
+            number += 1
+        return path
+
+    def append(self, line, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        line = line.rstrip("\n")
+
+        with self.lock:
+            self.add(timestamp, line)
+            if len(self.open_lines) >= self.segment_lines:
+                self.seal()
+
+    def add(self, timestamp, line):
+        """Journal a line and index it into the open segment"""
+        process, level = parse_syslog_line(line)
+        # Line buffered, so the record reaches the file before append returns
+        self.journal.write(f"{timestamp:.3f}\t{line}\n")
+        self.open_lines.append((timestamp, line))
+        if process:
+            self.open_processes.add(process)
+            self.open_levels.add(level)
+        self.open_trigrams.update(trigrams(line))
+
+    def flush(self):
+        """Make the journal durable, so the lines so far survive a power loss too"""
+        with self.lock:
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+
+    def seal(self):
+        first_ts, last_ts = self.open_lines[0][0], self.open_lines[-1][0]
+        path = self.segment_path(first_ts)
+
+        bloom = bytearray(BLOOM_BITS // 8)
+        for trigram in self.open_trigrams:
+            for position in bloom_positions(trigram):
+                bloom[position // 8] |= 1 << (position % 8)
+
+        # Written aside and renamed, so an indexed segment is always complete
+        with gzip.open(path + ".part", "wt", encoding="utf-8", compresslevel=6) as f:
+            for timestamp, line in self.open_lines:
+                f.write(f"{timestamp:.3f}\t{line}\n")
+        os.replace(path + ".part", path)
+
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO segments (path, first_ts, last_ts, lines, size, bloom) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, first_ts, last_ts, len(self.open_lines), os.path.getsize(path), bytes(bloom))
+            )
+            self.db.executemany(
+                "INSERT INTO terms VALUES (?, ?, ?)",
+                [(cursor.lastrowid, "process", name) for name in self.open_processes] +
+                [(cursor.lastrowid, "level", name) for name in self.open_levels]
+            )
+
+        # The lines are in the segment now, so the journal starts over
+        self.journal.seek(0)
+        self.journal.truncate()
+        self.open_lines = []
+        self.open_processes = set()
+        self.open_levels = set()
+        self.open_trigrams = set()
+        self.enforce_retention()
+
+    def enforce_retention(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM segments").fetchone()[0]
+        for segment_id, path, size in self.db.execute("SELECT id, path, size FROM segments ORDER BY first_ts, id").fetchall():
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self.db:
+                self.db.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+                self.db.execute("DELETE FROM terms WHERE segment = ?", (segment_id,))
+            total -= size
+
+    def candidate_segments(self, process=None, level=None, since=None, until=None, required=()):
+        query = "SELECT id, path, bloom FROM segments WHERE 1 = 1"
+        params = []
+        if since is not None:
+            query += " AND last_ts >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND first_ts <= ?"
+            params.append(until)
+        for kind, value in (("process", process), ("level", level)):
+            if value:
+                query += " AND id IN (SELECT segment FROM terms WHERE kind = ? AND value = ?)"
+                params.extend([kind, value])
+        query += " ORDER BY first_ts, id"
+
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+
+        for segment_id, path, bloom in rows:
+            if all(self.bloom_contains(bloom, trigram) for trigram in required):
+                yield path
+
+    @staticmethod
+    def bloom_contains(bloom, trigram):
+        return all(bloom[position // 8] & (1 << (position % 8)) for position in bloom_positions(trigram))
+
+    def search(self, pattern=None, process=None, level=None, since=None, until=None, limit=None):
+        """Yield stored lines matching every given filter, oldest first
+
+        pattern is a regular expression matched case-insensitively against
+        the whole line.
+        """
+        regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+        required = required_trigrams(pattern) if pattern else set()
+        found = 0
+
+        def matches(timestamp, line):
+            if since is not None and timestamp < since:
+                return False
+            if until is not None and timestamp > until:
+                return False
+            if process or level:
+                line_process, line_level = parse_syslog_line(line)
+                if (process and line_process != process) or (level and line_level != level):
+                    return False
+            return not regex or regex.search(line)
+
+        for path in self.candidate_segments(process, level, since, until, required):
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    for record in f:
+                        timestamp, _, line = record.rstrip("\n").partition("\t")
+                        if matches(float(timestamp), line):
+                            yield line + "\n"
+                            found += 1
+                            if limit and found >= limit:
+                                return
+            except (OSError, EOFError, ValueError):
+                # Retention can delete a segment between the index lookup and reading it
+                continue
+
+        with self.lock:
+            open_lines = list(self.open_lines)
+        for timestamp, line in open_lines:
+            if matches(timestamp, line):
+                yield line + "\n"
+                found += 1
+                if limit and found >= limit:
+                    return
+
+    def close(self):
+        """Seal what the journal holds and release the files"""
+        with self.lock:
+            if self.open_lines:
+                self.seal()
+            self.journal.close()
+            self.db.close()
+
+
+class LogWriter:
+    """Feeds a LogStore from a thread of its own
+
+    Journaling, indexing and sealing a segment take real time, so a stream
+    callback that must return quickly hands its lines to append and this
+    thread stores them in order.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def append(self, line):
+        # Stamped here, so queueing does not shift capture times
+        self.queue.put((time.time(), line))
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            timestamp, line = item
+            self.store.append(line, timestamp)
+        self.store.flush()
+
+    def close(self, wait=False):
+        """Store what is queued and stop; with wait, return only once it is stored"""
+        self.queue.put(None)
+        if wait:
+            self.thread.join()
@@ -0,0 +1,103 @@
+"""Tk log view that renders only the visible slice of a LogBuffer"""
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+
+# Milliseconds between UI refreshes
+FRAME_MS = 50
+
+
+class VirtualLogView(ttk.Frame):
+    """Scrollable view over a LogBuffer
+
+    The Text widget only ever holds the lines currently on screen, and it is
+    redrawn at most once per frame when the buffer or scroll position
+    changed. Memory and redraw cost therefore stay constant however many
+    lines arrive. While scrolled to the bottom the view follows new lines.
+    """
+
+    def __init__(self, parent, buffer, frame_ms=FRAME_MS, **text_options):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.frame_ms = frame_ms
+        self.top = 0
+        self.rows = 40
+        self.follow = True
+        self.paused = False
+        self.rendered = None
+
+        self.text = tk.Text(self, wrap=tk.NONE, state=tk.DISABLED, **text_options)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.xscrollbar = ttk.Scrollbar(self, orient="horizontal", command=self.text.xview)
+        self.text.configure(xscrollcommand=self.xscrollbar.set)
+
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.xscrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.text.bind("<Configure>", self.on_resize)
+        self.text.bind("<MouseWheel>", lambda e: self.scroll_lines(-3 if e.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda e: self.scroll_lines(-3))
+        self.text.bind("<Button-5>", lambda e: self.scroll_lines(3))
+
+        self.after(self.frame_ms, self.flush)
+
+    def on_resize(self, event):
+        line_height = tkfont.Font(font=self.text.cget("font")).metrics("linespace")
+        self.rows = max(1, event.height // max(1, line_height))
+        self.rendered = None
+
+    def on_scroll(self, action, value, units=None):
+        if action == "moveto":
+            self.scroll_to(self.buffer.first + int(float(value) * len(self.buffer)))
+        elif action == "scroll":
+            step = self.rows if units == "pages" else 1
+            self.scroll_lines(int(value) * step)
+
+    def scroll_lines(self, count):
+        self.scroll_to(self.top + count)
+
+    def scroll_to(self, top):
+        last_top = max(self.buffer.first, self.buffer.total - self.rows)
+        self.top = max(self.buffer.first, min(top, last_top))
+        self.follow = self.top >= last_top
+        self.render()
+
+    def set_buffer(self, buffer):
+        """Show a different LogBuffer, e.g. search results instead of the live stream"""
+        self.buffer = buffer
+        self.follow = True
+        self.rendered = None
+
+    def set_paused(self, paused):
+        """Freeze the display; lines keep accumulating in the buffer"""
+        self.paused = paused
+        if not paused:
+            self.rendered = None
+
+    def flush(self):
+        state = (self.buffer.version, self.top, self.rows)
+        if not self.paused and state != self.rendered:
+            self.render()
+        self.after(self.frame_ms, self.flush)
+
+    def render(self):
+        total = len(self.buffer)
+        if self.follow:
+            self.top = max(self.buffer.first, self.buffer.total - self.rows)
+        self.top = max(self.top, self.buffer.first)
+
+        lines = self.buffer.window(self.top, self.rows)
+
+        self.text.config(state=tk.NORMAL)
+        self.text.delete(1.0, tk.END)
+        self.text.insert(tk.END, "".join(lines))
+        self.text.config(state=tk.DISABLED)
+
+        if total:
+            first = (self.top - self.buffer.first) / total
+            self.scrollbar.set(first, first + len(lines) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+        self.rendered = (self.buffer.version, self.top, self.rows)
@@ -0,0 +1,121 @@
+"""Read the app identity (ID and build version) out of APK and IPA files without any SDK tools"""
+import plistlib
+import re
+import struct
+import zipfile
+
+# Chunk types of Android's binary XML
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+
+# String pool flag for UTF-8 strings; UTF-16 otherwise
+UTF8_FLAG = 0x100
+
+# Resource ID of android:versionCode, for manifests whose attribute names are stripped
+VERSION_CODE_RESOURCE = 0x0101021B
+
+# Typed value kinds that carry an integer
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+
+NO_ENTRY = 0xFFFFFFFF
+
+
+def read_length(data, offset, utf8):
+    """Decode a string pool length prefix; returns (length, next offset)"""
+    if utf8:
+        length = data[offset]
+        if length & 0x80:
+            return ((length & 0x7F) << 8) | data[offset + 1], offset + 2
+        return length, offset + 1
+
+    length = struct.unpack_from("<H", data, offset)[0]
+    if length & 0x8000:
+        return ((length & 0x7FFF) << 16) | struct.unpack_from("<H", data, offset + 2)[0], offset + 4
+    return length, offset + 2
+
+
+def read_string_pool(data, offset):
+    header_size, _, count, _, flags, strings_start = struct.unpack_from("<HIIIII", data, offset + 2)
+    utf8 = bool(flags & UTF8_FLAG)
+    strings = []
+    for index in range(count):
+        position = offset + strings_start + struct.unpack_from("<I", data, offset + header_size + index * 4)[0]
+        if utf8:
+            # Character count, then byte count
+            _, position = read_length(data, position, True)
+            length, position = read_length(data, position, True)
+            strings.append(data[position:position + length].decode("utf-8", errors="replace"))
+        else:
+            length, position = read_length(data, position, False)
+            strings.append(data[position:position + length * 2].decode("utf-16-le", errors="replace"))
+    return strings
+
+
+def parse_manifest(data):
+    """(package, versionCode) from a compiled AndroidManifest.xml"""
+    try:
+        strings = []
+        resource_ids = []
+        offset = struct.unpack_from("<H", data, 2)[0]
+        while offset < len(data):
+            chunk_type, header_size, size = struct.unpack_from("<HHI", data, offset)
+            if chunk_type == RES_STRING_POOL_TYPE:
+                strings = read_string_pool(data, offset)
+            elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+                resource_ids = struct.unpack_from(f"<{(size - header_size) // 4}I", data, offset + header_size)
+            elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+                # The first element is <manifest>
+                _, name, attribute_start, attribute_size, attribute_count = struct.unpack_from(
+                    "<IIHHH", data, offset + header_size)
+                if strings[name] != "manifest":
+                    break
+
+                package = version = None
+                position = offset + header_size + attribute_start
+                for _ in range(attribute_count):
+                    _, name, raw, _, _, value_type, value = struct.unpack_from("<IIIHBBI", data, position)
+                    position += attribute_size
+                    resource = resource_ids[name] if name < len(resource_ids) else None
+                    if strings[name] == "package" and raw != NO_ENTRY:
+                        package = strings[raw]
+                    elif strings[name] == "versionCode" or resource == VERSION_CODE_RESOURCE:
+                        if value_type in (TYPE_INT_DEC, TYPE_INT_HEX):
+                            version = str(value)
+                        elif raw != NO_ENTRY:
+                            version = strings[raw]
+                if package and version:
+                    return package, version
+                break
+            if size <= 0:
+                break
+            offset += size
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Unreadable AndroidManifest.xml: {e}") from e
+    raise ValueError("AndroidManifest.xml has no package and versionCode")
+
+
+def apk_identity(path):
+    """(package name, versionCode) of an APK"""
+    try:
+        with zipfile.ZipFile(path) as apk:
+            return parse_manifest(apk.read("AndroidManifest.xml"))
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ValueError(f"{path} is not an APK: {e}") from e
+
+
+def ipa_identity(path):
+    """(CFBundleIdentifier, CFBundleVersion) of an IPA's main app"""
+    try:
+        with zipfile.ZipFile(path) as ipa:
+            names = [name for name in ipa.namelist() if re.fullmatch(r"Payload/[^/]+\.app/Info\.plist", name)]
+            if not names:
+                raise ValueError(f"{path} has no Payload/*.app/Info.plist")
+            info = plistlib.loads(ipa.read(names[0]))
+    except (zipfile.BadZipFile, plistlib.InvalidFileException) as e:
+        raise ValueError(f"{path} is not an IPA: {e}") from e
+
+    if "CFBundleIdentifier" not in info or "CFBundleVersion" not in info:
+        raise ValueError(f"{path} has no bundle ID or version")
+    return info["CFBundleIdentifier"], str(info["CFBundleVersion"])
@@ -0,0 +1,61 @@
+"""Screen capture streamed over adb exec-out, without staging files on the device"""
+import struct
+from io import BytesIO
+
+from umm.adb import AdbError
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# screencap pixel formats (android.graphics.PixelFormat) as (Pillow mode, raw decoder mode, bytes per pixel)
+RAW_FORMATS = {
+    1: ("RGBA", "RGBA", 4),     # RGBA_8888
+    2: ("RGB", "RGBX", 4),      # RGBX_8888
+    3: ("RGB", "RGB", 3),       # RGB_888
+    4: ("RGB", "BGR;16", 2),    # RGB_565
+    5: ("RGBA", "BGRA", 4),     # BGRA_8888
+}
+
+
+def capture_png(client, serial, timeout=30):
+    """Return the device screen as PNG bytes encoded on the device"""
+    data = client.exec_out(serial, "screencap -p", timeout)
+    if not data.startswith(PNG_SIGNATURE):
+        raise AdbError(f"Device did not return a PNG image: {data[:80]!r}")
+    return data
+
+
+def decode_raw(data):
+    """Decode raw `screencap` output into a Pillow image"""
+    from PIL import Image
+
+    if len(data) < 12:
+        raise AdbError("Framebuffer data is truncated")
+
+    width, height, pixel_format = struct.unpack_from("<III", data)
+    if pixel_format not in RAW_FORMATS:
+        raise AdbError(f"Unsupported framebuffer pixel format {pixel_format}")
+
+    mode, raw_mode, bytes_per_pixel = RAW_FORMATS[pixel_format]
+
+    # Android 9 and newer add a color space field to the 12-byte header
+    header_size = len(data) - width * height * bytes_per_pixel
+    if header_size not in (12, 16):
+        raise AdbError("Framebuffer size does not match its header")
+
+    return Image.frombuffer(mode, (width, height), data[header_size:], "raw", raw_mode, 0, 1)
+
+
+def capture(client, serial, raw=False, timeout=30):
+    """Capture the screen as PNG bytes
+
+    In raw mode the device skips PNG encoding and sends its framebuffer,
+    which is encoded on the host with Pillow instead. That is usually much
+    faster on slow devices but transfers more data.
+    """
+    if not raw:
+        return capture_png(client, serial, timeout)
+
+    image = decode_raw(client.exec_out(serial, "screencap", timeout))
+    buffer = BytesIO()
+    image.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
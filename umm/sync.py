@@ -0,0 +1,368 @@
+"""rsync-style sync between a local folder and a folder on an Android or iOS device
+
+Both trees are listed in bulk up front: os.walk locally, one `find` over
+adb, or a level-parallel idevicefs walk. Files whose size and modification
+time match are left alone; with checksum, files of equal size are also
+compared by SHA-256 where the device can hash them. A manifest remembers
+what both sides looked like after the last sync, so a repeated sync of a
+large unchanged tree needs no transfers and no hashing, and two-way syncs
+can tell which side changed.
+"""
+import os
+import posixpath
+import shlex
+import sqlite3
+import subprocess
+import threading
+
+from umm.adb import AdbError
+from umm.cache import DEFAULT_CACHE_PATH
+from umm.ledger import HashCache, open_database
+from umm.transfer import DEFAULT_WORKERS, DirectoryTransfer
+
+DEFAULT_SYNC_PATH = os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), "sync_manifest.sqlite3")
+
+# Directions: local to device, device to local, or whichever side changed
+PUSH = "push"
+PULL = "pull"
+BOTH = "both"
+
+# Modification times closer than this many seconds count as equal; devices keep whole seconds
+MTIME_TOLERANCE = 2
+
+# Paths per sha256sum run on an Android device
+HASH_BATCH = 100
+
+# Seconds allowed for listing or hashing a whole tree on an Android device
+SCAN_TIMEOUT = 300
+
+
+def scan_local(root):
+    """{relative path: (is directory, size, mtime)} of everything under a local folder"""
+    entries = {}
+    for directory, names, files in os.walk(root):
+        relative = os.path.relpath(directory, root)
+        prefix = "" if relative == os.curdir else relative.replace(os.sep, "/") + "/"
+        for name in names:
+            entries[prefix + name] = (True, 0, 0.0)
+        for name in files:
+            try:
+                file_stat = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            entries[prefix + name] = (False, file_stat.st_size, file_stat.st_mtime)
+    return entries
+
+
+class AdbFiles:
+    """Bulk listing, hashing and copying under a folder on an Android device"""
+
+    def __init__(self, client, serial):
+        self.client = client
+        self.device = serial
+
+    def scan(self, root, on_error=None, max_workers=None):
+        """{relative path: (is directory, size, mtime)} of everything under root, from one find"""
+        root = root.rstrip("/") or "/"
+        result = self.client.shell(
+            self.device, f"find {shlex.quote(root)} -mindepth 1 -exec stat -c '%F|%s|%Y|%n' {{}} +", timeout=SCAN_TIMEOUT)
+        prefix = root.rstrip("/") + "/"
+        entries = {}
+        for line in result.stdout.splitlines():
+            parts = line.split("|", 3)
+            if len(parts) != 4 or not parts[3].startswith(prefix):
+                continue
+            kind, size, mtime, path = parts
+            if kind == "directory":
+                entries[path[len(prefix):]] = (True, 0, 0)
+            elif kind.startswith("regular"):
+                entries[path[len(prefix):]] = (False, int(size), int(mtime))
+        if result.returncode not in (0, None) and not entries:
+            raise AdbError((result.stdout or result.stderr).strip() or f"Cannot list {root}")
+        return entries
+
+    def hashes(self, root, paths):
+        """{relative path: SHA-256} of files under root, in batches of HASH_BATCH per command"""
+        digests = {}
+        paths = list(paths)
+        for start in range(0, len(paths), HASH_BATCH):
+            batch = {posixpath.join(root, path): path for path in paths[start:start + HASH_BATCH]}
+            output = self.client.shell(
+                self.device, "sha256sum " + " ".join(shlex.quote(path) for path in batch), timeout=SCAN_TIMEOUT).stdout
+            for line in output.splitlines():
+                digest, _, path = line.partition("  ")
+                if path in batch and len(digest) == 64:
+                    digests[batch[path]] = digest
+        return digests
+
+    def mkdir(self, path):
+        self.client.shell(self.device, f"mkdir -p {shlex.quote(path)}")
+
+    def remove(self, path):
+        # Without -f, so a file that cannot be deleted is reported rather than counted as gone
+        result = self.client.shell(self.device, f"rm {shlex.quote(path)}")
+        output = (result.stdout or result.stderr).strip()
+        if result.returncode not in (0, None) or output.startswith("rm:"):
+            raise AdbError(output or f"Cannot remove {path}")
+
+    def get(self, remote_path, local_path, size, progress=None, cancelled=None):
+        self.client.pull(self.device, remote_path, local_path, progress)
+
+    def put(self, local_path, remote_path, size, progress=None, cancelled=None):
+        # The sync service keeps the local mtime and creates missing parent folders
+        self.client.push(self.device, local_path, remote_path, progress)
+
+
+class SyncManifest:
+    """What both sides of each synced folder pair looked like after its last sync, kept in SQLite"""
+
+    def __init__(self, path=None):
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = open_database(path, "CREATE TABLE IF NOT EXISTS manifest ("
+                                          "pair TEXT, path TEXT, local_size INTEGER, local_mtime REAL, "
+                                          "remote_size INTEGER, remote_mtime TEXT, PRIMARY KEY (pair, path))")
+        self.pairs = {}
+
+    def load(self, pair):
+        """{relative path: ((local size, local mtime), (remote size, remote mtime))}"""
+        with self.lock:
+            if pair not in self.pairs:
+                entries = {}
+                if self.db:
+                    try:
+                        for path, local_size, local_mtime, remote_size, remote_mtime in self.db.execute(
+                                "SELECT path, local_size, local_mtime, remote_size, remote_mtime FROM manifest "
+                                "WHERE pair = ?", (pair,)):
+                            entries[path] = ((local_size, local_mtime), (remote_size, remote_mtime))
+                    except sqlite3.Error:
+                        self.db = None
+                self.pairs[pair] = entries
+            return dict(self.pairs[pair])
+
+    def save(self, pair, entries):
+        with self.lock:
+            self.pairs[pair] = dict(entries)
+            if self.db:
+                try:
+                    with self.db:
+                        self.db.execute("DELETE FROM manifest WHERE pair = ?", (pair,))
+                        self.db.executemany("INSERT INTO manifest VALUES (?, ?, ?, ?, ?, ?)", [
+                            (pair, path) + local + remote for path, (local, remote) in entries.items()
+                        ])
+                except sqlite3.Error:
+                    pass
+
+
+class FolderSync:
+    """Bring a local folder and a device folder in line, copying only what differs
+
+    files is the device side: AdbFiles or an IdevicefsClient. plan() lists
+    both trees and returns (action, relative path, size, reason) tuples,
+    where action is push, pull, delete-local, delete-remote or conflict;
+    run() carries them out (unless dry_run) and returns (actions,
+    TransferStats). One-way syncs make the target match the source, and
+    delete target files the source lacks only with delete. Two-way syncs
+    copy whichever side changed since the last sync; when both did, the
+    clearly newer file wins and otherwise the file is reported as a
+    conflict and left alone. Only files are synced, not empty folders.
+    """
+
+    def __init__(self, files, local_root, remote_root, direction=PUSH, checksum=False, delete=False,
+                 manifest=None, hashes=None, max_workers=DEFAULT_WORKERS, on_progress=None):
+        self.files = files
+        self.local_root = os.path.abspath(local_root)
+        self.remote_root = remote_root.rstrip("/") or "/"
+        self.direction = direction
+        self.checksum = checksum
+        self.delete = delete
+        self.manifest = manifest
+        self.hashes = hashes or HashCache()
+        self.transfer = DirectoryTransfer(files, max_workers, on_progress)
+        self.local = {}
+        self.remote = {}
+        self.previous = {}
+        self.remote_hashes = {}
+
+    @property
+    def pair(self):
+        return f"{self.files.device}:{self.remote_root}|{self.local_root}"
+
+    def local_path(self, path):
+        return os.path.join(self.local_root, *path.split("/"))
+
+    def remote_path(self, path):
+        return posixpath.join(self.remote_root, path)
+
+    def scan(self, missing_ok=False):
+        """List both sides, keeping files only; missing_ok treats a remote folder that cannot be listed as empty"""
+        self.local = {path: entry[1:] for path, entry in scan_local(self.local_root).items() if not entry[0]}
+        try:
+            self.remote = {path: entry[1:] for path, entry in self.files.scan(self.remote_root).items()
+                           if not entry[0]}
+        except subprocess.SubprocessError:
+            if not missing_ok:
+                raise
+            self.remote = {}
+
+    def states(self, path):
+        """(local state, remote state) as the manifest stores them; None for a missing side"""
+        local = self.local.get(path)
+        remote = self.remote.get(path)
+        return (tuple(local) if local else None), ((remote[0], str(remote[1])) if remote else None)
+
+    def newer(self, path):
+        """Which side has the clearly newer file, or None when the times cannot tell"""
+        local_mtime, remote_mtime = self.local[path][1], self.remote[path][1]
+        if not isinstance(remote_mtime, (int, float)) or abs(local_mtime - remote_mtime) <= MTIME_TOLERANCE:
+            return None
+        return "local" if local_mtime > remote_mtime else "remote"
+
+    def same_content(self, path):
+        (local_size, local_mtime), (remote_size, remote_mtime) = self.local[path], self.remote[path]
+        if local_size != remote_size:
+            return False
+        if path in self.remote_hashes:
+            try:
+                return self.hashes.digest(self.local_path(path)) == self.remote_hashes[path]
+            except OSError:
+                return False
+        # idevicefs only shows a date without seconds, which cannot be compared with a local time
+        return isinstance(remote_mtime, (int, float)) and abs(local_mtime - remote_mtime) <= MTIME_TOLERANCE
+
+    def decide(self, path):
+        local, remote = self.states(path)
+        previous = self.previous.get(path)
+        if local and remote:
+            if previous == (local, remote) or self.same_content(path):
+                return None
+            if self.direction == PUSH:
+                return "push", path, local[0], "differs"
+            if self.direction == PULL:
+                return "pull", path, remote[0], "differs"
+            local_changed = previous is None or previous[0] != local
+            remote_changed = previous is None or previous[1] != remote
+            if local_changed and not remote_changed:
+                return "push", path, local[0], "changed here"
+            if remote_changed and not local_changed:
+                return "pull", path, remote[0], "changed on device"
+            newer = self.newer(path)
+            if newer == "local":
+                return "push", path, local[0], "newer here"
+            if newer == "remote":
+                return "pull", path, remote[0], "newer on device"
+            return "conflict", path, 0, "changed on both sides"
+
+        if local:
+            if self.direction == PULL:
+                return ("delete-local", path, local[0], "not on device") if self.delete else None
+            if self.direction == BOTH and previous and previous[0] == local and self.delete:
+                return "delete-local", path, local[0], "deleted on device"
+            return "push", path, local[0], "missing on device"
+        if remote:
+            if self.direction == PUSH:
+                return ("delete-remote", path, remote[0], "not here") if self.delete else None
+            if self.direction == BOTH and previous and previous[1] == remote and self.delete:
+                return "delete-remote", path, remote[0], "deleted here"
+            return "pull", path, remote[0], "missing here"
+        return None
+
+    def plan(self, dry_run=False):
+        """List both sides and work out what a sync would do; only a real run creates missing folders"""
+        if self.direction == PUSH and not os.path.isdir(self.local_root):
+            # An empty source would otherwise look like a request to delete everything
+            raise ValueError(f"{self.local_root} is not a folder")
+        if not dry_run:
+            if self.direction != PULL:
+                self.files.mkdir(self.remote_root)
+            os.makedirs(self.local_root, exist_ok=True)
+
+        # A push only ever deletes remote files, so a target folder that is not there yet is safe to call empty
+        self.scan(missing_ok=dry_run and self.direction == PUSH)
+        self.previous = self.manifest.load(self.pair) if self.manifest else {}
+
+        self.remote_hashes = {}
+        if self.checksum:
+            # Hash only what the manifest cannot vouch for and the size does not already rule out
+            candidates = [path for path in self.local.keys() & self.remote.keys()
+                          if self.local[path][0] == self.remote[path][0]
+                          and self.previous.get(path) != self.states(path)]
+            self.remote_hashes = self.files.hashes(self.remote_root, candidates)
+
+        actions = []
+        for path in sorted(self.local.keys() | self.remote.keys()):
+            action = self.decide(path)
+            if action:
+                actions.append(action)
+        return actions
+
+    def run(self, dry_run=False):
+        actions = self.plan(dry_run)
+        if dry_run:
+            return actions, self.transfer.stats
+
+        pushes = [(self.local_path(path), self.remote_path(path), size)
+                  for action, path, size, _ in actions if action == "push"]
+        pulls = [(self.remote_path(path), self.local_path(path), size)
+                 for action, path, size, _ in actions if action == "pull"]
+
+        if pushes:
+            remote_folders = {posixpath.dirname(self.remote_path(path)) for path in self.remote}
+            for folder in sorted({posixpath.dirname(target) for _, target, _ in pushes} - remote_folders):
+                try:
+                    self.files.mkdir(folder)
+                except subprocess.SubprocessError as e:
+                    # The pushes into it fail and are reported on their own; the rest go ahead
+                    self.transfer.stats.errors.append((folder, str(e)))
+            self.transfer.run(pushes, self.files.put)
+        if pulls:
+            for _, target, _ in pulls:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+            self.transfer.run(pulls, self.files.get)
+
+        for action, path, _, _ in actions:
+            if self.transfer.cancelled.is_set():
+                break
+            try:
+                if action == "delete-remote":
+                    self.files.remove(self.remote_path(path))
+                elif action == "delete-local":
+                    os.remove(self.local_path(path))
+            except (OSError, subprocess.SubprocessError) as e:
+                self.transfer.stats.errors.append((path, str(e)))
+
+        # Pulled files take the device's time, so the next sync sees both sides as equal
+        copied = set(self.transfer.copied)
+        for source, target, _ in pulls:
+            mtime = self.remote[posixpath.relpath(source, self.remote_root)][1]
+            if source in copied and isinstance(mtime, (int, float)):
+                os.utime(target, (mtime, mtime))
+
+        self.record(actions, copied)
+        return actions, self.transfer.stats
+
+    def record(self, actions, copied):
+        """Save the state of every file now in sync on both sides"""
+        unsettled = set()
+        for action, path, _, _ in actions:
+            source = self.local_path(path) if action == "push" else self.remote_path(path)
+            if action == "conflict" or (action in ("push", "pull") and source not in copied):
+                unsettled.add(path)
+        if any(action in ("push", "delete-remote") for action, _, _, _ in actions):
+            self.remote = {path: entry[1:] for path, entry in self.files.scan(self.remote_root).items()
+                           if not entry[0]}
+        self.local = {path: entry[1:] for path, entry in scan_local(self.local_root).items() if not entry[0]}
+
+        if self.manifest:
+            entries = {path: self.states(path) for path in self.local.keys() & self.remote.keys()
+                       if path not in unsettled}
+            # A delete that failed keeps its old entry, so the next sync tries it again instead of copying back
+            for action, path, _, _ in actions:
+                if path in self.previous and ((action == "delete-remote" and path in self.remote)
+                                              or (action == "delete-local" and path in self.local)):
+                    entries[path] = self.previous[path]
+            self.manifest.save(self.pair, entries)
+
+    def cancel(self):
+        self.transfer.cancel()
@@ -0,0 +1,101 @@
+"""Run blocking device work on a shared worker pool and deliver the results on the Tk thread"""
+import queue
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# How often the Tk thread drains queued callbacks, in milliseconds
+POLL_MS = 30
+
+# Upper bound on callbacks run per drain, so a flood of progress reports cannot stall the UI
+DRAIN_BATCH = 500
+
+
+class TaskRunner:
+    """One executor for every blocking action of a Tk front end
+
+    Workers never touch widgets. Their results, errors and progress reports
+    are queued and run on the Tk thread by a drain loop scheduled with
+    after(), so all widget access stays on the thread that owns the widgets.
+    Long-lived streams that keep their own thread use post() for the same
+    purpose.
+
+    on_activity(labels) is called on the Tk thread whenever a labelled task
+    starts or finishes, with the labels of the tasks still running.
+    """
+
+    def __init__(self, root, max_workers=8, poll_ms=POLL_MS, on_activity=None):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.poll_ms = poll_ms
+        self.on_activity = on_activity
+        self.callbacks = queue.Queue()
+        self.active = {}
+        self.closed = False
+        self.root.after(self.poll_ms, self.drain)
+
+    def post(self, callback, *args):
+        """Run callback(*args) on the Tk thread; safe to call from any thread"""
+        self.callbacks.put((callback, args))
+
+    def submit(self, func, *args, label=None, on_done=None, on_error=None, on_progress=None):
+        """Run func(*args) on a worker and return its future
+
+        on_done(result) or on_error(exception) runs on the Tk thread when it
+        finishes. With on_progress, func also receives a progress keyword:
+        a callable that forwards its arguments to on_progress on the Tk
+        thread. Call submit itself from the Tk thread.
+        """
+        kwargs = {}
+        if on_progress:
+            kwargs["progress"] = lambda *values: self.post(on_progress, *values)
+
+        return self.watch(self.executor.submit(func, *args, **kwargs), label, on_done, on_error)
+
+    def watch(self, future, label=None, on_done=None, on_error=None):
+        """Deliver an existing future's outcome on the Tk thread, like submit does
+
+        Used for work that runs elsewhere, such as tools on the command engine.
+        """
+        if label:
+            self.active[future] = label
+            self.report_activity()
+        future.add_done_callback(lambda f: self.post(self.finish, f, on_done, on_error))
+        return future
+
+    def finish(self, future, on_done, on_error):
+        if self.active.pop(future, None) is not None:
+            self.report_activity()
+        if future.cancelled():
+            return
+
+        error = future.exception()
+        if error is None:
+            if on_done:
+                on_done(future.result())
+        elif on_error:
+            on_error(error)
+        else:
+            raise error
+
+    def report_activity(self):
+        if self.on_activity:
+            self.on_activity(list(self.active.values()))
+
+    def drain(self):
+        for _ in range(DRAIN_BATCH):
+            try:
+                callback, args = self.callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception:
+                # Same reporting as an exception in any other Tk callback
+                self.root.report_callback_exception(*sys.exc_info())
+
+        if not self.closed:
+            self.root.after(self.poll_ms, self.drain)
+
+    def shutdown(self):
+        self.closed = True
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,354 @@
+"""Recursive, parallel file transfers between the host and an iOS device
+
+Every file is copied by its own idevicefs process on the command engine,
+with a pool of workers keeping several going at once. A transfer may run
+for as long as its size needs at a slow link rate rather than a fixed
+limit, and downloads report their bytes as they land on disk.
+DirectoryTransfer works just as well over umm.afc, which has the same
+file methods on one persistent AFC session.
+"""
+import os
+import posixpath
+import subprocess
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError
+
+# Files copied at once unless the caller says otherwise; the engine's per-device tool limit
+DEFAULT_WORKERS = 4
+
+# Each file may take this many seconds, plus the time its size needs at MIN_RATE bytes per second
+BASE_TIMEOUT = 30
+MIN_RATE = 512 * 1024
+
+# Seconds between progress samples and reports
+PROGRESS_INTERVAL = 0.2
+
+# Appended to a download's name until it is complete
+PARTIAL_SUFFIX = ".part"
+
+
+def transfer_timeout(size):
+    return BASE_TIMEOUT + size / MIN_RATE
+
+
+def parse_listing(output):
+    """Parse `idevicefs ls -la` output into (name, is directory, size, date) rows"""
+    rows = []
+    for line in output.split("\n"):
+        parts = line.split()
+        if len(parts) >= 9:
+            name = " ".join(parts[8:])
+            if name in (".", ".."):
+                continue
+            try:
+                size = int(parts[4])
+            except ValueError:
+                size = 0
+            rows.append((name, parts[0].startswith("d"), size, f"{parts[5]} {parts[6]} {parts[7]}"))
+    return rows
+
+
+class IdevicefsClient:
+    """File operations on one device, each an idevicefs process on the command engine
+
+    get() and put() take the file size, which sets their timeout, and a
+    cancelled event that kills the tool when set. get() reports progress
+    as the local file grows; put() can only report a file once it is done.
+    The methods match AfcClient, which it stands in for without usbmuxd,
+    but listed times are dates without seconds and cannot be set.
+    """
+
+    def __init__(self, engine, udid):
+        self.engine = engine
+        self.udid = udid
+
+    @property
+    def device(self):
+        return self.udid
+
+    def command(self, args):
+        return ["idevicefs", "-u", self.udid] + args
+
+    def check(self, args, result):
+        if result.returncode != 0:
+            raise subprocess.SubprocessError((result.stderr or result.stdout).strip() or f"idevicefs {args[0]} failed")
+        return result
+
+    def run(self, args, timeout=10):
+        return self.check(args, self.engine.run(self.command(args), device=self.udid, timeout=timeout).result())
+
+    def listdir(self, path):
+        return parse_listing(self.run(["ls", "-la", path]).stdout)
+
+    def mkdir(self, path):
+        self.run(["mkdir", path])
+
+    def remove(self, path):
+        self.run(["rm", path])
+
+    def remove_tree(self, path):
+        """Remove a file or a folder with everything in it"""
+        self.run(["rm", "-r", path])
+
+    def rename(self, source, target):
+        self.run(["mv", source, target])
+
+    def set_mtime(self, path, mtime):
+        raise subprocess.SubprocessError("idevicefs cannot set modification times")
+
+    def stat(self, path):
+        """{is_dir, is_link, size, mtime} of a path from a listing of its folder; mtime is the listed date"""
+        parent, name = posixpath.split(path.rstrip("/"))
+        if not name:
+            return {"is_dir": True, "is_link": False, "size": 0, "mtime": ""}
+        for row_name, is_dir, size, date in self.listdir(parent or "/"):
+            if row_name == name:
+                return {"is_dir": is_dir, "is_link": False, "size": size, "mtime": date}
+        raise subprocess.SubprocessError(f"{path}: No such file or directory")
+
+    def scan(self, root, on_error=None, max_workers=DEFAULT_WORKERS):
+        """{relative path: (is directory, size, date)} of everything under root
+
+        idevicefs lists one directory per call, so a whole level of the
+        tree is listed at once. A subdirectory that cannot be listed is
+        passed to on_error(path, exception) if given, and raises otherwise.
+        """
+        entries = {}
+        directories = [""]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while directories:
+                def list_directory(relative):
+                    try:
+                        return self.listdir(posixpath.join(root, relative) if relative else root)
+                    except (subprocess.SubprocessError, OSError) as e:
+                        if on_error is None or not relative:
+                            raise
+                        on_error(posixpath.join(root, relative), e)
+                        return []
+
+                next_level = []
+                for relative, rows in zip(directories, pool.map(list_directory, directories)):
+                    for name, is_dir, size, date in rows:
+                        path = posixpath.join(relative, name) if relative else name
+                        entries[path] = (is_dir, size, date)
+                        if is_dir:
+                            next_level.append(path)
+                directories = next_level
+        return entries
+
+    def hashes(self, root, paths):
+        """idevicefs cannot hash on the device, so no remote digests are known"""
+        return {}
+
+    def wait(self, args, size, on_tick=None, cancelled=None):
+        """Run a transfer, calling on_tick every PROGRESS_INTERVAL until it finishes"""
+        future = self.engine.run(self.command(args), device=self.udid, timeout=transfer_timeout(size))
+        while True:
+            try:
+                return self.check(args, future.result(timeout=PROGRESS_INTERVAL))
+            except TimeoutError:
+                if cancelled is not None and cancelled.is_set():
+                    # Cancelling the engine future kills the tool
+                    future.cancel()
+                    raise CancelledError()
+                if on_tick:
+                    on_tick()
+
+    def get(self, remote_path, local_path, size, progress=None, cancelled=None):
+        reported = 0
+        # Written beside the target, which keeps its old contents until the copy is complete
+        partial = local_path + PARTIAL_SUFFIX
+
+        def sample():
+            nonlocal reported
+            try:
+                current = os.path.getsize(partial)
+            except OSError:
+                return
+            if current > reported:
+                progress(current - reported)
+                reported = current
+
+        try:
+            self.wait(["get", remote_path, partial], size, sample if progress else None, cancelled)
+            os.replace(partial, local_path)
+        except BaseException:
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+            raise
+        if progress and size > reported:
+            progress(size - reported)
+
+    def put(self, local_path, remote_path, size, progress=None, cancelled=None):
+        self.wait(["put", local_path, remote_path], size, None, cancelled)
+        if progress:
+            progress(size)
+
+
+class TransferStats:
+    """Counts, bytes and rates of a running or finished transfer"""
+
+    def __init__(self):
+        self.files_total = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.bytes_done = 0
+        self.errors = []
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def percent(self):
+        return min(self.bytes_done, self.bytes_total) * 100 / self.bytes_total if self.bytes_total else 100.0
+
+    @property
+    def files_per_second(self):
+        return self.files_done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mb_per_second(self):
+        return self.bytes_done / self.elapsed / 1e6 if self.elapsed > 0 else 0.0
+
+    def summary(self, verb):
+        text = (f"{verb} {self.files_done}/{self.files_total} files, {self.bytes_done / 1e6:.1f} MB "
+                f"in {self.elapsed:.1f} s ({self.files_per_second:.1f} files/s, {self.mb_per_second:.1f} MB/s)")
+        if self.errors:
+            text += f", {len(self.errors)} failed"
+        return text
+
+
+class DirectoryTransfer:
+    """Copy files and whole directory trees between the host and a device
+
+    upload() and download() walk the directories they are given, create
+    the target directories and then hand the files, largest first, to
+    max_workers workers. A file that fails is recorded in stats.errors as
+    (path, message) and the others carry on. on_progress(stats) is called
+    from worker threads at most every PROGRESS_INTERVAL seconds and once
+    more when the transfer ends.
+    """
+
+    def __init__(self, client, max_workers=DEFAULT_WORKERS, on_progress=None):
+        self.client = client
+        self.max_workers = max_workers
+        self.on_progress = on_progress
+        self.stats = TransferStats()
+        self.copied = []
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+        self.last_report = 0.0
+
+    def report(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_report < PROGRESS_INTERVAL:
+                return
+            self.last_report = now
+        if self.on_progress:
+            self.on_progress(self.stats)
+
+    def upload(self, local_paths, remote_dir):
+        """Copy local files and directories into remote_dir; returns the TransferStats"""
+        self.stats.started = time.monotonic()
+        directories = []
+        files = []
+        for path in local_paths:
+            target = posixpath.join(remote_dir, os.path.basename(path.rstrip(os.sep)))
+            if not os.path.isdir(path):
+                files.append((path, target, os.path.getsize(path)))
+                continue
+            for root, _, names in os.walk(path):
+                relative = os.path.relpath(root, path)
+                remote_root = target if relative == os.curdir else posixpath.join(target, *relative.split(os.sep))
+                directories.append(remote_root)
+                for name in names:
+                    local_path = os.path.join(root, name)
+                    files.append((local_path, posixpath.join(remote_root, name), os.path.getsize(local_path)))
+
+        # Parents come before their children in os.walk order
+        for directory in directories:
+            try:
+                self.client.mkdir(directory)
+            except subprocess.SubprocessError:
+                # Usually it exists already; if not, its files fail and say so
+                pass
+        return self.run(files, self.client.put)
+
+    def download(self, remote_entries, local_dir):
+        """Copy (remote path, is directory, size) entries into local_dir; returns the TransferStats"""
+        self.stats.started = time.monotonic()
+        files = []
+        directories = []
+        for remote_path, is_dir, size in remote_entries:
+            local_path = os.path.join(local_dir, posixpath.basename(remote_path.rstrip("/")))
+            if is_dir:
+                directories.append((remote_path, local_path))
+            else:
+                files.append((remote_path, local_path, size))
+
+        for remote_path, local_path in directories:
+            os.makedirs(local_path, exist_ok=True)
+            entries = self.client.scan(remote_path, on_error=self.listing_failed, max_workers=self.max_workers)
+            for relative, (is_dir, size, _) in sorted(entries.items()):
+                target = os.path.join(local_path, *relative.split("/"))
+                if is_dir:
+                    os.makedirs(target, exist_ok=True)
+                else:
+                    files.append((posixpath.join(remote_path, relative), target, size))
+        return self.run(files, self.client.get)
+
+    def listing_failed(self, remote_path, error):
+        # The rest of the tree is still worth having
+        with self.lock:
+            self.stats.errors.append((remote_path, str(error) or type(error).__name__))
+
+    def run(self, files, copy):
+        """Copy (source, target, size) files with copy(); successive runs add up in the same stats"""
+        if self.stats.started is None:
+            self.stats.started = time.monotonic()
+        # Largest first, so one big file does not start last and hold up the end
+        files.sort(key=lambda entry: entry[2], reverse=True)
+        self.stats.files_total += len(files)
+        self.stats.bytes_total += sum(size for _, _, size in files)
+        self.report(force=True)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            list(pool.map(lambda entry: self.copy_file(copy, *entry), files))
+
+        self.stats.finished = time.monotonic()
+        self.report(force=True)
+        return self.stats
+
+    def copy_file(self, copy, source, target, size):
+        if self.cancelled.is_set():
+            return
+
+        def progress(count):
+            with self.lock:
+                self.stats.bytes_done += count
+            self.report()
+
+        try:
+            copy(source, target, size, progress, self.cancelled)
+            with self.lock:
+                self.stats.files_done += 1
+                self.copied.append(source)
+        except CancelledError:
+            pass
+        except (subprocess.SubprocessError, OSError) as e:
+            with self.lock:
+                self.stats.errors.append((source, str(e) or type(e).__name__))
+        self.report()
+
+    def cancel(self):
+        """Stop starting files and kill the ones running"""
+        self.cancelled.set()
@@ -0,0 +1,265 @@
+"""Client for usbmuxd, the daemon that multiplexes connections to USB-attached iOS devices
+
+Messages are plists framed by a 16-byte little-endian header: total length,
+protocol version, message type and a tag that replies echo back. The daemon
+listens on /var/run/usbmuxd, or on TCP port 27015 on Windows; the
+USBMUXD_SOCKET_ADDRESS variable ("UNIX:/path" or "host:port") overrides both,
+as it does for libimobiledevice.
+"""
+import os
+import plistlib
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+USBMUXD_SOCKET = "/var/run/usbmuxd"
+USBMUXD_TCP = ("127.0.0.1", 27015)
+
+PROTOCOL_VERSION = 1
+MESSAGE_PLIST = 8
+HEADER_SIZE = 16
+
+PROGRAM_NAME = "ultimatemobilemanager"
+CLIENT_VERSION = "umm-usbmux-1"
+
+
+class UsbmuxError(subprocess.SubprocessError):
+    """Raised when usbmuxd rejects a request or the connection fails
+
+    Like AdbError it subclasses SubprocessError, so callers that handled a
+    failed idevice_id run keep working unchanged.
+    """
+
+
+class UsbmuxUnavailable(UsbmuxError):
+    """Raised when no usbmuxd is listening"""
+
+
+def default_address():
+    """Where usbmuxd listens on this machine"""
+    override = os.environ.get("USBMUXD_SOCKET_ADDRESS")
+    if override:
+        if override.startswith("UNIX:"):
+            return override[len("UNIX:"):]
+        host, _, port = override.rpartition(":")
+        return (host or "127.0.0.1", int(port))
+    if sys.platform == "win32":
+        return USBMUXD_TCP
+    return USBMUXD_SOCKET
+
+
+def connect(address=None, timeout=5):
+    """Open a connection to usbmuxd; address is a socket path or a (host, port) pair"""
+    address = address or default_address()
+    try:
+        if isinstance(address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(address)
+            return sock
+        return socket.create_connection(address, timeout=timeout)
+    except (OSError, AttributeError) as e:
+        raise UsbmuxUnavailable(f"Cannot reach usbmuxd at {address}: {e}") from e
+
+
+def read_exact(sock, size):
+    """Read exactly size bytes from sock"""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise UsbmuxError("Connection closed by usbmuxd")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def send_packet(sock, message, tag=0):
+    payload = plistlib.dumps(message)
+    sock.sendall(struct.pack("<IIII", HEADER_SIZE + len(payload), PROTOCOL_VERSION, MESSAGE_PLIST, tag) + payload)
+
+
+def read_packet(sock):
+    """Read one message; returns (tag, plist dict)"""
+    length, version, message_type, tag = struct.unpack("<IIII", read_exact(sock, HEADER_SIZE))
+    if version != PROTOCOL_VERSION or message_type != MESSAGE_PLIST:
+        raise UsbmuxError(f"Unsupported usbmux packet (version {version}, type {message_type})")
+    try:
+        return tag, plistlib.loads(read_exact(sock, length - HEADER_SIZE))
+    except plistlib.InvalidFileException as e:
+        raise UsbmuxError(f"Malformed usbmux message: {e}") from e
+
+
+def device_from_message(message):
+    """Turn an Attached message or DeviceList entry into a device dict"""
+    properties = message.get("Properties", {})
+    return {
+        "id": message.get("DeviceID", properties.get("DeviceID")),
+        "udid": properties.get("SerialNumber", ""),
+        "connection": properties.get("ConnectionType", "USB"),
+    }
+
+
+class UsbmuxClient:
+    """One-shot requests to usbmuxd, each on its own connection
+
+    A connection that has issued Listen or Connect belongs to that purpose
+    for the rest of its life, so nothing is shared between calls.
+    """
+
+    def __init__(self, address=None, timeout=5):
+        self.address = address
+        self.timeout = timeout
+        self.tag = 0
+        self.lock = threading.Lock()
+
+    def next_tag(self):
+        with self.lock:
+            self.tag += 1
+            return self.tag
+
+    def request(self, sock, message):
+        """Send a request and return the reply with the same tag"""
+        message = dict(message, ProgName=PROGRAM_NAME, ClientVersionString=CLIENT_VERSION)
+        tag = self.next_tag()
+        send_packet(sock, message, tag)
+        while True:
+            reply_tag, reply = read_packet(sock)
+            if reply_tag == tag:
+                return reply
+
+    def check_result(self, reply, what):
+        if reply.get("MessageType") == "Result" and reply.get("Number", 0) != 0:
+            raise UsbmuxError(f"usbmuxd refused {what} (error {reply['Number']})")
+
+    def list_devices(self):
+        """Every connection usbmuxd currently knows about, as device dicts"""
+        sock = connect(self.address, self.timeout)
+        try:
+            reply = self.request(sock, {"MessageType": "ListDevices"})
+        finally:
+            sock.close()
+        self.check_result(reply, "ListDevices")
+        return [device_from_message(entry) for entry in reply.get("DeviceList", [])]
+
+    def read_pair_record(self, udid):
+        """The host's pairing record for a device, as a dict"""
+        sock = connect(self.address, self.timeout)
+        try:
+            reply = self.request(sock, {"MessageType": "ReadPairRecord", "PairRecordID": udid})
+        finally:
+            sock.close()
+        self.check_result(reply, "ReadPairRecord")
+        return plistlib.loads(reply["PairRecordData"])
+
+    def listen(self):
+        """Open a connection that receives Attached/Detached messages from now on"""
+        sock = connect(self.address, self.timeout)
+        try:
+            reply = self.request(sock, {"MessageType": "Listen"})
+            self.check_result(reply, "Listen")
+        except (UsbmuxError, OSError):
+            sock.close()
+            raise
+        sock.settimeout(None)
+        return sock
+
+    def connect_device(self, device_id, port):
+        """Open a raw tunnel to a TCP port on the device"""
+        sock = connect(self.address, self.timeout)
+        try:
+            # The daemon expects the port in network byte order
+            reply = self.request(sock, {"MessageType": "Connect", "DeviceID": device_id,
+                                        "PortNumber": socket.htons(port)})
+            self.check_result(reply, f"Connect to port {port}")
+        except (UsbmuxError, OSError):
+            sock.close()
+            raise
+        return sock
+
+    def find_device(self, udid):
+        """The device dict for udid, preferring USB over network connections"""
+        matches = [device for device in self.list_devices() if device["udid"] == udid]
+        if not matches:
+            raise UsbmuxError(f"Device {udid} is not attached")
+        matches.sort(key=lambda device: device["connection"] != "USB")
+        return matches[0]
+
+
+class DeviceListener:
+    """Follow usbmuxd's Listen stream and report devices as they come and go
+
+    The daemon pushes a message the moment a device attaches or detaches, so
+    nothing polls and no process is spawned while the set of devices is
+    stable. A device reachable over both USB and Wi-Fi has one DeviceID per
+    connection; on_event("Attached", udid) fires when its first connection
+    appears and on_event("Detached", udid) when its last one goes. Both are
+    called from the listener thread.
+    """
+
+    def __init__(self, on_event, address=None, reconnect_delay=1.0):
+        self.on_event = on_event
+        self.client = UsbmuxClient(address)
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self.running = False
+        self.sock = None
+        self.thread = None
+        self.connections = {}
+        # Set once the first connection attempt has succeeded or failed
+        self.attempted = threading.Event()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def udids(self):
+        return sorted(set(self.connections.values()))
+
+    def run(self):
+        while self.running:
+            try:
+                self.sock = self.client.listen()
+                self.connected = True
+                self.attempted.set()
+
+                while self.running:
+                    # The stream blocks until a device attaches or detaches
+                    self.handle_message(read_packet(self.sock)[1])
+
+            except (UsbmuxError, OSError):
+                pass
+
+            self.connected = False
+            self.attempted.set()
+            # Losing the daemon means losing every device it knew about
+            for udid in self.udids():
+                self.on_event("Detached", udid)
+            self.connections.clear()
+
+            if self.running:
+                time.sleep(self.reconnect_delay)
+
+    def handle_message(self, message):
+        kind = message.get("MessageType")
+        if kind == "Attached":
+            device = device_from_message(message)
+            first = device["udid"] not in self.connections.values()
+            self.connections[device["id"]] = device["udid"]
+            if first and device["udid"]:
+                self.on_event("Attached", device["udid"])
+        elif kind == "Detached":
+            udid = self.connections.pop(message.get("DeviceID"), None)
+            if udid and udid not in self.connections.values():
+                self.on_event("Detached", udid)